@@ -1,13 +1,35 @@
+import asyncio
+import codecs
+import hashlib
+import heapq
+import json
 import os
+import shutil
+import signal
+import sqlite3
+import struct
 import subprocess
 import sys
+import tempfile
 import threading
 import time
-import re
+import queue
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from fractions import Fraction
 from pathlib import Path
-from typing import Optional, List, Callable
+from typing import Optional, List, Callable, Union, Iterable, Iterator, Dict
 import logging
 
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块，不能限制子进程的地址空间
+    resource = None
+
+__version__ = '1.1.0'
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -18,184 +40,5425 @@ logging.basicConfig(
     ]
 )
 
-class VideoConverter:
-    """视频转换工具类"""
+# 并行批量转换时每个任务期望分到的CPU核数
+# libx264在低分辨率（RMVB常见的480p/576p）下，单进程线程数超过4后扩展性明显下降，
+# 因此jobs="auto"时按每4个核开一个任务，把剩余的并行度留给多进程
+AUTO_JOB_CPUS = 4
+
+
+# FFmpeg能力信息的磁盘缓存文件名（位于缓存目录下），按可执行文件的路径、大小和修改时间失效
+TOOLCHAIN_CACHE_FILE = 'ffmpeg_toolchain.json'
+
+# 发现FFmpeg能力时单个查询命令的超时（秒）
+TOOLCHAIN_PROBE_TIMEOUT = 10
+
+# 各质量档位对应的libx264编码参数（CRF值和preset）
+QUALITY_SETTINGS = {
+    'low': ['-crf', '28', '-preset', 'fast'],
+    'medium': ['-crf', '23', '-preset', 'medium'],
+    'high': ['-crf', '18', '-preset', 'slow']
+}
+
+# 分段并行编码时每段的最短时长（秒），段太短时进程启动和关键帧开销会抵消并行收益
+MIN_CHUNK_SECONDS = 30.0
+
+# 分段并行编码时音频任务在总进度中所占的权重（音频编码远快于视频编码）
+CHUNK_AUDIO_WEIGHT = 0.05
+
+# 分段并行编码前读取关键帧位置的超时（秒），超时（如文件损坏导致ffprobe卡住）时不分段
+KEYFRAME_PROBE_TIMEOUT = 300
+
+
+# 各质量档位的经验编码速度（相对实时播放的倍数），用于在没有历史数据时预估编码耗时
+QUALITY_REALTIME_SPEED = {
+    'low': 4.0,
+    'medium': 2.0,
+    'high': 1.0
+}
+
+# 直接复制流（-c copy）时的经验速度（相对实时播放的倍数），耗时主要取决于磁盘I/O
+COPY_REALTIME_SPEED = 50.0
+
+# 拟合耗时模型时每个(质量, 编码方式)最多使用的最近样本数，使模型跟随硬件和FFmpeg版本的变化
+PERF_MODEL_SAMPLES = 200
+
+# 批量整体进度低于该百分比时，剩余时间使用耗时模型的预测值而不是实测速度
+ETA_WARMUP_PERCENT = 5.0
+
+# 解码预检：每个采样窗口的时长（秒）、开头和结尾之间的采样点数、单个窗口的超时（秒）
+PRECHECK_WINDOW_SECONDS = 5.0
+PRECHECK_MIDDLE_POINTS = 3
+PRECHECK_TIMEOUT = 120
+
+# 预检发现解码错误时的处理策略：
+# skip - 不转换；quarantine - 把输入文件移到隔离目录；conceal - 开启错误隐藏后照常转换
+PRECHECK_POLICIES = ('skip', 'quarantine', 'conceal')
+
+# 隔离目录名（位于输入文件所在目录下）
+QUARANTINE_DIR = '_quarantine'
+
+# 错误隐藏模式下追加的输入参数：忽略解码错误、丢弃损坏的包、用运动矢量猜测和去块滤波修补损坏的宏块
+CONCEAL_INPUT_ARGS = [
+    '-err_detect', 'ignore_err',
+    '-fflags', '+discardcorrupt',
+    '-ec', 'guess_mvs+deblock',
+]
+
+# 批量转换默认扫描的文件扩展名
+DEFAULT_BATCH_EXTENSIONS = ('.rmvb',)
+
+# 本工具常见的输入格式，其他扩展名会给出警告
+INPUT_EXTENSIONS = ('.rmvb', '.rm', '.mkv', '.avi', '.flv', '.mp4', '.mov', '.wmv')
+
+# 可以直接放入MP4容器（-c copy）的视频和音频编解码器
+MP4_COPY_VIDEO_CODECS = ('h264', 'hevc', 'mpeg4', 'av1')
+MP4_COPY_AUDIO_CODECS = ('aac', 'mp3', 'ac3', 'eac3', 'alac')
+
+# 编码策略：auto - 编解码器兼容MP4时直接复制流；reencode - 总是重新编码
+CODEC_POLICIES = ('auto', 'reencode')
+
+# 批量转换支持的任务排序策略
+BATCH_ORDERS = ('input', 'lpt', 'spt', 'priority')
+
+# 并发探测的默认并发数系数：探测以I/O和进程创建为主，可以明显多于CPU核数
+PROBE_CONCURRENCY_PER_CPU = 4
+
+
+def _available_cpus() -> int:
+    """获取当前进程可用的CPU核数（考虑taskset/容器的CPU亲和性限制）"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        # Windows/macOS不支持sched_getaffinity
+        return max(1, os.cpu_count() or 1)
+
+
+def _resolve_jobs(jobs: Union[int, str], job_count: Optional[int] = None) -> int:
+    """
+    将jobs参数解析为实际的并行任务数
+    
+    Args:
+        jobs: 并行任务数，整数或"auto"
+        job_count: 待处理的任务总数，用于限制并行数不超过任务数
+        
+    Returns:
+        int: 实际并行任务数（至少为1）
+    """
+    if jobs == "auto":
+        resolved = max(1, _available_cpus() // AUTO_JOB_CPUS)
+    else:
+        resolved = int(jobs)
+        if resolved < 1:
+            raise ValueError(f"jobs必须是正整数或'auto'，当前为: {jobs}")
+    if job_count is not None:
+        resolved = min(resolved, max(1, job_count))
+    return resolved
+
+
+def _file_priority(path: Path, priorities: Dict[str, int]) -> int:
+    """按完整路径或文件名查找文件的优先级，未列出的为0"""
+    return priorities.get(str(path), priorities.get(path.name, 0))
+
+
+def _threads_per_job(jobs: int) -> int:
+    """将CPU核数平均分配给并行任务，得到每个FFmpeg进程的-threads值"""
+    return max(1, _available_cpus() // max(1, jobs))
+
+
+def _info_duration(info: Optional[dict]) -> Optional[float]:
+    """从ffprobe风格的信息字典中取出总时长（秒），没有时返回None"""
+    if info and 'format' in info and info['format'].get('duration', 'N/A') != 'N/A':
+        return float(info['format']['duration'])
+    return None
+
+
+def _info_dimensions(info: Optional[dict]) -> tuple:
+    """从ffprobe风格的信息字典中取出第一路视频流的(宽, 高)，没有时为(None, None)"""
+    for stream in (info or {}).get('streams', []):
+        if stream.get('codec_type') == 'video':
+            return stream.get('width'), stream.get('height')
+    return None, None
+
+
+def _simulate_schedule(costs: List[float], jobs: int) -> List[tuple]:
+    """
+    模拟线程池按给定顺序派发任务时各任务的开始和结束时间
+    
+    线程池总是把下一个任务交给最早空闲的工作线程，
+    这里用最小堆记录各工作线程的空闲时间来重现这一过程
+    
+    Args:
+        costs: 按派发顺序排列的各任务预计耗时（秒）
+        jobs: 并行任务数
+        
+    Returns:
+        List[tuple]: 与costs一一对应的(开始时间, 结束时间)，单位为秒
+    """
+    workers = [0.0] * max(1, jobs)
+    timeline = []
+    for cost in costs:
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + cost)
+        timeline.append((start, start + cost))
+    return timeline
+
+
+def _wait_with_rusage(process: subprocess.Popen) -> Optional[dict]:
+    """
+    等待子进程结束，并返回它自己消耗的CPU时间和峰值内存
+    
+    POSIX下用os.wait4回收子进程，得到的资源使用只属于该进程，并行运行的
+    其他FFmpeg进程不会混在一起；其他平台只等待进程结束并返回None
+    
+    Args:
+        process: 已启动的子进程
+        
+    Returns:
+        dict: {'cpu_user': 用户态CPU秒数, 'cpu_sys': 内核态CPU秒数,
+               'cpu_seconds': 两者之和, 'max_rss_kb': 峰值常驻内存（KB）}
+    """
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # 进程已经被回收（例如被kill后wait过），拿不到资源使用
+        process.wait()
+        return None
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    # Linux的ru_maxrss单位是KB，macOS是字节
+    max_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return {
+        'cpu_user': usage.ru_utime,
+        'cpu_sys': usage.ru_stime,
+        'cpu_seconds': usage.ru_utime + usage.ru_stime,
+        'max_rss_kb': max_rss_kb,
+    }
+
+
+def _address_space_limiter(limit_mb: float) -> Optional[Callable[[], None]]:
+    """
+    生成设置地址空间上限（RLIMIT_AS）的preexec_fn，超过上限的内存分配会失败，
+    失控的FFmpeg进程只会自己出错退出，而不会耗尽整机内存
+    
+    上限在fork之后、exec FFmpeg之前设置，FFmpeg从启动起的所有分配都受限制
+    
+    Args:
+        limit_mb: 地址空间上限（MB）
+        
+    Returns:
+        Callable: 传给Popen/create_subprocess_exec的preexec_fn，平台不支持（Windows）时返回None
+    """
+    if resource is None or not hasattr(resource, 'RLIMIT_AS'):
+        return None
+    limit = int(limit_mb * (1 << 20))
+    
+    def preexec():
+        # 在子进程中运行：硬上限已经更低时只能保持原样，设置失败时FFmpeg照常运行
+        try:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            capped = limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (capped, capped))
+        except (OSError, ValueError):
+            pass
+    
+    return preexec
+
+
+def _default_cache_dir() -> Path:
+    """获取本工具的缓存目录（遵循XDG_CACHE_HOME，Windows下使用LOCALAPPDATA）"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')
+    if not base:
+        base = str(Path.home() / '.cache')
+    return Path(base) / 'kks_tools'
+
+
+# RealMedia编解码器FourCC到FFmpeg编解码器名称的映射
+REALMEDIA_CODECS = {
+    'RV10': 'rv10', 'RV20': 'rv20', 'RV30': 'rv30', 'RV40': 'rv40', 'RV60': 'rv60',
+    'cook': 'cook', 'sipr': 'sipr', 'atrc': 'atrac3', 'raac': 'aac', 'racp': 'aac',
+    '28_8': 'ra_288', 'dnet': 'ac3', 'ralf': 'ralf', 'lpcJ': 'ra_144',
+}
+
+# 头部块（.RMF/PROP/MDPR/CONT）的合理大小上限，超过则认为文件损坏
+REALMEDIA_MAX_HEADER_CHUNK = 1 << 20
+
+
+def _parse_realaudio_specific(data: bytes, stream: dict):
+    """解析MDPR中RealAudio的type-specific数据（'.ra\\xfd'开头），填充采样率、声道和FourCC"""
+    version = struct.unpack_from('>H', data, 4)[0]
+    if version == 3:
+        stream['codec_tag_string'] = 'lpcJ'
+        stream['sample_rate'] = '8000'
+        stream['channels'] = 1
+        return
+    # 版本4/5的固定字段：跳过'.ra4/.ra5'、数据大小、头部大小、flavor等，
+    # 偏移量与FFmpeg rmdec.c中rm_read_audio_stream_info的读取顺序一致
+    offset = 6 + 2 + 4 + 4 + 2 + 4 + 2 + 4 + 4 + 4 + 4 + 2 + 2 + 2 + 2
+    if version == 5:
+        offset += 6
+    sample_rate, _, channels = struct.unpack_from('>HIH', data, offset)
+    offset += 8
+    if version == 5:
+        fourcc = data[offset + 4:offset + 8]
+    else:
+        interleaver_len = data[offset]
+        offset += 1 + interleaver_len
+        fourcc_len = data[offset]
+        fourcc = data[offset + 1:offset + 1 + fourcc_len]
+    stream['sample_rate'] = str(sample_rate)
+    stream['channels'] = channels
+    stream['codec_tag_string'] = fourcc.decode('ascii', 'replace')
+
+
+def _parse_realmedia_mdpr(data: bytes) -> dict:
+    """解析MDPR（媒体属性）块，返回ffprobe风格的流信息字典"""
+    (stream_number, max_bit_rate, avg_bit_rate, _, _, start_time, _, duration
+     ) = struct.unpack_from('>HIIIIIII', data, 0)
+    offset = 30
+    name_len = data[offset]
+    offset += 1 + name_len
+    mime_len = data[offset]
+    mime = data[offset + 1:offset + 1 + mime_len].decode('ascii', 'replace')
+    offset += 1 + mime_len
+    specific_len = struct.unpack_from('>I', data, offset)[0]
+    specific = data[offset + 4:offset + 4 + specific_len]
+    
+    stream = {
+        'index': stream_number,
+        'codec_type': 'data',
+        'bit_rate': str(avg_bit_rate),
+        'max_bit_rate': str(max_bit_rate),
+        'start_time': f"{start_time / 1000:.3f}",
+        'duration': f"{duration / 1000:.3f}",
+        'mime_type': mime,
+    }
+    if specific[:4] == b'.ra\xfd':
+        stream['codec_type'] = 'audio'
+        _parse_realaudio_specific(specific, stream)
+    elif specific[4:8] == b'VIDO':
+        stream['codec_type'] = 'video'
+        fourcc, width, height = struct.unpack_from('>4sHH', specific, 8)
+        stream['codec_tag_string'] = fourcc.decode('ascii', 'replace')
+        stream['width'] = width
+        stream['height'] = height
+        # 帧率以16.16定点数存储
+        fps = struct.unpack_from('>I', specific, 22)[0] if len(specific) >= 26 else 0
+        if fps:
+            frame_rate = Fraction(fps, 65536)
+            stream['r_frame_rate'] = f"{frame_rate.numerator}/{frame_rate.denominator}"
+    if 'codec_tag_string' in stream:
+        stream['codec_name'] = REALMEDIA_CODECS.get(
+            stream['codec_tag_string'], stream['codec_tag_string'].lower()
+        )
+    return stream
+
+
+def parse_realmedia_header(video_file: str) -> Optional[dict]:
+    """
+    直接读取RealMedia（RM/RMVB）文件头，无需启动ffprobe
+    
+    RealMedia文件开头依次是.RMF、PROP、MDPR、CONT等头部块，之后才是DATA块。
+    本函数只顺序读取这些头部块（通常只有几KB），从中取得时长、码率、
+    流数量和各流的编解码器FourCC，并根据PROP中的索引偏移检查INDX块是否存在。
+    
+    Args:
+        video_file: 视频文件路径
+        
+    Returns:
+        dict: 与ffprobe -show_format -show_streams结构兼容的信息字典，
+              额外的'realmedia'键包含索引等RealMedia特有信息；
+              不是RealMedia文件或解析失败时返回None
+    """
+    try:
+        with open(video_file, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if f.read(4) != b'.RMF':
+                return None
+            f.seek(0)
+            
+            prop = None
+            streams = []
+            while True:
+                chunk_header = f.read(10)
+                if len(chunk_header) < 10:
+                    break
+                chunk_id, chunk_size, _ = struct.unpack('>4sIH', chunk_header)
+                if chunk_id == b'DATA':
+                    break
+                if chunk_size < 10 or chunk_size > REALMEDIA_MAX_HEADER_CHUNK:
+                    return None
+                data = f.read(chunk_size - 10)
+                if chunk_id == b'PROP':
+                    prop = struct.unpack_from('>IIIIIIIIIHH', data, 0)
+                elif chunk_id == b'MDPR':
+                    streams.append(_parse_realmedia_mdpr(data))
+            
+            if prop is None:
+                return None
+            (max_bit_rate, avg_bit_rate, _, _, num_packets, duration, preroll,
+             index_offset, data_offset, num_streams, flags) = prop
+            if duration <= 0:
+                return None
+            
+            has_index = False
+            if 0 < index_offset < file_size:
+                f.seek(index_offset)
+                has_index = f.read(4) == b'INDX'
+    except (OSError, struct.error, IndexError):
+        return None
+    
+    return {
+        'format': {
+            'filename': video_file,
+            'format_name': 'rm',
+            'duration': f"{duration / 1000:.3f}",
+            'bit_rate': str(avg_bit_rate),
+            'size': str(file_size),
+            'nb_streams': num_streams,
+        },
+        'streams': streams,
+        'realmedia': {
+            'max_bit_rate': max_bit_rate,
+            'num_packets': num_packets,
+            'preroll': preroll,
+            'index_offset': index_offset,
+            'data_offset': data_offset,
+            'has_index': has_index,
+            'flags': flags,
+        },
+    }
+
+
+# 快速校验和读取的文件头尾字节数
+QUICK_CHECKSUM_BYTES = 1 << 20
+
+
+def _quick_checksum(file_path: str) -> str:
+    """
+    计算文件的快速校验和：文件大小 + 开头和末尾各1MB内容的BLAKE2b摘要
+    
+    MP4的ftyp/moov（faststart）在开头、mdat尾部在末尾，截断或未写完的文件
+    必然改变其中之一，而计算量与文件大小无关，不必为每个输出重读几GB数据
+    
+    Args:
+        file_path: 文件路径
+        
+    Returns:
+        str: 形如"<大小>:<十六进制摘要>"的校验和
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(QUICK_CHECKSUM_BYTES))
+        if size > QUICK_CHECKSUM_BYTES:
+            f.seek(max(QUICK_CHECKSUM_BYTES, size - QUICK_CHECKSUM_BYTES))
+            digest.update(f.read(QUICK_CHECKSUM_BYTES))
+    return f"{size}:{digest.hexdigest()}"
+
+
+# 临时输出文件的后缀，保留.mp4扩展名让FFmpeg自动选择MP4封装
+TEMP_OUTPUT_SUFFIX = '.kks-tmp.mp4'
+
+# 分段编码临时目录的前缀
+CHUNK_DIR_PREFIX = '.kks-chunks-'
+# 流媒体打包的临时输出目录前缀，格式同上
+PACKAGE_DIR_PREFIX = '.kks-package-'
+
+
+def _temp_output_path(output_path: Path) -> Path:
+    """
+    生成与输出文件同目录的临时文件路径
+    
+    同目录保证与最终文件在同一文件系统上，重命名是原子操作；
+    文件名中带有进程号，便于清理时判断写入它的进程是否还在运行
+    """
+    return output_path.with_name(
+        f".{output_path.stem}.{os.getpid()}.{uuid.uuid4().hex[:8]}{TEMP_OUTPUT_SUFFIX}"
+    )
+
+
+def _commit_output(temp_path: Path, output_path: Path):
+    """
+    将写完的临时文件原子地重命名为最终输出文件
+    
+    重命名前先fsync文件内容，避免断电后留下一个名字正确但内容为空的文件
+    """
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, output_path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # POSIX下再fsync目录，使重命名本身持久化
+        dir_fd = os.open(str(output_path.parent), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _discard_temp(temp_path: Path):
+    """删除未提交的临时文件（不存在时忽略）"""
+    try:
+        temp_path.unlink()
+    except OSError:
+        pass
+
+
+def _commit_directory(temp_dir: Path, output_path: Path):
+    """
+    将写完的临时目录重命名为最终输出目录
+    
+    已存在的输出先改名为同前缀的临时名称再删除，任何时刻输出路径上要么是旧的
+    完整输出、要么是新的完整输出（两次重命名之间的短暂间隙除外）
+    """
+    backup = None
+    if output_path.exists():
+        backup = output_path.with_name(f"{PACKAGE_DIR_PREFIX}{os.getpid()}-old-{output_path.name}")
+        os.replace(output_path, backup)
+    os.replace(temp_dir, output_path)
+    if backup is not None:
+        if backup.is_dir():
+            shutil.rmtree(backup, ignore_errors=True)
+        else:
+            _discard_temp(backup)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(str(output_path.parent), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _path_size(path: Union[str, Path]) -> int:
+    """文件的大小，或目录中所有文件的总大小"""
+    path = Path(path)
+    if not path.is_dir():
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in path.rglob('*') if entry.is_file())
+
+
+def _pid_alive(pid: int) -> bool:
+    """判断进程是否仍在运行（仅用于POSIX，Windows下os.kill(pid, 0)会发送CTRL_C_EVENT）"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale_temp_files(directory: str) -> int:
+    """
+    清理目录中被中断的转换留下的临时文件、分段编码和流媒体打包的临时目录
+    
+    只删除写入进程已经退出的临时文件，不会影响正在运行的其他转换。
+    Windows下无法安全地判断进程是否存在，依靠"正在被写入的文件无法删除"
+    来跳过活动的临时文件，临时目录则不做清理。
+    
+    Args:
+        directory: 要清理的目录
+        
+    Returns:
+        int: 清理掉的文件和目录数
+    """
+    removed = 0
+    try:
+        entries = list(Path(directory).iterdir())
+    except OSError:
+        return 0
+    
+    for entry in entries:
+        name = entry.name
+        if name.startswith('.') and name.endswith(TEMP_OUTPUT_SUFFIX):
+            pid_part = name[:-len(TEMP_OUTPUT_SUFFIX)].rsplit('.', 2)[-2]
+        elif name.startswith(CHUNK_DIR_PREFIX):
+            pid_part = name[len(CHUNK_DIR_PREFIX):].split('-', 1)[0]
+        elif name.startswith(PACKAGE_DIR_PREFIX):
+            pid_part = name[len(PACKAGE_DIR_PREFIX):].split('-', 1)[0]
+        else:
+            continue
+        
+        if os.name == 'posix':
+            if pid_part.isdigit() and (int(pid_part) == os.getpid() or _pid_alive(int(pid_part))):
+                continue
+        elif entry.is_dir():
+            continue
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _format_seconds(seconds: float) -> str:
+    """将秒数格式化为HH:MM:SS"""
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class BatchProgress:
+    """
+    批量转换的整体进度汇总
+    
+    每个任务的进度按其视频时长加权，汇总为整体百分比；同时根据已编码的
+    视频时长计算整体编码速度（实时倍数）和剩余时间。多个任务并行时，
+    各任务的进度回调都汇总到这里，再以(progress, status)的形式交给批量回调。
+    """
+    
+    # 两次批量回调之间的最短间隔（秒），整体进度每前进1%也会触发回调
+    MIN_INTERVAL = 1.0
+    
+    # 状态文字中最多列出的运行中任务数
+    MAX_LISTED_JOBS = 3
+    
+    def __init__(
+        self,
+        durations: Dict[str, float],
+        progress_callback: Optional[Callable[[float, str], None]],
+        predicted_seconds: Optional[float] = None
+    ):
+        """
+        初始化批量进度
+        
+        Args:
+            durations: 任务（输入文件路径）到视频时长（秒）的映射，
+                       时长未知（0）的任务按已知时长的平均值计权
+            progress_callback: 批量进度回调函数，接收(progress, status)参数
+            predicted_seconds: 耗时模型预测的批量总耗时（秒），批量刚开始、
+                               实测速度还不可靠时用它估算剩余时间
+        """
+        known = [d for d in durations.values() if d > 0]
+        default_weight = sum(known) / len(known) if known else 1.0
+        self.weights = {job: (d if d > 0 else default_weight) for job, d in durations.items()}
+        self.total_weight = sum(self.weights.values()) or 1.0
+        self.progress_callback = progress_callback
+        self.predicted_seconds = predicted_seconds
+        self.job_progress = {}
+        self.finished = {}
+        self.start_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_overall = 0.0
+        self._last_emit = 0.0
+    
+    def job_callback(self, job: str) -> Callable[[float, str], None]:
+        """
+        生成单个任务使用的进度回调函数
+        
+        Args:
+            job: 任务键（输入文件路径），需在durations中
+            
+        Returns:
+            Callable: 接收(progress, status)的回调函数
+        """
+        def callback(progress: float, status: str):
+            # 失败状态（progress<0）由finish记录，这里只汇总正常进度
+            if progress < 0:
+                return
+            with self._lock:
+                self.job_progress[job] = min(progress, 100.0)
+            self._emit()
+        return callback
+    
+    def finish(self, job: str, success: bool):
+        """标记任务结束（无论成败，该任务在整体进度中都按已完成计）"""
+        with self._lock:
+            self.finished[job] = success
+            self.job_progress[job] = 100.0
+        self._emit(force=True)
+    
+    def snapshot(self) -> dict:
+        """
+        获取当前的整体进度
+        
+        Returns:
+            dict: overall（整体百分比）、jobs（运行中任务的百分比）、
+                  speed（整体编码速度，实时倍数）、eta（预计剩余秒数，未知时为None）、
+                  done/failed/total（任务计数）
+        """
+        with self._lock:
+            done_weight = sum(
+                self.weights.get(job, 0.0) * p / 100 for job, p in self.job_progress.items()
+            )
+            running = {
+                job: p for job, p in self.job_progress.items() if job not in self.finished
+            }
+            done = sum(1 for ok in self.finished.values() if ok)
+            failed = len(self.finished) - done
+        
+        elapsed = time.monotonic() - self.start_time
+        speed = done_weight / elapsed if elapsed > 0 else 0.0
+        remaining = self.total_weight - done_weight
+        overall = min(done_weight / self.total_weight * 100, 100.0)
+        eta = remaining / speed if speed > 0 else None
+        if self.predicted_seconds is not None and overall < ETA_WARMUP_PERCENT:
+            eta = max(self.predicted_seconds - elapsed, 0.0)
+        return {
+            'overall': overall,
+            'jobs': running,
+            'speed': speed,
+            'eta': eta,
+            'done': done,
+            'failed': failed,
+            'total': len(self.weights),
+        }
+    
+    def _emit(self, force: bool = False):
+        """按节流规则把整体进度交给批量回调"""
+        if not self.progress_callback:
+            return
+        snap = self.snapshot()
+        now = time.monotonic()
+        with self._lock:
+            if not force and (snap['overall'] - self._last_overall < 1.0
+                              and now - self._last_emit < self.MIN_INTERVAL):
+                return
+            self._last_overall = snap['overall']
+            self._last_emit = now
+        
+        eta = _format_seconds(snap['eta']) if snap['eta'] is not None else '--:--:--'
+        finished = snap['done'] + snap['failed']
+        status = (
+            f"[{finished}/{snap['total']}] 速度 {snap['speed']:.1f}x 剩余 {eta}"
+        )
+        listed = sorted(snap['jobs'].items())[:self.MAX_LISTED_JOBS]
+        if listed:
+            status += ' | ' + ' '.join(f"{Path(job).name} {p:.0f}%" for job, p in listed)
+        # 批量全部结束前不报告100%，避免进度条提前换行
+        overall = snap['overall'] if finished >= snap['total'] else min(snap['overall'], 99.9)
+        self.progress_callback(overall, status)
+
+
+def _stamp_path(output_file: Path) -> Path:
+    """输出文件对应的转换标记文件路径（隐藏文件，与输出文件同目录）"""
+    return output_file.with_name(f".{output_file.name}.kks.json")
+
+
+class BatchJournal:
+    """
+    批量转换的预写日志（write-ahead journal）
+    
+    每个任务的状态变化（queued/running/done/failed）以一行JSON追加写入
+    输出目录下的日志文件，并在写入后fsync，机器断电或进程被杀后
+    也能从日志中恢复每个任务的最后状态。
+    """
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    
+    FILENAME = '.kks_journal.jsonl'
+    
+    def __init__(self, output_dir: str):
+        """
+        初始化任务日志
+        
+        Args:
+            output_dir: 批量转换的输出目录，日志文件保存在该目录下
+        """
+        self.path = Path(output_dir) / self.FILENAME
+        self._lock = threading.Lock()
+    
+    def load(self) -> Dict[str, dict]:
+        """
+        重放日志，得到每个任务的最后一条记录
+        
+        Returns:
+            Dict[str, dict]: 任务键（输入文件绝对路径）到最后一条记录的映射
+        """
+        records = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半，忽略即可
+                    continue
+                records[record['job']] = record
+        return records
+    
+    def reset(self, records: Optional[Dict[str, dict]] = None):
+        """
+        重写日志文件，只保留给定的记录（用于新批量开始时清空或压缩旧日志）
+        
+        Args:
+            records: 要保留的记录，None表示清空
+        """
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in (records or {}).values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+    
+    def append(self, records: List[dict]):
+        """
+        追加记录并fsync，返回时记录已经持久化
+        
+        Args:
+            records: 记录列表，每条记录至少包含job和state字段
+        """
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    record.setdefault('time', time.time())
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def mark(self, job: str, state: str, **fields):
+        """记录单个任务的状态变化"""
+        self.append([dict(job=job, state=state, **fields)])
+
+
+# 自适应并发：两次调整之间的最短间隔（秒）。PSI的avg10和loadavg都是滑动平均，
+# 调整后需要等它们反映出新的负载再做下一次判断
+ADAPTIVE_INTERVAL = 15.0
+
+# 自适应并发：派发循环检查是否可以启动新任务的间隔（秒）
+ADAPTIVE_POLL_SECONDS = 2.0
+
+# 自适应并发：CPU压力（/proc/pressure/cpu的some avg10，百分比）高于HIGH时减少任务，低于LOW时可以增加
+ADAPTIVE_CPU_PRESSURE_HIGH = 40.0
+ADAPTIVE_CPU_PRESSURE_LOW = 10.0
+
+# 自适应并发：内存压力（/proc/pressure/memory的some avg10，百分比）高于该值时减少任务
+ADAPTIVE_MEMORY_PRESSURE_HIGH = 10.0
+
+# 自适应并发：没有PSI时按每核的1分钟loadavg判断，高于HIGH时减少任务，低于LOW时可以增加
+ADAPTIVE_LOAD_HIGH = 1.5
+ADAPTIVE_LOAD_LOW = 0.75
+
+# 自适应并发：可用内存（MemAvailable）低于该值（MB）时减少任务且不再增加
+ADAPTIVE_MIN_AVAILABLE_MB = 1024
+
+# 内存估算：FFmpeg进程（解复用、解码、音频编码）与分辨率无关的基础内存（MB）
+MEMORY_BASE_MB = 80.0
+
+# 内存估算：libx264缓存的帧数（lookahead + 参考帧 + B帧 + 帧级线程），随preset增加
+X264_BUFFERED_FRAMES = {
+    'low': 40,      # fast: rc-lookahead 30, ref 2
+    'medium': 50,   # medium: rc-lookahead 40, ref 3
+    'high': 65,     # slow: rc-lookahead 50, ref 5
+}
+
+# 内存估算：libx264每个缓存帧每像素占用的字节数（YUV420平面加填充、低分辨率帧和宏块信息）
+X264_BYTES_PER_PIXEL = 4.0
+
+# 内存估算：分辨率未知时按1080p估算，宁可少并行也不要OOM
+MEMORY_DEFAULT_MEGAPIXELS = 1920 * 1080 / 1e6
+
+# 内存估算：在模型预测值上再留出的余量（倍数）
+MEMORY_ESTIMATE_MARGIN = 1.2
+
+# memory_budget="auto"时使用的可用内存（MemAvailable）比例
+MEMORY_BUDGET_FRACTION = 0.8
+
+
+def _read_pressure(kind: str) -> Optional[float]:
+    """读取/proc/pressure/<kind>中some行的avg10（百分比），内核不支持PSI时返回None"""
+    try:
+        with open(f'/proc/pressure/{kind}', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] == 'some':
+                    fields = dict(part.split('=', 1) for part in parts[1:])
+                    return float(fields['avg10'])
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def _read_mem_available_mb() -> Optional[float]:
+    """读取/proc/meminfo中的MemAvailable（MB），不支持时返回None"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def read_system_load() -> dict:
+    """
+    读取系统负载快照
+    
+    Returns:
+        dict: {'cpu_pressure': CPU压力, 'memory_pressure': 内存压力（PSI some avg10，百分比）,
+               'loadavg': 1分钟平均负载, 'cpus': 可用核数, 'mem_available_mb': 可用内存（MB）}，
+               平台不支持的项为None
+    """
+    try:
+        loadavg = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        loadavg = None
+    return {
+        'cpu_pressure': _read_pressure('cpu'),
+        'memory_pressure': _read_pressure('memory'),
+        'loadavg': loadavg,
+        'cpus': _available_cpus(),
+        'mem_available_mb': _read_mem_available_mb(),
+    }
+
+
+class ConcurrencyController:
+    """
+    批量转换的自适应并发控制器
+    
+    每隔interval秒读取一次系统负载（CPU/内存的PSI、loadavg、可用内存），
+    在[min_jobs, max_jobs]范围内每次增减一个任务：
+    - CPU或内存压力过高、可用内存不足时减少一个任务；
+    - 系统空闲且当前的任务数已经跑满时增加一个任务。
+    减少任务时不会终止正在运行的FFmpeg，只是在它们结束前不再启动新任务
+    """
+    
+    def __init__(
+        self,
+        min_jobs: int = 1,
+        max_jobs: Optional[int] = None,
+        initial_jobs: Optional[int] = None,
+        interval: float = ADAPTIVE_INTERVAL,
+        cpu_pressure_high: float = ADAPTIVE_CPU_PRESSURE_HIGH,
+        cpu_pressure_low: float = ADAPTIVE_CPU_PRESSURE_LOW,
+        memory_pressure_high: float = ADAPTIVE_MEMORY_PRESSURE_HIGH,
+        min_available_mb: float = ADAPTIVE_MIN_AVAILABLE_MB,
+        reader: Callable[[], dict] = read_system_load
+    ):
+        """
+        初始化并发控制器
+        
+        Args:
+            min_jobs: 最少同时运行的任务数
+            max_jobs: 最多同时运行的任务数，None时为可用核数的一半
+            initial_jobs: 初始任务数，None时为min_jobs
+            interval: 两次调整之间的最短间隔（秒）
+            cpu_pressure_high: CPU压力高于该值时减少任务
+            cpu_pressure_low: CPU压力低于该值时可以增加任务
+            memory_pressure_high: 内存压力高于该值时减少任务
+            min_available_mb: 可用内存低于该值（MB）时减少任务
+            reader: 读取系统负载的函数，返回值格式同read_system_load
+        """
+        if min_jobs < 1:
+            raise ValueError(f"min_jobs必须是正整数，当前为: {min_jobs}")
+        self.min_jobs = min_jobs
+        self.max_jobs = max(min_jobs, max_jobs or _available_cpus() // 2)
+        self.jobs = min(max(initial_jobs or min_jobs, self.min_jobs), self.max_jobs)
+        self.interval = interval
+        self.cpu_pressure_high = cpu_pressure_high
+        self.cpu_pressure_low = cpu_pressure_low
+        self.memory_pressure_high = memory_pressure_high
+        self.min_available_mb = min_available_mb
+        self.reader = reader
+        # 每次调整的记录：{'time', 'jobs', 'reason', 'load'}
+        self.history = []
+        self._last_check = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+    
+    def target(self, running: int) -> int:
+        """
+        返回当前允许同时运行的任务数，距上次检查超过interval时按系统负载调整
+        
+        Args:
+            running: 正在运行的任务数
+            
+        Returns:
+            int: 目标任务数
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return self.jobs
+        self._last_check = now
+        load = self.reader()
+        overloaded, idle = self._assess(load)
+        if overloaded and self.jobs > self.min_jobs:
+            self._change(self.jobs - 1, overloaded, load)
+        elif idle and running >= self.jobs and self.jobs < self.max_jobs:
+            self._change(self.jobs + 1, "系统空闲", load)
+        return self.jobs
+    
+    def _assess(self, load: dict) -> tuple:
+        """
+        判断系统是否过载或空闲
+        
+        Returns:
+            tuple: (过载原因，不过载时为None, 是否空闲)
+        """
+        memory_pressure = load.get('memory_pressure')
+        if memory_pressure is not None and memory_pressure > self.memory_pressure_high:
+            return f"内存压力 {memory_pressure:.1f}%", False
+        available = load.get('mem_available_mb')
+        if available is not None and available < self.min_available_mb:
+            return f"可用内存 {available:.0f} MB", False
+        
+        cpu_pressure = load.get('cpu_pressure')
+        if cpu_pressure is not None:
+            if cpu_pressure > self.cpu_pressure_high:
+                return f"CPU压力 {cpu_pressure:.1f}%", False
+            return None, cpu_pressure < self.cpu_pressure_low
+        
+        # 没有PSI（旧内核、非Linux）时退回按每核的loadavg判断
+        loadavg = load.get('loadavg')
+        if loadavg is None:
+            return None, False
+        per_cpu = loadavg / max(1, load.get('cpus') or 1)
+        if per_cpu > ADAPTIVE_LOAD_HIGH:
+            return f"每核负载 {per_cpu:.2f}", False
+        return None, per_cpu < ADAPTIVE_LOAD_LOW
+    
+    def _change(self, jobs: int, reason: str, load: dict):
+        self.logger.info(f"调整并行任务数: {self.jobs} -> {jobs}（{reason}）")
+        self.jobs = jobs
+        self.history.append({'time': time.time(), 'jobs': jobs, 'reason': reason, 'load': load})
+
+
+class ProbeCache:
+    """
+    ffprobe结果的持久化缓存
+    
+    以(绝对路径, 探测参数)为主键，同时记录文件大小和mtime_ns，
+    文件被修改后缓存自动失效。超过容量上限时按最近使用时间淘汰（LRU）。
+    底层使用SQLite，支持多线程和多进程同时访问。
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 100000):
+        """
+        初始化探测缓存
+        
+        Args:
+            db_path: SQLite数据库文件路径，None时使用默认缓存目录下的probe_cache.sqlite3
+            max_entries: 最多缓存的条目数，超过后淘汰最久未使用的条目
+        """
+        if db_path is None:
+            db_path = str(_default_cache_dir() / 'probe_cache.sqlite3')
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # WAL模式下读写互不阻塞，适合多个批量任务同时使用同一个缓存
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS probe ('
+            ' path TEXT NOT NULL,'
+            ' options TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' data TEXT NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (path, options))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS probe_last_used ON probe (last_used)')
+        self._conn.commit()
+    
+    @staticmethod
+    def _key(video_file: str, options: List[str]) -> tuple:
+        """生成缓存键：(绝对路径, 探测参数, 文件大小, mtime_ns)"""
+        stat = os.stat(video_file)
+        return os.path.abspath(video_file), ' '.join(options), stat.st_size, stat.st_mtime_ns
+    
+    def get(self, video_file: str, options: List[str]) -> Optional[dict]:
+        """
+        读取缓存的探测结果
+        
+        Args:
+            video_file: 视频文件路径
+            options: 探测参数（如['-show_format', '-show_streams']）
+            
+        Returns:
+            dict: 缓存的ffprobe结果，未命中或文件已修改时返回None
+        """
+        try:
+            path, opts, size, mtime_ns = self._key(video_file, options)
+        except OSError:
+            return None
+        
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, data FROM probe WHERE path = ? AND options = ?',
+                (path, opts)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != size or row[1] != mtime_ns:
+                # 文件已被修改，旧结果作废
+                self._conn.execute(
+                    'DELETE FROM probe WHERE path = ? AND options = ?', (path, opts)
+                )
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                'UPDATE probe SET last_used = ? WHERE path = ? AND options = ?',
+                (time.time(), path, opts)
+            )
+            self._conn.commit()
+        return json.loads(row[2])
+    
+    def put(self, video_file: str, options: List[str], data: dict):
+        """
+        写入探测结果，超过容量上限时淘汰最久未使用的条目
+        
+        Args:
+            video_file: 视频文件路径
+            options: 探测参数
+            data: ffprobe结果
+        """
+        try:
+            path, opts, size, mtime_ns = self._key(video_file, options)
+        except OSError:
+            return
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO probe (path, options, size, mtime_ns, data, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (path, opts, size, mtime_ns, json.dumps(data), time.time())
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM probe').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM probe WHERE rowid IN ('
+                    ' SELECT rowid FROM probe ORDER BY last_used LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute('DELETE FROM probe')
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM probe').fetchone()[0]
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class CostModel:
+    """
+    编码耗时的线性模型：每秒视频的编码耗时 = intercept + slope × 百万像素
+    
+    同一质量档位下，编码耗时基本与视频时长成正比，而单位时长的耗时
+    随分辨率（每帧像素数）近似线性增长，因此对(百万像素, 单位时长耗时)
+    做一元最小二乘拟合即可。峰值内存（MB）与分辨率同样近似线性，也用本模型拟合
+    """
+    
+    def __init__(self, intercept: float, slope: float = 0.0, samples: int = 0):
+        self.intercept = intercept
+        self.slope = slope
+        self.samples = samples
+    
+    @classmethod
+    def fit(cls, points: List[tuple], fallback: 'CostModel') -> 'CostModel':
+        """
+        用历史样本拟合模型
+        
+        Args:
+            points: (百万像素, 每秒视频的编码耗时)样本列表
+            fallback: 没有样本时使用的模型
+            
+        Returns:
+            CostModel: 拟合结果。样本的分辨率都相同或拟合出负斜率时退化为均值模型
+        """
+        if not points:
+            return fallback
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if var_x <= 1e-12:
+            return cls(mean_y, 0.0, n)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+        intercept = mean_y - slope * mean_x
+        if slope < 0 or intercept < 0:
+            # 样本太少或噪声太大，线性关系不可信，退化为均值
+            return cls(mean_y, 0.0, n)
+        return cls(intercept, slope, n)
+    
+    def value(self, megapixels: Optional[float]) -> float:
+        """模型在给定分辨率下的值，分辨率未知时只使用截距"""
+        return self.intercept + self.slope * (megapixels or 0.0)
+    
+    def seconds_per_media_second(self, megapixels: Optional[float]) -> float:
+        """每秒视频的预计编码耗时，分辨率未知时只使用截距"""
+        return self.value(megapixels)
+    
+    def predict(self, duration: float, megapixels: Optional[float]) -> float:
+        """
+        预测编码耗时
+        
+        Args:
+            duration: 视频时长（秒）
+            megapixels: 每帧百万像素数（宽×高/10^6），未知时为None
+            
+        Returns:
+            float: 预计编码耗时（秒）
+        """
+        return max(duration, 0.0) * self.seconds_per_media_second(megapixels)
+    
+    def to_dict(self) -> dict:
+        return {'intercept': self.intercept, 'slope': self.slope, 'samples': self.samples}
+
+
+class PerfHistory:
+    """
+    转换任务的性能历史
+    
+    每个成功的转换任务记录一条统计（视频时长、分辨率、质量档位、编码方式、
+    墙钟耗时、CPU时间、编码速度、峰值内存），按(质量, 编码方式)拟合CostModel，
+    用于在任务开始前预测耗时和峰值内存。底层使用SQLite，与ProbeCache同样支持多线程和多进程访问。
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 10000):
+        """
+        初始化性能历史
+        
+        Args:
+            db_path: SQLite数据库文件路径，None时使用默认缓存目录下的perf_history.sqlite3
+            max_entries: 最多保留的记录数，超过后删除最早的记录
+        """
+        if db_path is None:
+            db_path = str(_default_cache_dir() / 'perf_history.sqlite3')
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._models = {}
+        self._memory_models = {}
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' finished REAL NOT NULL,'
+            ' input TEXT NOT NULL,'
+            ' quality TEXT NOT NULL,'
+            ' mode TEXT NOT NULL,'
+            ' duration REAL NOT NULL,'
+            ' width INTEGER,'
+            ' height INTEGER,'
+            ' wall_seconds REAL NOT NULL,'
+            ' cpu_seconds REAL,'
+            ' speed REAL,'
+            ' max_rss_kb INTEGER)'
+        )
+        # 旧版本创建的数据库没有max_rss_kb列
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(runs)')]
+        if 'max_rss_kb' not in columns:
+            self._conn.execute('ALTER TABLE runs ADD COLUMN max_rss_kb INTEGER')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS runs_key ON runs (quality, mode, id)')
+        self._conn.commit()
+    
+    @staticmethod
+    def default_model(quality: str, mode: str) -> CostModel:
+        """没有历史数据时使用的经验模型"""
+        if mode == 'copy':
+            return CostModel(1.0 / COPY_REALTIME_SPEED)
+        speed = QUALITY_REALTIME_SPEED.get(quality, QUALITY_REALTIME_SPEED['medium'])
+        return CostModel(1.0 / speed)
+    
+    @staticmethod
+    def default_memory_model(quality: str, mode: str) -> CostModel:
+        """
+        没有历史数据时的峰值内存经验模型（MB）
+        
+        直接复制视频流时只有基础内存；重新编码时libx264按preset缓存一定数量的帧，
+        内存随每帧像素数线性增长
+        """
+        if mode == 'copy':
+            return CostModel(MEMORY_BASE_MB)
+        frames = X264_BUFFERED_FRAMES.get(quality, X264_BUFFERED_FRAMES['medium'])
+        return CostModel(MEMORY_BASE_MB, frames * X264_BYTES_PER_PIXEL * 1e6 / (1 << 20))
+    
+    def record(
+        self,
+        input_file: str,
+        quality: str,
+        mode: str,
+        duration: float,
+        width: Optional[int],
+        height: Optional[int],
+        wall_seconds: float,
+        cpu_seconds: Optional[float] = None,
+        max_rss_kb: Optional[int] = None
+    ):
+        """
+        记录一个完成的转换任务
+        
+        Args:
+            input_file: 输入文件路径
+            quality: 质量档位
+            mode: 视频流的处理方式，'encode'或'copy'
+            duration: 视频时长（秒）
+            width: 视频宽度，未知时为None
+            height: 视频高度，未知时为None
+            wall_seconds: 转换的墙钟耗时（秒）
+            cpu_seconds: FFmpeg进程消耗的CPU时间（秒），无法获取时为None
+            max_rss_kb: FFmpeg进程的峰值常驻内存（KB），无法获取时为None
+        """
+        if duration <= 0 or wall_seconds <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO runs (finished, input, quality, mode, duration, width, height,'
+                ' wall_seconds, cpu_seconds, speed, max_rss_kb)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), os.path.abspath(input_file), quality, mode, duration,
+                 width, height, wall_seconds, cpu_seconds, duration / wall_seconds, max_rss_kb)
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM runs WHERE id IN (SELECT id FROM runs ORDER BY id LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+            self._models.pop((quality, mode), None)
+            self._memory_models.pop((quality, mode), None)
+    
+    def model(self, quality: str, mode: str = 'encode') -> CostModel:
+        """
+        获取(质量, 编码方式)的耗时模型，用最近PERF_MODEL_SAMPLES条记录拟合
+        
+        Args:
+            quality: 质量档位
+            mode: 'encode'或'copy'
+            
+        Returns:
+            CostModel: 拟合的模型，没有记录时为经验模型
+        """
+        key = (quality, mode)
+        with self._lock:
+            if key not in self._models:
+                rows = self._conn.execute(
+                    'SELECT duration, width, height, wall_seconds FROM runs'
+                    ' WHERE quality = ? AND mode = ? ORDER BY id DESC LIMIT ?',
+                    (quality, mode, PERF_MODEL_SAMPLES)
+                ).fetchall()
+                points = [
+                    ((w * h / 1e6) if w and h else 0.0, wall / duration)
+                    for duration, w, h, wall in rows
+                ]
+                self._models[key] = CostModel.fit(points, self.default_model(quality, mode))
+            return self._models[key]
+    
+    def memory_model(self, quality: str, mode: str = 'encode') -> CostModel:
+        """
+        获取(质量, 编码方式)的峰值内存模型（MB），用最近PERF_MODEL_SAMPLES条有内存记录的任务拟合
+        
+        Args:
+            quality: 质量档位
+            mode: 'encode'或'copy'
+            
+        Returns:
+            CostModel: 拟合的模型，没有记录时为经验模型
+        """
+        key = (quality, mode)
+        with self._lock:
+            if key not in self._memory_models:
+                rows = self._conn.execute(
+                    'SELECT width, height, max_rss_kb FROM runs'
+                    ' WHERE quality = ? AND mode = ? AND max_rss_kb IS NOT NULL'
+                    ' ORDER BY id DESC LIMIT ?',
+                    (quality, mode, PERF_MODEL_SAMPLES)
+                ).fetchall()
+                points = [
+                    ((w * h / 1e6) if w and h else MEMORY_DEFAULT_MEGAPIXELS, rss / 1024)
+                    for w, h, rss in rows
+                ]
+                self._memory_models[key] = CostModel.fit(
+                    points, self.default_memory_model(quality, mode)
+                )
+            return self._memory_models[key]
+    
+    def predict(
+        self,
+        duration: float,
+        width: Optional[int],
+        height: Optional[int],
+        quality: str,
+        mode: str = 'encode'
+    ) -> float:
+        """
+        预测一个转换任务的墙钟耗时
+        
+        Args:
+            duration: 视频时长（秒）
+            width: 视频宽度，未知时为None
+            height: 视频高度，未知时为None
+            quality: 质量档位
+            mode: 'encode'或'copy'
+            
+        Returns:
+            float: 预计耗时（秒）
+        """
+        megapixels = width * height / 1e6 if width and height else None
+        return self.model(quality, mode).predict(duration, megapixels)
+    
+    def summary(self) -> List[dict]:
+        """
+        按(质量, 编码方式)汇总历史记录和当前模型
+        
+        Returns:
+            List[dict]: 每项包含quality、mode、runs、media_seconds、wall_seconds、
+                        cpu_seconds、mean_speed和model（模型参数）
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT quality, mode, COUNT(*), SUM(duration), SUM(wall_seconds),'
+                ' SUM(cpu_seconds) FROM runs GROUP BY quality, mode ORDER BY quality, mode'
+            ).fetchall()
+        stats = []
+        for quality, mode, runs, media, wall, cpu in rows:
+            stats.append({
+                'quality': quality,
+                'mode': mode,
+                'runs': runs,
+                'media_seconds': media,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'mean_speed': media / wall if wall else None,
+                'model': self.model(quality, mode).to_dict(),
+            })
+        return stats
+    
+    def clear(self):
+        """清空历史记录"""
+        with self._lock:
+            self._conn.execute('DELETE FROM runs')
+            self._conn.commit()
+            self._models.clear()
+            self._memory_models.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+# 进度回调的最小进度步长（百分比）和默认最短时间间隔（秒）
+PROGRESS_STEP = 1.0
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+# 媒体时间和已读取的输入字节数都没有前进超过该秒数时，认为FFmpeg已停滞并记录警告
+STALL_WARN_SECONDS = 60.0
+
+# 看门狗检查FFmpeg进程状态的间隔（秒）
+WATCHDOG_POLL_SECONDS = 1.0
+
+# 看门狗终止FFmpeg的原因
+WATCHDOG_STALLED = 'stalled'
+WATCHDOG_TOO_SLOW = 'too_slow'
+WATCHDOG_TIMEOUT = 'timeout'
+
+# -movflags +faststart在编码结束后把moov移到文件开头时，FFmpeg在stderr输出的提示
+FASTSTART_MARKER = 'Starting second pass: moving the moov atom'
+
+# 多码率输出：每档默认的音频码率，以及按目标码率编码时VBV缓冲区相对码率的倍数
+DEFAULT_RENDITION_AUDIO_BITRATE = '128k'
+RENDITION_BUFSIZE_FACTOR = 2
+
+# 流媒体打包：封装格式、分片类型和默认分片时长（秒）
+PACKAGE_FORMATS = ('hls', 'dash')
+PACKAGE_SEGMENT_TYPES = ('fmp4', 'ts')
+DEFAULT_SEGMENT_SECONDS = 6
+
+# HLS主播放列表和DASH清单的文件名
+HLS_MASTER_PLAYLIST = 'master.m3u8'
+DASH_MANIFEST = 'manifest.mpd'
+
+# FFmpeg的stderr只保留最后这么多行；失败时写入日志的行数
+STDERR_TAIL_LINES = 200
+FAILURE_LOG_LINES = 10
+
+# asyncio版本每次从stderr读取的字节数
+STDERR_READ_SIZE = 65536
+
+# 转换失败的原因
+FAILURE_MISSING_DECODER = 'missing_decoder'
+FAILURE_MISSING_ENCODER = 'missing_encoder'
+FAILURE_CORRUPT_INPUT = 'corrupt_input'
+FAILURE_DISK_FULL = 'disk_full'
+FAILURE_PERMISSION = 'permission_denied'
+FAILURE_NOT_FOUND = 'not_found'
+FAILURE_KILLED = 'killed'
+FAILURE_OUT_OF_MEMORY = 'out_of_memory'
+FAILURE_TIMEOUT = WATCHDOG_TIMEOUT
+FAILURE_STALLED = WATCHDOG_STALLED
+FAILURE_TOO_SLOW = WATCHDOG_TOO_SLOW
+FAILURE_INVALID_PATH = 'invalid_path'
+FAILURE_INVALID_OUTPUT = 'invalid_output'
+FAILURE_ERROR = 'error'
+FAILURE_UNKNOWN = 'unknown'
+
+# 按stderr内容识别失败原因，按顺序匹配，先匹配到的优先
+FAILURE_PATTERNS = [
+    (FAILURE_DISK_FULL, ('No space left on device', 'Disk quota exceeded')),
+    (FAILURE_MISSING_DECODER, ('not found for input stream', 'Unknown decoder', 'Decoder not found')),
+    (FAILURE_MISSING_ENCODER, ('not found for output stream', 'Unknown encoder', 'Encoder not found')),
+    (FAILURE_PERMISSION, ('Permission denied',)),
+    (FAILURE_NOT_FOUND, ('No such file or directory',)),
+    (FAILURE_CORRUPT_INPUT, (
+        'Invalid data found when processing input', 'moov atom not found',
+        'rror while decoding', 'corrupt', 'Invalid NAL unit', 'concealing',
+        'Error splitting the input into NAL units',
+    )),
+    (FAILURE_OUT_OF_MEMORY, ('Cannot allocate memory', 'Out of memory', 'malloc of size')),
+    (FAILURE_KILLED, ('received signal',)),
+]
+
+FAILURE_DESCRIPTIONS = {
+    FAILURE_MISSING_DECODER: '缺少解码器',
+    FAILURE_MISSING_ENCODER: '缺少编码器',
+    FAILURE_CORRUPT_INPUT: '输入文件损坏',
+    FAILURE_DISK_FULL: '磁盘空间不足',
+    FAILURE_PERMISSION: '没有权限',
+    FAILURE_NOT_FOUND: '文件不存在',
+    FAILURE_KILLED: '进程被终止',
+    FAILURE_OUT_OF_MEMORY: '内存不足',
+    FAILURE_TIMEOUT: '超过耗时上限',
+    FAILURE_STALLED: '长时间没有进展',
+    FAILURE_TOO_SLOW: '编码速度过低',
+    FAILURE_INVALID_PATH: '输入或输出路径无效',
+    FAILURE_INVALID_OUTPUT: '输出文件结构无效',
+    FAILURE_ERROR: '程序错误',
+    FAILURE_UNKNOWN: '未知错误',
+}
+
+# 换用更快的preset重试可能成功的失败原因
+# （更快的preset的lookahead和参考帧更少，内存占用也更低）
+RETRYABLE_FAILURES = (
+    FAILURE_TIMEOUT, FAILURE_STALLED, FAILURE_TOO_SLOW, FAILURE_KILLED, FAILURE_OUT_OF_MEMORY
+)
+
+# 被看门狗终止后重试时改用的更快的质量档位
+QUALITY_FALLBACK = {
+    'high': 'medium',
+    'medium': 'low',
+    'low': 'low'
+}
+
+
+def _parse_progress_number(value: Optional[str], suffix: str = '') -> Optional[float]:
+    """解析-progress中的数值字段（如"1234.5kbits/s"、"1.5x"），N/A或无法解析时返回None"""
+    if value is None:
+        return None
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _parse_progress_count(value: Optional[str]) -> Optional[int]:
+    """解析-progress中的计数字段（帧数、字节数）"""
+    number = _parse_progress_number(value)
+    return int(number) if number is not None else None
+
+
+def _parse_progress_clock(value: Optional[str]) -> Optional[float]:
+    """将"HH:MM:SS.micro"格式的时间转换为秒"""
+    if not value:
+        return None
+    hours, sep1, rest = value.strip().partition(':')
+    minutes, sep2, seconds = rest.partition(':')
+    if not (sep1 and sep2):
+        return None
+    try:
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+
+def _read_progress_blocks(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    把-progress输出的key=value行组装为数据块
+    
+    FFmpeg每次输出一组key=value行，以progress=continue或progress=end结尾，
+    这里按块收集，每遇到progress行就产出一个完整的字段字典
+    
+    Args:
+        lines: 逐行的-progress输出
+        
+    Yields:
+        Dict[str, str]: 一个数据块的全部字段
+    """
+    fields = {}
+    for line in lines:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        fields[key] = value
+        if key == 'progress':
+            yield fields
+            fields = {}
+
+
+class ProgressEvent:
+    """
+    FFmpeg -progress输出的一个数据块
+    
+    Attributes:
+        frame: 已输出的帧数
+        fps: 当前编码帧率
+        bitrate: 当前输出码率（kbit/s）
+        total_size: 已写出的字节数
+        out_time: 已编码到的媒体时间（秒）
+        speed: 编码速度（实时倍数）
+        dup_frames / drop_frames: 复制和丢弃的帧数
+        state: 'continue'或'end'
+        percent: 相对于总时长的百分比，总时长未知时为None
+        eta: 按当前速度估算的剩余时间（秒），无法估算时为None
+        bytes_read / input_size: 输入文件的读取位置和大小（字节），仅Linux下可用，否则为None
+        timestamp: 收到该数据块时的time.monotonic()
+        fields: 原始字段字典
+    """
+    
+    def __init__(self, fields: Dict[str, str], total_duration: float = 0):
+        self.fields = fields
+        self.frame = _parse_progress_count(fields.get('frame'))
+        self.fps = _parse_progress_number(fields.get('fps'))
+        self.bitrate = _parse_progress_number(fields.get('bitrate'), 'kbits/s')
+        self.total_size = _parse_progress_count(fields.get('total_size'))
+        self.speed = _parse_progress_number(fields.get('speed'), 'x')
+        self.dup_frames = _parse_progress_count(fields.get('dup_frames'))
+        self.drop_frames = _parse_progress_count(fields.get('drop_frames'))
+        self.state = fields.get('progress')
+        self.timestamp = time.monotonic()
+        
+        # out_time_us是微秒；部分版本的out_time_ms实际上也是微秒
+        out_time_us = _parse_progress_number(fields.get('out_time_us'))
+        if out_time_us is None:
+            out_time_us = _parse_progress_number(fields.get('out_time_ms'))
+        if out_time_us is not None:
+            self.out_time = max(out_time_us, 0) / 1e6
+        else:
+            self.out_time = _parse_progress_clock(fields.get('out_time'))
+        
+        self.percent = None
+        if total_duration > 0 and self.out_time is not None:
+            # 计算转换百分比，确保不超过100%
+            self.percent = min(self.out_time / total_duration * 100, 100.0)
+        
+        self.eta = None
+        if self.percent is not None and self.speed:
+            self.eta = max(total_duration - self.out_time, 0) / self.speed
+        
+        # 由InputReadMonitor填充
+        self.bytes_read = None
+        self.input_size = None
+    
+    @property
+    def ended(self) -> bool:
+        """是否为FFmpeg输出的最后一个数据块"""
+        return self.state == 'end'
+    
+    def to_dict(self) -> dict:
+        """转换为字典（便于输出JSON）"""
+        return {
+            'frame': self.frame,
+            'fps': self.fps,
+            'bitrate': self.bitrate,
+            'total_size': self.total_size,
+            'out_time': self.out_time,
+            'speed': self.speed,
+            'dup_frames': self.dup_frames,
+            'drop_frames': self.drop_frames,
+            'state': self.state,
+            'percent': self.percent,
+            'eta': self.eta,
+            'bytes_read': self.bytes_read,
+            'input_size': self.input_size,
+        }
+    
+    def __repr__(self) -> str:
+        return f"ProgressEvent(out_time={self.out_time}, percent={self.percent}, state={self.state!r})"
+
+
+class InputReadMonitor:
+    """
+    通过Linux的/proc统计FFmpeg已读取到输入文件的哪个位置
+    
+    输入文件时长未知（如RMVB索引损坏）时，用读取位置相对文件大小的比例作为进度。
+    优先读取/proc/<pid>/fdinfo中输入文件描述符的pos（当前读取位置），
+    找不到该描述符时退化为/proc/<pid>/io中的rchar（进程累计读取的字节数）。
+    同时记录媒体时间或读取位置最后一次前进的时间，用于停滞检测。
+    非Linux系统上available为False，所有读数都为None。
+    """
+    
+    def __init__(self, pid: int, input_file: Optional[str]):
+        """
+        Args:
+            pid: FFmpeg进程号
+            input_file: 输入文件路径，None时只做停滞检测
+        """
+        self.pid = pid
+        self.proc_dir = Path(f"/proc/{pid}")
+        self.input_path = os.path.realpath(input_file) if input_file else None
+        try:
+            self.input_size = os.path.getsize(input_file) if input_file else None
+        except OSError:
+            self.input_size = None
+        self.available = self.proc_dir.is_dir() and bool(self.input_size)
+        self.start_time = time.monotonic()
+        self.last_advance = self.start_time
+        self.stall_warned = False
+        self.out_time = None
+        self._fd = None
+        self._last_key = None
+        # 进度读取线程和看门狗线程都会调用update/poll
+        self._lock = threading.Lock()
+    
+    def _find_input_fd(self) -> Optional[str]:
+        """在/proc/<pid>/fd中查找指向输入文件的文件描述符"""
+        try:
+            for fd in os.listdir(self.proc_dir / 'fd'):
+                try:
+                    if os.readlink(self.proc_dir / 'fd' / fd) == self.input_path:
+                        return fd
+                except OSError:
+                    continue
+        except OSError:
+            pass
+        return None
+    
+    def position(self) -> Optional[int]:
+        """
+        读取FFmpeg在输入文件中的当前位置（字节）
+        
+        Returns:
+            int: 读取位置，不超过文件大小；无法获取时返回None
+        """
+        if not self.available:
+            return None
+        if self._fd is None:
+            self._fd = self._find_input_fd()
+        if self._fd is not None:
+            try:
+                with open(self.proc_dir / 'fdinfo' / self._fd, 'r') as f:
+                    for line in f:
+                        if line.startswith('pos:'):
+                            return min(int(line.split()[1]), self.input_size)
+            except (OSError, ValueError):
+                # 描述符已关闭（输入读完或被重新打开），下次重新查找
+                self._fd = None
+        try:
+            with open(self.proc_dir / 'io', 'r') as f:
+                for line in f:
+                    if line.startswith('rchar:'):
+                        return min(int(line.split()[1]), self.input_size)
+        except (OSError, ValueError):
+            pass
+        return None
+    
+    def update(self, event: 'ProgressEvent'):
+        """
+        用当前读取位置补充进度事件，并更新停滞检测的状态
+        
+        事件没有基于时长的百分比时，按读取位置/文件大小计算percent，
+        按开始以来的平均读取速度计算eta
+        
+        Args:
+            event: 刚解析出的进度事件，会被原地修改
+        """
+        with self._lock:
+            now = time.monotonic()
+            position = self.position()
+            if position is not None:
+                event.bytes_read = position
+                event.input_size = self.input_size
+                if event.percent is None:
+                    event.percent = position / self.input_size * 100
+                    elapsed = now - self.start_time
+                    if position > 0 and elapsed > 0:
+                        event.eta = (self.input_size - position) / (position / elapsed)
+            if event.out_time is not None:
+                self.out_time = event.out_time
+            self._note(now, position)
+    
+    def poll(self):
+        """
+        在两个进度数据块之间单独采样读取位置
+        
+        FFmpeg卡在读取或解码上时不会再输出进度数据块，看门狗靠这里发现它是否还在读取输入
+        """
+        with self._lock:
+            self._note(time.monotonic(), self.position())
+    
+    def _note(self, now: float, position: Optional[int]):
+        """媒体时间或读取位置变化时记录最后一次前进的时间"""
+        key = (self.out_time, position)
+        if key != self._last_key:
+            self._last_key = key
+            self.last_advance = now
+    
+    def idle_seconds(self) -> float:
+        """媒体时间和读取位置都没有前进的持续时间（秒）"""
+        return time.monotonic() - self.last_advance
+
+
+# 抢占方式：'stop'用SIGSTOP/SIGCONT暂停和恢复低优先级的FFmpeg进程；
+# 'nice'只把它们的nice值调到PREEMPT_NICE，恢复时尝试还原（普通用户无权调低nice值时保持不变）
+PREEMPT_MODES = ('stop', 'nice')
+PREEMPT_NICE = 19
+
+
+class PreemptedJob:
+    """在PreemptionScheduler中登记的一个FFmpeg进程"""
+    
+    def __init__(self, process, priority: int, label: str = ''):
+        # subprocess.Popen或asyncio.subprocess.Process
+        self.process = process
+        self.priority = priority
+        self.label = label
+        # 当前暂停开始的time.monotonic()，未暂停时为None
+        self.paused_at = None
+        # 已结束的暂停区间[(开始, 结束)]
+        self.intervals = []
+        self._original_nice = None
+    
+    @property
+    def paused(self) -> bool:
+        return self.paused_at is not None
+    
+    def paused_seconds(self, since: Optional[float] = None) -> float:
+        """
+        累计暂停时间（秒），包括正在进行的暂停
+        
+        Args:
+            since: 只统计该时刻（time.monotonic()）之后的部分，None时统计全部
+        """
+        now = time.monotonic()
+        intervals = self.intervals + ([(self.paused_at, now)] if self.paused_at is not None else [])
+        total = 0.0
+        for start, end in intervals:
+            if since is not None:
+                start = max(start, since)
+            total += max(0.0, end - start)
+        return total
+
+
+class PreemptionScheduler:
+    """
+    按优先级抢占FFmpeg进程
+    
+    所有FFmpeg进程启动后都在这里登记优先级。只要有更高优先级的进程在运行，
+    低优先级的进程就被暂停（SIGSTOP）或降低调度优先级（nice），把CPU让给高优先级任务；
+    高优先级任务结束后自动恢复。暂停的进程保留全部状态，恢复后从原处继续编码。
+    
+    同一进程内的多个VideoConverter默认共享PreemptionScheduler.default()，
+    因此批量转换进行中另起线程调用convert_rmvb_to_mp4(priority=10)即可插队
+    """
+    
+    _default = None
+    _default_lock = threading.Lock()
+    
+    def __init__(self, mode: str = 'stop'):
+        """
+        Args:
+            mode: 抢占方式，'stop'或'nice'，见PREEMPT_MODES
+        """
+        if mode not in PREEMPT_MODES:
+            raise ValueError(f"未知的抢占方式: {mode}")
+        self.logger = logging.getLogger(__name__)
+        if mode == 'stop' and not hasattr(signal, 'SIGSTOP'):
+            self.logger.warning("当前平台不支持SIGSTOP，改为调整nice值")
+            mode = 'nice'
+        if mode == 'nice' and not hasattr(os, 'setpriority'):
+            # Windows既没有SIGSTOP也没有os.getpriority/setpriority
+            self.logger.warning("当前平台不支持调整nice值，不进行抢占")
+            mode = None
+        # None表示当前平台无法抢占，只登记进程、不暂停
+        self.mode = mode
+        self._jobs = []
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def default(cls) -> 'PreemptionScheduler':
+        """进程内共享的调度器"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+    
+    def register(self, process, priority: int = 0, label: str = '') -> PreemptedJob:
+        """
+        登记一个刚启动的FFmpeg进程，必要时暂停优先级更低的进程（或立即暂停该进程）
+        
+        Args:
+            process: subprocess.Popen或asyncio.subprocess.Process
+            priority: 优先级，数值越大越优先
+            label: 日志中显示的名称
+            
+        Returns:
+            PreemptedJob: 登记记录，进程结束前必须传给unregister
+        """
+        job = PreemptedJob(process, priority, label)
+        with self._lock:
+            self._jobs.append(job)
+            self._rebalance()
+        return job
+    
+    def unregister(self, job: PreemptedJob):
+        """
+        注销进程（在回收进程之前调用），被暂停的进程先恢复，再恢复因它而暂停的其他进程
+        
+        Args:
+            job: register返回的登记记录
+        """
+        with self._lock:
+            if job.paused:
+                self._resume(job)
+            if job in self._jobs:
+                self._jobs.remove(job)
+            self._rebalance()
+    
+    def paused_jobs(self) -> List[PreemptedJob]:
+        """当前被暂停的进程"""
+        with self._lock:
+            return [job for job in self._jobs if job.paused]
+    
+    def _rebalance(self):
+        """暂停低于当前最高优先级的进程，恢复达到最高优先级的进程（调用方持有锁）"""
+        if not self._jobs or self.mode is None:
+            return
+        top = max(job.priority for job in self._jobs)
+        for job in self._jobs:
+            if job.priority < top and not job.paused:
+                self._pause(job)
+            elif job.priority >= top and job.paused:
+                self._resume(job)
+    
+    def _pause(self, job: PreemptedJob):
+        pid = job.process.pid
+        try:
+            if self.mode == 'stop':
+                job.process.send_signal(signal.SIGSTOP)
+            else:
+                job._original_nice = os.getpriority(os.PRIO_PROCESS, pid)
+                os.setpriority(os.PRIO_PROCESS, pid, PREEMPT_NICE)
+        except (ProcessLookupError, PermissionError, OSError) as e:
+            self.logger.debug(f"暂停进程 {pid} 失败: {str(e)}")
+            return
+        job.paused_at = time.monotonic()
+        self.logger.info(f"为高优先级任务暂停: {job.label or pid}（优先级 {job.priority}）")
+    
+    def _resume(self, job: PreemptedJob):
+        pid = job.process.pid
+        try:
+            if self.mode == 'stop':
+                job.process.send_signal(signal.SIGCONT)
+            elif job._original_nice is not None:
+                os.setpriority(os.PRIO_PROCESS, pid, job._original_nice)
+        except (ProcessLookupError, PermissionError, OSError) as e:
+            self.logger.debug(f"恢复进程 {pid} 失败: {str(e)}")
+        job.intervals.append((job.paused_at, time.monotonic()))
+        job.paused_at = None
+        self.logger.info(f"恢复任务: {job.label or pid}（暂停了 {job.intervals[-1][1] - job.intervals[-1][0]:.0f} 秒）")
+
+
+class WatchdogPolicy:
+    """
+    FFmpeg子进程看门狗的触发条件
+    
+    任一条件满足时看门狗终止FFmpeg进程，该次转换按失败处理，
+    并可按retries用QUALITY_FALLBACK中更快的质量档位重试
+    """
+    
+    def __init__(
+        self,
+        stall_timeout: Optional[float] = 300.0,
+        min_speed: Optional[float] = None,
+        max_wall_factor: Optional[float] = None,
+        grace_seconds: float = 60.0,
+        retries: int = 0
+    ):
+        """
+        Args:
+            stall_timeout: 媒体时间（out_time）和输入读取位置都没有前进的最长秒数，None表示不检查
+            min_speed: 最低平均编码速度（实时倍数，如0.1），None表示不检查
+            max_wall_factor: 单个任务的墙钟耗时上限为视频时长乘以该系数，
+                             None或时长未知时不限制
+            grace_seconds: 开始后的宽限时间（秒），速度检查从宽限期后开始，
+                           墙钟上限也不低于该值
+            retries: 被看门狗终止后重试的次数
+        """
+        self.stall_timeout = stall_timeout
+        self.min_speed = min_speed
+        self.max_wall_factor = max_wall_factor
+        self.grace_seconds = grace_seconds
+        self.retries = retries
+
+
+class Watchdog:
+    """按WatchdogPolicy检查一个正在运行的FFmpeg进程"""
+    
+    def __init__(
+        self,
+        policy: WatchdogPolicy,
+        monitor: InputReadMonitor,
+        total_duration: float,
+        job: Optional[PreemptedJob] = None
+    ):
+        """
+        Args:
+            policy: 触发条件
+            monitor: 该进程的读取位置监视器，同时提供媒体时间和最后一次前进的时间
+            total_duration: 视频总时长（秒），0表示未知
+            job: 该进程在抢占调度器中的登记记录。被暂停期间不做检查，
+                 暂停时间也不计入耗时和停滞时间
+        """
+        self.policy = policy
+        self.monitor = monitor
+        self.total_duration = total_duration
+        self.job = job
+        self.reason = None
+    
+    def _elapsed(self) -> float:
+        """扣除暂停时间后的运行时间（秒）"""
+        elapsed = time.monotonic() - self.monitor.start_time
+        if self.job is not None:
+            elapsed -= self.job.paused_seconds()
+        return elapsed
+    
+    def _idle(self) -> float:
+        """扣除暂停时间后的停滞时间（秒）"""
+        idle = self.monitor.idle_seconds()
+        if self.job is not None:
+            idle -= self.job.paused_seconds(since=self.monitor.last_advance)
+        return idle
+    
+    def check(self) -> Optional[str]:
+        """
+        检查进程是否需要终止
+        
+        Returns:
+            str: 终止原因（WATCHDOG_STALLED/WATCHDOG_TOO_SLOW/WATCHDOG_TIMEOUT），不需要终止时返回None
+        """
+        policy = self.policy
+        if self.job is not None and self.job.paused:
+            return None
+        self.monitor.poll()
+        elapsed = self._elapsed()
+        
+        if policy.stall_timeout and self._idle() >= policy.stall_timeout:
+            self.reason = WATCHDOG_STALLED
+        elif (policy.max_wall_factor and self.total_duration > 0
+              and elapsed > max(self.total_duration * policy.max_wall_factor, policy.grace_seconds)):
+            self.reason = WATCHDOG_TIMEOUT
+        elif (policy.min_speed and elapsed >= policy.grace_seconds
+              and (self.monitor.out_time or 0.0) / elapsed < policy.min_speed):
+            self.reason = WATCHDOG_TOO_SLOW
+        return self.reason
+    
+    def describe(self) -> str:
+        """终止原因的说明"""
+        elapsed = self._elapsed()
+        if self.reason == WATCHDOG_STALLED:
+            return f"FFmpeg已 {self._idle():.0f} 秒没有进展"
+        if self.reason == WATCHDOG_TIMEOUT:
+            return f"运行 {elapsed:.0f} 秒，超过按视频时长计算的上限"
+        if self.reason == WATCHDOG_TOO_SLOW:
+            speed = (self.monitor.out_time or 0.0) / elapsed if elapsed > 0 else 0.0
+            return f"平均编码速度 {speed:.2f}x 低于下限 {self.policy.min_speed}x"
+        return ""
+
+
+class ProgressThrottle:
+    """
+    进度回调节流：进度至少前进PROGRESS_STEP且距上次回调至少interval秒才允许回调，
+    到达100%时总是允许，保证最终进度一定能报告出去
+    """
+    
+    def __init__(self, interval: float = DEFAULT_PROGRESS_INTERVAL, step: float = PROGRESS_STEP):
+        self.interval = interval
+        self.step = step
+        self.last_percent = 0.0
+        self.last_time = 0.0
+    
+    def ready(self, percent: float) -> bool:
+        """判断本次进度是否需要回调，需要时同时记录本次回调"""
+        now = time.monotonic()
+        if percent < 100.0:
+            if percent - self.last_percent < self.step or now - self.last_time < self.interval:
+                return False
+        elif self.last_percent >= 100.0:
+            return False
+        self.last_percent = percent
+        self.last_time = now
+        return True
+
+
+class ConversionCancelled(Exception):
+    """进度回调主动取消转换时抛出的异常"""
+
+
+class ProgressIterator:
+    """
+    在后台线程中运行转换，并把ProgressEvent逐个交给迭代方
+    
+    迭代结束后success为转换结果；close()设置取消标志，FFmpeg进程被直接终止
+    （不需要等到下一个进度事件），未完成的输出被删除
+    """
+    
+    _DONE = object()
+    
+    def __init__(self, run: Callable[[Callable[[ProgressEvent], None], threading.Event], bool]):
+        """
+        Args:
+            run: 接收事件回调和取消标志并执行转换的函数，返回转换是否成功。
+                 取消标志被设置时应尽快终止FFmpeg进程
+        """
+        self.success = None
+        self._events = queue.Queue()
+        self._cancelled = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._worker, args=(run,), daemon=True)
+        self._thread.start()
+    
+    def _on_event(self, event: ProgressEvent):
+        if self._cancelled.is_set():
+            raise ConversionCancelled()
+        self._events.put(event)
+    
+    def _worker(self, run):
+        try:
+            self.success = bool(run(self._on_event, self._cancelled))
+        except ConversionCancelled:
+            self.success = False
+        except BaseException as e:
+            self.success = False
+            self._error = e
+        finally:
+            self._events.put(self._DONE)
+    
+    def __iter__(self) -> Iterator[ProgressEvent]:
+        return self
+    
+    def __next__(self) -> ProgressEvent:
+        if self._thread is None:
+            raise StopIteration
+        item = self._events.get()
+        if item is self._DONE:
+            self._thread.join()
+            self._thread = None
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        return item
+    
+    def close(self):
+        """取消尚未结束的转换并等待后台线程退出"""
+        if self._thread is None:
+            return
+        self._cancelled.set()
+        self._thread.join()
+        self._thread = None
+    
+    def __enter__(self) -> 'ProgressIterator':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _classify_failure(
+    returncode: int,
+    stderr: str,
+    watchdog_reason: Optional[str] = None
+) -> tuple:
+    """
+    根据返回码、stderr和看门狗记录判断FFmpeg失败的原因
+    
+    Args:
+        returncode: 进程返回码（负数表示被信号终止）
+        stderr: FFmpeg的stderr（最后若干行）
+        watchdog_reason: 看门狗终止进程的原因
+        
+    Returns:
+        tuple: (失败原因, 说明该原因的一行输出)
+    """
+    lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+    # 进度统计行不含错误信息，不作为说明
+    messages = [line for line in lines if not line.startswith(('frame=', 'size='))]
+    last_message = messages[-1] if messages else ''
+    
+    # 被看门狗或信号（如OOM killer的SIGKILL）终止时，stderr中此前的解码警告不是失败原因，
+    # 先于关键字判断，才能按可重试的原因处理
+    if watchdog_reason is not None:
+        return watchdog_reason, last_message
+    if returncode < 0:
+        return FAILURE_KILLED, last_message
+    for reason, patterns in FAILURE_PATTERNS:
+        for line in reversed(messages):
+            if any(pattern in line for pattern in patterns):
+                return reason, line
+    return FAILURE_UNKNOWN, last_message
+
+
+class ConversionResult:
+    """
+    单个转换任务的结果
+    
+    可以直接当作bool使用（成功为True），失败时reason为FAILURE_*之一，
+    调用方据此决定是否重试，不需要解析FFmpeg的输出
+    
+    性能统计：
+        timings: 各阶段耗时（秒）：probe、precheck、encode、faststart（moov前移）、
+                 mux（分段合并）、verify（输出结构检查）、paused（被高优先级任务暂停，
+                 不计入encode）、total，没有经历的阶段不出现
+        cpu_user / cpu_sys: 所有FFmpeg进程的用户态/内核态CPU秒数（仅POSIX）
+        max_rss_kb: FFmpeg进程的峰值常驻内存（KB，仅POSIX）
+        input_size / output_size: 输入和输出文件大小（字节）
+        duration: 视频时长（秒）
+        speed: 编码速度（视频时长 / encode与faststart阶段耗时之和，实时倍数）
+    """
+    
+    def __init__(
+        self,
+        success: bool,
+        output: Optional[str] = None,
+        reason: Optional[str] = None,
+        message: str = '',
+        returncode: Optional[int] = None,
+        stderr_tail: Optional[List[str]] = None,
+        attempts: int = 1
+    ):
+        """
+        Args:
+            success: 是否成功
+            output: 输出文件路径
+            reason: 失败原因（FAILURE_*），成功时为None
+            message: 失败原因的说明（通常是FFmpeg输出中对应的一行）
+            returncode: FFmpeg最后一次运行的返回码
+            stderr_tail: FFmpeg stderr的最后若干行
+            attempts: 运行FFmpeg的次数（含重试）
+        """
+        self.success = success
+        self.output = output
+        self.reason = reason
+        self.message = message
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail or []
+        self.attempts = attempts
+        # 以下统计由_ConversionStats填写
+        self.timings = {}
+        self.cpu_user = None
+        self.cpu_sys = None
+        self.max_rss_kb = None
+        self.input_size = None
+        self.output_size = None
+        self.duration = None
+        self.speed = None
+    
+    def __bool__(self) -> bool:
+        return self.success
+    
+    @property
+    def description(self) -> str:
+        """失败原因的中文说明，成功时为空字符串"""
+        return FAILURE_DESCRIPTIONS.get(self.reason, '') if self.reason else ''
+    
+    @property
+    def retryable(self) -> bool:
+        """换用更快的preset重试是否可能成功"""
+        return self.reason in RETRYABLE_FAILURES
+    
+    def to_dict(self) -> dict:
+        """转换为字典（便于输出JSON）"""
+        return {
+            'success': self.success,
+            'output': self.output,
+            'reason': self.reason,
+            'message': self.message,
+            'returncode': self.returncode,
+            'attempts': self.attempts,
+            'timings': self.timings,
+            'cpu_user': self.cpu_user,
+            'cpu_sys': self.cpu_sys,
+            'max_rss_kb': self.max_rss_kb,
+            'input_size': self.input_size,
+            'output_size': self.output_size,
+            'duration': self.duration,
+            'speed': self.speed,
+        }
+    
+    def __repr__(self) -> str:
+        if self.success:
+            return f"ConversionResult(success=True, output={self.output!r})"
+        return f"ConversionResult(success=False, reason={self.reason!r}, message={self.message!r})"
+
+
+class _ConversionStats:
+    """转换过程中收集的各阶段耗时和资源使用，转换结束时写入ConversionResult"""
+    
+    def __init__(self, input_file: str):
+        self.input_file = input_file
+        self.started = time.monotonic()
+        self.timings = {}
+        self.duration = None
+        self.cpu_user = None
+        self.cpu_sys = None
+        self.max_rss_kb = None
+    
+    def add_timing(self, stage: str, seconds: float):
+        """累加一个阶段的耗时（重试时同一阶段会出现多次）"""
+        self.timings[stage] = self.timings.get(stage, 0.0) + max(seconds, 0.0)
+    
+    def add_run(self, result: 'FFmpegResult', stage: Optional[str] = 'encode'):
+        """
+        记录一次FFmpeg运行
+        
+        Args:
+            result: 运行结果
+            stage: 计入的阶段；faststart重写部分单独计入faststart，暂停时间计入paused。
+                   并行运行的进程传None，只累计资源使用，阶段耗时和暂停时间由调用方按墙钟记录
+        """
+        if stage is not None:
+            if result.paused_seconds:
+                self.add_timing('paused', result.paused_seconds)
+            split = result.faststart_at or result.finished
+            # 暂停时间单独计入paused，不算作编码耗时
+            self.add_timing(stage, split - result.started - result.paused_seconds)
+            if result.faststart_at is not None:
+                self.add_timing('faststart', result.finished - result.faststart_at)
+        if result.rusage:
+            self.cpu_user = (self.cpu_user or 0.0) + result.rusage['cpu_user']
+            self.cpu_sys = (self.cpu_sys or 0.0) + result.rusage['cpu_sys']
+            self.max_rss_kb = max(self.max_rss_kb or 0, result.rusage['max_rss_kb'])
+    
+    def apply(self, conversion: 'ConversionResult') -> 'ConversionResult':
+        """把统计写入转换结果"""
+        conversion.timings = dict(self.timings, total=time.monotonic() - self.started)
+        conversion.cpu_user = self.cpu_user
+        conversion.cpu_sys = self.cpu_sys
+        conversion.max_rss_kb = self.max_rss_kb
+        conversion.duration = self.duration
+        try:
+            conversion.input_size = os.path.getsize(self.input_file)
+        except OSError:
+            conversion.input_size = None
+        if conversion.success and conversion.output:
+            conversion.output_size = _path_size(conversion.output)
+        encode = self.timings.get('encode', 0.0) + self.timings.get('faststart', 0.0)
+        if self.duration and encode > 0:
+            conversion.speed = self.duration / encode
+        return conversion
+
+
+def _verify_mp4(path: Path) -> Optional[str]:
+    """
+    检查MP4文件的顶层box结构
+    
+    逐个读取顶层box的头部（不读取内容），要求box恰好铺满整个文件，
+    第一个box是ftyp，并且包含moov和mdat
+    
+    Args:
+        path: MP4文件路径
+        
+    Returns:
+        str: 发现的问题，结构完整时返回None
+    """
+    try:
+        file_size = os.path.getsize(path)
+        boxes = []
+        with open(path, 'rb') as f:
+            offset = 0
+            while offset < file_size:
+                f.seek(offset)
+                header = f.read(8)
+                if len(header) < 8:
+                    return f"偏移 {offset} 处的box头部不完整"
+                size, box_type = struct.unpack('>I4s', header)
+                if size == 1:
+                    large = f.read(8)
+                    if len(large) < 8:
+                        return f"偏移 {offset} 处的box头部不完整"
+                    size = struct.unpack('>Q', large)[0]
+                elif size == 0:
+                    size = file_size - offset
+                if size < 8 or offset + size > file_size:
+                    return f"偏移 {offset} 处的box大小无效: {size}"
+                boxes.append(box_type.decode('latin-1'))
+                offset += size
+    except OSError as e:
+        return str(e)
+    
+    if not boxes or boxes[0] != 'ftyp':
+        return "文件不是以ftyp开头"
+    for required in ('moov', 'mdat'):
+        if required not in boxes:
+            return f"缺少{required}"
+    return None
+
+
+def _verify_package(directory: Path, package_format: str) -> Optional[str]:
+    """
+    检查流媒体打包输出：HLS检查主播放列表和其中每个子播放列表是否完整（有结束标记），
+    DASH检查清单文件
+    
+    Returns:
+        str: 发现的问题，输出完整时返回None
+    """
+    if package_format == 'dash':
+        manifest = directory / DASH_MANIFEST
+        try:
+            content = manifest.read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            return f"缺少清单文件 {DASH_MANIFEST}"
+        return None if '<MPD' in content else f"{DASH_MANIFEST} 不是有效的DASH清单"
+    
+    try:
+        master = (directory / HLS_MASTER_PLAYLIST).read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return f"缺少主播放列表 {HLS_MASTER_PLAYLIST}"
+    if not master.startswith('#EXTM3U'):
+        return f"{HLS_MASTER_PLAYLIST} 不是有效的播放列表"
+    variants = [line.strip() for line in master.splitlines() if line.strip() and not line.startswith('#')]
+    if not variants:
+        return f"{HLS_MASTER_PLAYLIST} 中没有子播放列表"
+    for variant in variants:
+        try:
+            playlist = (directory / variant).read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            return f"缺少子播放列表 {variant}"
+        if '#EXT-X-ENDLIST' not in playlist:
+            return f"子播放列表 {variant} 不完整"
+    return None
+
+
+class BatchResult(list):
+    """
+    批量转换的返回值：本身是成功输出文件路径的列表（与之前的返回值兼容），
+    results中是本次实际运行的各任务的ConversionResult（按扫描顺序）
+    """
+    
+    def __init__(self, outputs: Iterable[str] = (), results: Optional[List[ConversionResult]] = None):
+        super().__init__(outputs)
+        self.results = results or []
+
+
+def _renditions_graph(renditions: List['Rendition']) -> str:
+    """解码一次、split为N路并分别缩放的filter_complex，第i档的输出标签为[vi]"""
+    count = len(renditions)
+    if count == 1:
+        return f"[0:v:0]{renditions[0].scale_filter()}[v0]"
+    graph = [f"[0:v:0]split={count}" + ''.join(f"[s{i}]" for i in range(count))]
+    graph.extend(
+        f"[s{i}]{rendition.scale_filter()}[v{i}]" for i, rendition in enumerate(renditions)
+    )
+    return ';'.join(graph)
+
+
+def _stream_options(args: List[str], media: str, index: int) -> List[str]:
+    """
+    给FFmpeg参数名加上流说明符，使其只作用于输出中的第index路视频或音频流
+    
+    如 ['-c:v', 'libx264', '-crf', '23'] -> ['-c:v:1', 'libx264', '-crf:v:1', '23']
+    """
+    options = []
+    for position, arg in enumerate(args):
+        if position % 2 == 0:
+            name = arg.split(':', 1)[0]
+            arg = f"{name}:{media}:{index}"
+        options.append(arg)
+    return options
+
+
+class Rendition:
+    """
+    多码率输出（ABR阶梯）中的一档：目标高度、码率控制方式（CRF或目标码率）和x264 preset
+    
+    宽度按原始宽高比自动计算；源视频低于目标高度时不放大
+    """
+    
+    def __init__(
+        self,
+        height: int,
+        crf: Optional[int] = None,
+        bitrate: Optional[str] = None,
+        preset: str = 'medium',
+        name: Optional[str] = None,
+        audio_bitrate: str = DEFAULT_RENDITION_AUDIO_BITRATE
+    ):
+        """
+        Args:
+            height: 目标高度（像素）
+            crf: CRF值，与bitrate都为None时使用23
+            bitrate: 目标视频码率（如'3000k'），设置后按码率编码并限制峰值码率
+            preset: x264 preset
+            name: 名称，用于输出文件名后缀，默认为"<高度>p"
+            audio_bitrate: AAC音频码率
+        """
+        if height <= 0:
+            raise ValueError(f"无效的高度: {height}")
+        if crf is None and bitrate is None:
+            crf = 23
+        self.height = height
+        self.crf = crf
+        self.bitrate = bitrate
+        self.preset = preset
+        self.name = name or f"{height}p"
+        self.audio_bitrate = audio_bitrate
+    
+    @classmethod
+    def parse(cls, spec: str) -> 'Rendition':
+        """
+        解析文本形式的档位，如"720"、"720:crf=23:preset=fast"、"1080:b=5000k:name=hd"
+        
+        Raises:
+            ValueError: 格式错误
+        """
+        height, *options = spec.strip().split(':')
+        kwargs = {}
+        for option in options:
+            key, sep, value = option.partition('=')
+            if not sep:
+                raise ValueError(f"无效的档位参数: {option}")
+            if key == 'crf':
+                kwargs['crf'] = int(value)
+            elif key in ('b', 'bitrate'):
+                kwargs['bitrate'] = value
+            elif key in ('preset', 'name'):
+                kwargs[key] = value
+            elif key in ('ab', 'audio_bitrate'):
+                kwargs['audio_bitrate'] = value
+            else:
+                raise ValueError(f"未知的档位参数: {key}")
+        return cls(int(height.rstrip('p')), **kwargs)
+    
+    def scale_filter(self) -> str:
+        """缩放滤镜：宽度按比例取偶数，高度不超过源视频（不放大）"""
+        return f"scale=-2:'min({self.height},trunc(ih/2)*2)'"
+    
+    def video_args(self, index: Optional[int] = None) -> List[str]:
+        """
+        该档的视频编码参数
+        
+        Args:
+            index: 同一个输出中有多路视频时该档的视频流序号，参数名会加上流说明符（如-crf:v:1）
+        """
+        args = ['-c:v', 'libx264', '-preset', self.preset]
+        if self.bitrate:
+            number = self.bitrate.rstrip('kKmM')
+            unit = self.bitrate[len(number):]
+            bufsize = f"{float(number) * RENDITION_BUFSIZE_FACTOR:g}{unit}"
+            args.extend(['-b:v', self.bitrate, '-maxrate', self.bitrate, '-bufsize', bufsize])
+        else:
+            args.extend(['-crf', str(self.crf)])
+        return args if index is None else _stream_options(args, 'v', index)
+    
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'height': self.height,
+            'crf': self.crf,
+            'bitrate': self.bitrate,
+            'preset': self.preset,
+            'audio_bitrate': self.audio_bitrate,
+        }
+    
+    def __repr__(self) -> str:
+        rate = f"bitrate={self.bitrate!r}" if self.bitrate else f"crf={self.crf}"
+        return f"Rendition({self.height}, {rate}, preset={self.preset!r})"
+
+
+class FFmpegResult:
+    """FFmpeg进程的运行结果，接口与subprocess.CompletedProcess的常用字段一致"""
+    
+    def __init__(
+        self,
+        returncode: int,
+        stderr: str,
+        rusage: Optional[dict] = None,
+        watchdog_reason: Optional[str] = None,
+        started: Optional[float] = None,
+        faststart_at: Optional[float] = None,
+        paused_seconds: float = 0.0
+    ):
+        self.returncode = returncode
+        self.stderr = stderr
+        # FFmpeg进程自身的资源使用（见_wait_with_rusage），无法获取时为None
+        self.rusage = rusage
+        # 进程被看门狗终止时的原因，见WatchdogPolicy
+        self.watchdog_reason = watchdog_reason
+        # 进程启动、开始faststart重写（未发生时为None）和结束的time.monotonic()
+        self.finished = time.monotonic()
+        self.started = started if started is not None else self.finished
+        self.faststart_at = faststart_at
+        # 被高优先级任务抢占而暂停的时间（秒）
+        self.paused_seconds = paused_seconds
+    
+    def classify(self) -> tuple:
+        """返回(失败原因, 说明)，成功时为(None, '')"""
+        if self.returncode == 0:
+            return None, ''
+        return _classify_failure(self.returncode, self.stderr, self.watchdog_reason)
+
+
+class FFmpegToolchain:
+    """
+    FFmpeg工具链：ffmpeg/ffprobe的位置、版本，以及可用的编码器、解码器、滤镜和封装格式
+    
+    通过discover()获取。结果在进程内和磁盘上（缓存目录下的ffmpeg_toolchain.json）缓存，
+    以可执行文件的真实路径为键，文件大小或修改时间变化（升级FFmpeg）后自动重新发现；
+    命中缓存时不启动任何子进程，因此反复创建VideoConverter几乎没有开销
+    """
+    
+    # 进程内缓存：真实路径 -> FFmpegToolchain
+    _instances = {}
+    _lock = threading.Lock()
+    
+    # 能力类别与对应的ffmpeg查询参数
+    CAPABILITIES = {
+        'encoders': '-encoders',
+        'decoders': '-decoders',
+        'filters': '-filters',
+        'muxers': '-muxers',
+    }
+    
+    def __init__(
+        self,
+        ffmpeg_path: str,
+        ffprobe_path: Optional[str],
+        version: str,
+        encoders: Iterable[str] = (),
+        decoders: Iterable[str] = (),
+        filters: Iterable[str] = (),
+        muxers: Iterable[str] = ()
+    ):
+        self.ffmpeg_path = ffmpeg_path
+        # 找不到ffprobe时为None，此时只能探测可以直接解析文件头的RealMedia文件
+        self.ffprobe_path = ffprobe_path
+        self.version = version
+        self.encoders = frozenset(encoders)
+        self.decoders = frozenset(decoders)
+        self.filters = frozenset(filters)
+        self.muxers = frozenset(muxers)
+        # 发现时可执行文件的大小和修改时间，用于判断进程内缓存是否失效
+        self._stamp = None
+    
+    def has_encoder(self, name: str) -> bool:
+        """是否有指定的编码器（如'libx265'）"""
+        return name in self.encoders
+    
+    def has_decoder(self, name: str) -> bool:
+        """是否有指定的解码器（如'rv40'）"""
+        return name in self.decoders
+    
+    def has_filter(self, name: str) -> bool:
+        """是否有指定的滤镜（如'scale'）"""
+        return name in self.filters
+    
+    def has_muxer(self, name: str) -> bool:
+        """是否有指定的封装格式（如'hls'）"""
+        return name in self.muxers
+    
+    def to_dict(self) -> dict:
+        return {
+            'ffmpeg': self.ffmpeg_path,
+            'ffprobe': self.ffprobe_path,
+            'version': self.version,
+            **{kind: sorted(getattr(self, kind)) for kind in self.CAPABILITIES},
+        }
+    
+    def __repr__(self) -> str:
+        return f"FFmpegToolchain(ffmpeg={self.ffmpeg_path!r}, version={self.version!r})"
+    
+    @classmethod
+    def discover(
+        cls,
+        ffmpeg_path: Optional[str] = None,
+        cache_file: Optional[str] = None,
+        refresh: bool = False
+    ) -> 'FFmpegToolchain':
+        """
+        查找ffmpeg和ffprobe并获取其能力，优先使用进程内和磁盘缓存
+        
+        Args:
+            ffmpeg_path: ffmpeg可执行文件的路径或命令名，None时在系统PATH中查找ffmpeg
+            cache_file: 磁盘缓存文件路径，None时使用缓存目录下的ffmpeg_toolchain.json
+            refresh: 忽略缓存，重新运行ffmpeg发现能力
+            
+        Returns:
+            FFmpegToolchain: 工具链信息
+            
+        Raises:
+            RuntimeError: 找不到ffmpeg或ffmpeg无法运行
+        """
+        resolved = shutil.which(ffmpeg_path or 'ffmpeg')
+        if resolved is None:
+            raise RuntimeError("FFmpeg未找到，请确保FFmpeg已安装并添加到系统PATH中")
+        real_path = os.path.realpath(resolved)
+        stat = os.stat(real_path)
+        stamp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        
+        with cls._lock:
+            toolchain = cls._instances.get(real_path)
+            if not refresh and toolchain is not None and toolchain._stamp == stamp:
+                return toolchain
+            
+            cache_path = Path(cache_file) if cache_file else _default_cache_dir() / TOOLCHAIN_CACHE_FILE
+            entries = {} if refresh else cls._load_cache(cache_path)
+            entry = entries.get(real_path)
+            if entry is not None and entry.get('stamp') == stamp:
+                toolchain = cls(
+                    resolved, entry['ffprobe'], entry['version'],
+                    **{kind: entry.get(kind, []) for kind in cls.CAPABILITIES}
+                )
+            else:
+                toolchain = cls._probe(resolved)
+                entries = cls._load_cache(cache_path)
+                entries[real_path] = dict(toolchain.to_dict(), stamp=stamp)
+                cls._save_cache(cache_path, entries)
+            toolchain._stamp = stamp
+            cls._instances[real_path] = toolchain
+            return toolchain
+    
+    @classmethod
+    def _probe(cls, ffmpeg_path: str) -> 'FFmpegToolchain':
+        """运行ffmpeg获取版本和各类能力列表（各查询并发执行）"""
+        def run(*args: str) -> str:
+            result = subprocess.run(
+                [ffmpeg_path, *args],
+                capture_output=True, text=True, timeout=TOOLCHAIN_PROBE_TIMEOUT
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"ffmpeg返回码 {result.returncode}")
+            return result.stdout
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(cls.CAPABILITIES) + 1) as executor:
+                version_future = executor.submit(run, '-version')
+                futures = {
+                    kind: executor.submit(run, '-hide_banner', option)
+                    for kind, option in cls.CAPABILITIES.items()
+                }
+                version_output = version_future.result()
+                capabilities = {
+                    kind: cls._parse_capabilities(kind, future.result())
+                    for kind, future in futures.items()
+                }
+        except (subprocess.TimeoutExpired, OSError, RuntimeError) as e:
+            raise RuntimeError(f"FFmpeg无法运行: {ffmpeg_path}: {str(e)}")
+        
+        # 第一行形如 "ffmpeg version 6.1.1 Copyright ..."
+        words = version_output.split()
+        version = words[2] if len(words) > 2 and words[1] == 'version' else 'unknown'
+        return cls(ffmpeg_path, cls._find_ffprobe(ffmpeg_path), version, **capabilities)
+    
+    @staticmethod
+    def _parse_capabilities(kind: str, output: str) -> List[str]:
+        """
+        解析 ffmpeg -encoders/-decoders/-filters/-muxers 的输出
+        
+        编解码器和封装格式的列表位于一行"------"（或"--"）之后，每行为"标志 名称 说明"；
+        滤镜列表没有分隔行，每行为"标志 名称 输入->输出 说明"
+        """
+        names = []
+        in_list = False
+        for line in output.splitlines():
+            parts = line.split()
+            if kind == 'filters':
+                if len(parts) >= 3 and '->' in parts[2]:
+                    names.append(parts[1])
+                continue
+            if not in_list:
+                in_list = bool(parts) and set(parts[0]) == {'-'}
+                continue
+            if len(parts) >= 2:
+                names.extend(parts[1].split(','))
+        return names
+    
+    @staticmethod
+    def _find_ffprobe(ffmpeg_path: str) -> Optional[str]:
+        """优先使用与ffmpeg同目录、同命名方式的ffprobe，其次在系统PATH中查找"""
+        directory, name = os.path.split(ffmpeg_path)
+        if 'ffmpeg' in name:
+            sibling = os.path.join(directory, name.replace('ffmpeg', 'ffprobe'))
+            if os.path.isfile(sibling) and os.access(sibling, os.X_OK):
+                return sibling
+        return shutil.which('ffprobe')
+    
+    @staticmethod
+    def _load_cache(cache_path: Path) -> dict:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _save_cache(cache_path: Path, entries: dict):
+        """原子写入磁盘缓存，写入失败不影响使用"""
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"写入FFmpeg能力缓存失败: {cache_path}: {str(e)}")
+
+
+class VideoConverter:
+    """视频转换工具类"""
+    
+    # get_video_info和_get_video_duration共用同一组探测参数，
+    # 这样同一个文件只需探测一次，结果可被两者共享（并命中同一条缓存）
+    PROBE_OPTIONS = ['-show_format', '-show_streams']
+    
+    def __init__(
+        self,
+        ffmpeg_path: Optional[str] = None,
+        probe_cache: Optional[ProbeCache] = None,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        perf_history: Optional[PerfHistory] = None,
+        watchdog: Optional[WatchdogPolicy] = None,
+        toolchain: Optional[FFmpegToolchain] = None,
+        memory_limit_mb: Optional[float] = None,
+        preemption: Optional[PreemptionScheduler] = None
+    ):
+        """
+        初始化视频转换器
+        
+        Args:
+            ffmpeg_path: FFmpeg可执行文件的路径，如果为None则使用系统PATH中的ffmpeg。
+                         ffprobe优先使用同目录下的ffprobe
+            probe_cache: ffprobe结果缓存，None时不使用缓存
+            progress_interval: 两次进度回调之间的最短间隔（秒），与1%的进度步长同时生效
+            perf_history: 性能历史，用于记录每个任务的耗时并预测新任务的耗时；
+                          None时不记录，预测使用各质量档位的经验速度
+            watchdog: FFmpeg进程的看门狗策略，停滞、过慢或超时的进程会被终止并按策略重试；
+                      None时不启用
+            toolchain: 已发现的FFmpeg工具链，None时用FFmpegToolchain.discover(ffmpeg_path)获取
+                       （命中缓存时不启动子进程）
+            memory_limit_mb: 每个FFmpeg进程的地址空间上限（RLIMIT_AS，MB，仅Linux）。
+                             地址空间包括线程栈和未使用的预留内存，通常是峰值常驻内存的
+                             数倍，应设置得足够宽松；None时不限制
+            preemption: 按优先级暂停/恢复FFmpeg进程的调度器，None时使用进程内共享的
+                        PreemptionScheduler.default()，见convert_rmvb_to_mp4的priority参数
+            
+        Raises:
+            RuntimeError: 找不到FFmpeg或FFmpeg无法运行
+        """
+        self.toolchain = toolchain or FFmpegToolchain.discover(ffmpeg_path)
+        self.ffmpeg_path = self.toolchain.ffmpeg_path
+        self.probe_cache = probe_cache
+        self.progress_interval = progress_interval
+        self.perf_history = perf_history
+        self.watchdog = watchdog
+        self.memory_limit_mb = memory_limit_mb
+        self.preemption = preemption or PreemptionScheduler.default()
+        self.last_batch_report = None
+        self.last_batch_plan = None
+        self.logger = logging.getLogger(__name__)
+        
+        if self.toolchain.encoders and not self.toolchain.has_encoder('libx264'):
+            self.logger.warning(f"FFmpeg {self.toolchain.version} 不支持libx264，视频重新编码将会失败")
+    
+    def _memory_limiter(self) -> Optional[Callable[[], None]]:
+        """启动FFmpeg时设置地址空间上限的preexec_fn（未设置memory_limit_mb或平台不支持时为None）"""
+        if not self.memory_limit_mb:
+            return None
+        limiter = _address_space_limiter(self.memory_limit_mb)
+        if limiter is None:
+            self.logger.debug("当前平台不支持限制子进程的地址空间")
+        return limiter
+    
+    @property
+    def ffprobe_path(self) -> str:
+        """
+        ffprobe可执行文件的路径
+        
+        Raises:
+            RuntimeError: 没有找到ffprobe
+        """
+        if self.toolchain.ffprobe_path is None:
+            raise RuntimeError("ffprobe未找到，请确保ffprobe与FFmpeg一起安装")
+        return self.toolchain.ffprobe_path
+    
+    def _run_ffprobe(self, video_file: str, options: List[str]) -> dict:
+        """
+        运行ffprobe并返回解析后的JSON结果，优先使用探测缓存
+        
+        Args:
+            video_file: 视频文件路径
+            options: 探测参数（如['-show_format', '-show_streams']）
+            
+        Returns:
+            dict: ffprobe输出的JSON结果
+            
+        Raises:
+            RuntimeError: ffprobe执行失败
+        """
+        if self.probe_cache is not None:
+            data = self.probe_cache.get(video_file, options)
+            if data is not None:
+                return data
+        
+        cmd = [
+            self.ffprobe_path,
+            '-v', 'quiet',
+            '-print_format', 'json',
+            *options,
+            video_file
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"ffprobe返回码 {result.returncode}")
+        
+        data = json.loads(result.stdout)
+        if self.probe_cache is not None:
+            self.probe_cache.put(video_file, options, data)
+        return data
+    
+    def probe_video(self, video_file: str) -> Optional[dict]:
+        """
+        快速探测视频信息
+        
+        RealMedia文件直接解析文件头（不启动子进程），
+        解析失败或其他格式时回退到ffprobe（可命中探测缓存）
+        
+        Args:
+            video_file: 视频文件路径
+            
+        Returns:
+            dict: 与ffprobe结构兼容的信息字典，失败时返回None
+        """
+        info = parse_realmedia_header(video_file)
+        if info is not None:
+            return info
+        try:
+            return self._run_ffprobe(video_file, self.PROBE_OPTIONS)
+        except Exception:
+            return None
+    
+    def _get_video_duration(self, video_file: str) -> Optional[float]:
+        """获取视频文件的总时长（秒）"""
+        try:
+            return _info_duration(self.probe_video(video_file))
+            
+        except Exception:
+            return None
+    
+    def _observe_progress(self, event: ProgressEvent, monitor: InputReadMonitor):
+        """用输入读取位置补充进度事件，并在FFmpeg停滞时记录一次警告"""
+        monitor.update(event)
+        if monitor.idle_seconds() >= STALL_WARN_SECONDS and not monitor.stall_warned:
+            monitor.stall_warned = True
+            self.logger.warning(
+                f"FFmpeg已 {monitor.idle_seconds():.0f} 秒没有进展（媒体时间和输入读取位置都未变化）"
+            )
+    
+    def _dispatch_progress(
+        self,
+        event: 'ProgressEvent',
+        throttle: 'ProgressThrottle',
+        progress_callback: Optional[Callable[[float, str], None]],
+        event_callback: Optional[Callable[['ProgressEvent'], None]]
+    ):
+        """把一个进度事件分发给事件回调和（节流后的）进度回调"""
+        if event_callback:
+            event_callback(event)
+        if progress_callback and event.percent is not None and throttle.ready(event.percent):
+            status = f"转换中... {event.percent:.1f}%"
+            if event.speed:
+                status += f" ({event.speed:.2f}x)"
+            progress_callback(event.percent, status)
+    
+    def _run_ffmpeg_with_progress(
+        self, 
+        cmd: List[str], 
+        total_duration: float, 
+        progress_callback: Optional[Callable[[float, str], None]],
+        event_callback: Optional[Callable[['ProgressEvent'], None]] = None,
+        input_file: Optional[str] = None,
+        priority: int = 0,
+        cancel: Optional[threading.Event] = None
+    ) -> FFmpegResult:
+        """
+        运行FFmpeg并监控进度
+        
+        这是异步进度监控的核心方法：
+        1. 使用-progress pipe:1参数让FFmpeg输出进度信息到stdout
+        2. 创建子进程，分别处理stdout（进度）和stderr（错误信息）
+        3. 使用多线程实时读取输出，避免阻塞
+        4. 按数据块解析进度信息，生成ProgressEvent并计算百分比进度
+        
+        Args:
+            cmd: FFmpeg命令列表
+            total_duration: 视频总时长（秒）
+            progress_callback: 进度回调函数，按1%步长和progress_interval时间间隔节流
+            event_callback: 进度事件回调函数，每个进度数据块调用一次。
+                            回调抛出异常时FFmpeg进程会被终止，异常继续向上传播
+            input_file: 输入文件路径。时长未知时按FFmpeg在该文件中的读取位置计算进度（仅Linux）
+            priority: 抢占优先级，有更高优先级的FFmpeg进程运行时本进程被暂停
+            cancel: 被设置时直接终止FFmpeg进程（不依赖进度数据块，FFmpeg卡住时同样有效）
+            
+        Returns:
+            FFmpegResult: 进程结果对象
+            
+        Raises:
+            ConversionCancelled: 回调主动取消了转换，或cancel被设置
+        """
+        
+        # 在程序名之后插入全局的进度参数：-progress pipe:1
+        # 这样FFmpeg会将进度信息输出到stdout，而不是stderr；放在最前面对多输出的命令同样有效
+        cmd_with_progress = cmd[:1] + ['-progress', 'pipe:1'] + cmd[1:]
+        
+        # 创建子进程，分别捕获stdout和stderr
+        started = time.monotonic()
+        process = subprocess.Popen(
+            cmd_with_progress,
+            stdout=subprocess.PIPE,  # 用于读取进度信息
+            stderr=subprocess.PIPE,  # 用于读取错误信息
+            text=True,
+            universal_newlines=True,
+            preexec_fn=self._memory_limiter()
+        )
+        job = self.preemption.register(
+            process, priority, Path(input_file).name if input_file else ''
+        )
+        
+        # 用于收集stderr输出（错误信息），只保留最后STDERR_TAIL_LINES行，
+        # 损坏文件的解码警告可能多达数万行
+        stderr_output = deque(maxlen=STDERR_TAIL_LINES)
+        faststart_at = []
+        
+        def read_stderr():
+            """
+            在单独线程中读取stderr输出
+            避免stderr缓冲区满导致进程阻塞
+            """
+            for line in iter(process.stderr.readline, ''):
+                stderr_output.append(line)
+                # 记录faststart重写开始的时间，用于统计各阶段耗时
+                if not faststart_at and FASTSTART_MARKER in line:
+                    faststart_at.append(time.monotonic())
+        
+        # 启动stderr读取线程，设置为守护线程
+        stderr_thread = threading.Thread(target=read_stderr)
+        stderr_thread.daemon = True
+        stderr_thread.start()
+        
+        # 从stdout按数据块读取进度信息
+        throttle = ProgressThrottle(self.progress_interval)
+        monitor = InputReadMonitor(process.pid, input_file)
+        
+        # 看门狗线程：FFmpeg停滞、过慢或超时时，或cancel被设置时终止进程，
+        # stdout随之关闭，下面的读取循环结束
+        watchdog = None
+        watchdog_thread = None
+        stop_watchdog = threading.Event()
+        if self.watchdog is not None:
+            watchdog = Watchdog(self.watchdog, monitor, total_duration, job)
+        if watchdog is not None or cancel is not None:
+            
+            def watch():
+                while not stop_watchdog.wait(WATCHDOG_POLL_SECONDS):
+                    if cancel is not None and cancel.is_set():
+                        process.kill()
+                        return
+                    if watchdog is not None and watchdog.check():
+                        self.logger.error(f"看门狗终止FFmpeg: {watchdog.describe()}")
+                        process.kill()
+                        return
+            
+            watchdog_thread = threading.Thread(target=watch, daemon=True)
+            watchdog_thread.start()
+        
+        try:
+            for fields in _read_progress_blocks(iter(process.stdout.readline, '')):
+                event = ProgressEvent(fields, total_duration)
+                self._observe_progress(event, monitor)
+                self._dispatch_progress(event, throttle, progress_callback, event_callback)
+                # 结束标志：progress=end
+                if event.ended:
+                    break
+        except BaseException:
+            # 回调出错或被中断时不能留下孤儿FFmpeg进程
+            stop_watchdog.set()
+            self.preemption.unregister(job)
+            process.kill()
+            process.wait()
+            raise
+        
+        # 进程回收之前先停止看门狗并注销抢占登记，避免向已回收（可能被复用）的进程号发送信号；
+        # 注销时被暂停的进程会先恢复，否则它永远不会退出
+        stop_watchdog.set()
+        if watchdog_thread is not None:
+            watchdog_thread.join()
+        self.preemption.unregister(job)
+        
+        # 等待进程结束，同时取得该进程的CPU时间和峰值内存
+        rusage = _wait_with_rusage(process)
+        # 等待stderr线程结束（最多1秒）
+        stderr_thread.join(timeout=1)
+        if cancel is not None and cancel.is_set() and process.returncode != 0:
+            raise ConversionCancelled()
+        
+        return FFmpegResult(
+            process.returncode, ''.join(stderr_output), rusage,
+            watchdog.reason if watchdog is not None else None,
+            started, faststart_at[0] if faststart_at else None, job.paused_seconds()
+        )
+    
+    def convert_rmvb_to_mp4(
+        self,
+        input_file: str,
+        output_file: Optional[str] = None,
+        quality: str = "medium",
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        threads: Optional[int] = None,
+        chunks: Optional[Union[int, str]] = None,
+        codec_policy: str = "auto",
+        event_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        precheck: Optional[str] = None,
+        priority: int = 0
+    ) -> ConversionResult:
+        """
+        将RMVB文件转换为MP4文件
+        
+        Args:
+            input_file: 输入的RMVB文件路径
+            output_file: 输出的MP4文件路径，如果为None则自动生成
+            quality: 转换质量 ('low', 'medium', 'high')
+            overwrite: 是否覆盖已存在的输出文件
+            progress_callback: 进度回调函数，接收(progress, status)参数
+            threads: FFmpeg编码线程数（-threads），None时由FFmpeg自动决定
+            chunks: 分段并行编码的段数，整数或"auto"。设置后输入文件按关键帧切分为多段，
+                    各段由独立的FFmpeg进程并行编码，音频单独编码一次，最后用concat合并
+            codec_policy: 编码策略。'auto'时若输入的视频/音频编解码器可以直接放入MP4
+                          （如H.264/AAC的MKV、AVI、FLV），对应的流直接复制而不重新编码；
+                          'reencode'时总是用libx264/AAC重新编码
+            event_callback: 进度事件回调函数，接收ProgressEvent（帧数、码率、速度等）。
+                            分段编码时不产生事件。回调抛出ConversionCancelled时
+                            FFmpeg进程被终止，未完成的输出被删除，异常继续向上传播
+            precheck: 编码前先用precheck_decode快速解码采样窗口，发现解码错误时的策略：
+                      'skip' - 不转换；'quarantine' - 把输入文件移到同目录的_quarantine下
+                      并写入预检报告；'conceal' - 开启错误隐藏后照常转换（视频总是重新编码）。
+                      None时不预检
+            priority: 抢占优先级（默认0）。高于正在运行的其他任务时，那些任务的FFmpeg进程
+                      被暂停（见PreemptionScheduler），本任务结束后恢复；反之本任务被暂停。
+                      暂停时间记入结果的timings['paused']，不计入编码耗时和看门狗的判断
+            
+        Returns:
+            ConversionResult: 转换结果，可直接当作bool使用；失败时reason为分类后的失败原因
+            
+        Raises:
+            ConversionCancelled: event_callback或progress_callback主动取消了转换
+        """
+        stats = _ConversionStats(input_file)
+        result = self._convert_rmvb_to_mp4(
+            input_file, output_file, quality, overwrite, progress_callback,
+            threads, chunks, codec_policy, event_callback, precheck, priority, stats
+        )
+        return stats.apply(result)
+    
+    def _convert_rmvb_to_mp4(
+        self,
+        input_file: str,
+        output_file: Optional[str],
+        quality: str,
+        overwrite: bool,
+        progress_callback: Optional[Callable[[float, str], None]],
+        threads: Optional[int],
+        chunks: Optional[Union[int, str]],
+        codec_policy: str,
+        event_callback: Optional[Callable[[ProgressEvent], None]],
+        precheck: Optional[str],
+        priority: int,
+        stats: _ConversionStats,
+        cancel: Optional[threading.Event] = None
+    ) -> ConversionResult:
+        """
+        convert_rmvb_to_mp4的实现，各阶段耗时和资源使用记入stats
+        
+        cancel被设置时终止正在运行的FFmpeg进程并抛出ConversionCancelled（不支持分段编码）
+        """
+        paths = self._prepare_paths(input_file, output_file, overwrite)
+        if paths is None:
+            return ConversionResult(False, output_file, FAILURE_INVALID_PATH, "输入或输出路径无效")
+        input_path, output_path = paths
+        output_file = str(output_path)
+        
+        # 获取视频总时长用于进度计算
+        # 这是实现进度监控的关键步骤：必须知道视频总时长才能计算百分比
+        # 同一次探测的流信息还用于判断能否直接复制流
+        stage_start = time.monotonic()
+        info = self.probe_video(str(input_path))
+        stats.add_timing('probe', time.monotonic() - stage_start)
+        total_duration = _info_duration(info)
+        stats.duration = total_duration
+        if total_duration is None:
+            self.logger.warning("无法获取视频时长，按输入文件的读取位置估算进度")
+            total_duration = 0
+        
+        quality = self._normalize_quality(quality)
+        stream_plan = self._plan_streams(info, codec_policy)
+        
+        if precheck is not None:
+            stage_start = time.monotonic()
+            rejected = self._apply_precheck(
+                input_path, output_path, total_duration, precheck, stream_plan, progress_callback
+            )
+            stats.add_timing('precheck', time.monotonic() - stage_start)
+            if rejected is not None:
+                return rejected
+        if stream_plan.get('conceal') and chunks is not None:
+            self.logger.info("错误隐藏模式下不分段编码")
+            chunks = None
+        
+        # 视频流可以直接复制时，整个转换只是I/O，分段并行没有意义
+        if chunks is not None and stream_plan['video'] == 'copy':
+            self.logger.info("视频流可直接复制，忽略分段编码设置")
+            chunks = None
+        
+        if chunks is not None:
+            return self._convert_chunked(
+                input_path,
+                output_path,
+                quality,
+                overwrite,
+                progress_callback,
+                chunks,
+                total_duration,
+                threads,
+                codec_policy,
+                priority,
+                stats
+            )
+        
+        # FFmpeg先写入同目录的临时文件，成功后再原子重命名，
+        # 被中断的转换不会留下看起来完整的输出文件
+        temp_path = _temp_output_path(output_path)
+        cmd = self._build_convert_cmd(
+            input_path, temp_path, quality, overwrite, threads, stream_plan
+        )
+        
+        try:
+            self.logger.info(f"开始转换: {input_file} -> {output_file}")
+            self.logger.info(f"使用质量设置: {quality}，{self._describe_plan(stream_plan)}")
+            
+            if progress_callback:
+                progress_callback(0.0, "开始转换...")
+            
+            # 执行转换，带进度监控；被看门狗终止时按策略换用更快的preset重试
+            attempt = 0
+            while True:
+                start_time = time.monotonic()
+                result = self._run_ffmpeg_with_progress(
+                    cmd, 
+                    total_duration, 
+                    progress_callback,
+                    event_callback,
+                    input_file=str(input_path),
+                    priority=priority,
+                    cancel=cancel
+                )
+                stats.add_run(result)
+                retry_quality = self._retry_quality(result, quality, attempt)
+                if retry_quality is None:
+                    break
+                attempt += 1
+                quality = retry_quality
+                self.logger.warning(
+                    f"第 {attempt} 次重试（{result.classify()[0]}），使用质量设置: {quality}"
+                )
+                _discard_temp(temp_path)
+                cmd = self._build_convert_cmd(
+                    input_path, temp_path, quality, overwrite, threads, stream_plan
+                )
+            
+            if result.returncode == 0:
+                encode_seconds = time.monotonic() - start_time - result.paused_seconds
+                invalid = self._verify_output(temp_path, stats)
+                if invalid is not None:
+                    return self._failure(
+                        output_path, FAILURE_INVALID_OUTPUT, invalid, progress_callback,
+                        result, attempt + 1
+                    )
+                _commit_output(temp_path, output_path)
+                self._record_perf(
+                    input_path, info, quality, stream_plan, encode_seconds, result.rusage
+                )
+                self.logger.info(f"转换成功: {output_file}")
+                if progress_callback:
+                    progress_callback(100.0, "转换完成!")
+                return ConversionResult(True, output_file, attempts=attempt + 1)
+            else:
+                return self._ffmpeg_failure(output_path, result, progress_callback, attempt + 1)
+                
+        except ConversionCancelled:
+            # 未完成的输出只存在于临时文件中，finally中删除即可
+            self.logger.warning(f"转换已取消: {input_file}")
+            raise
+        except Exception as e:
+            return self._failure(
+                output_path, FAILURE_ERROR, str(e), progress_callback, label="转换过程中发生错误"
+            )
+        finally:
+            _discard_temp(temp_path)
+    
+    def iter_progress(
+        self,
+        input_file: str,
+        output_file: Optional[str] = None,
+        quality: str = "medium",
+        overwrite: bool = False,
+        threads: Optional[int] = None,
+        codec_policy: str = "auto"
+    ) -> 'ProgressIterator':
+        """
+        以迭代器的形式转换单个文件，逐个产出ProgressEvent
+        
+        转换在后台线程中进行，迭代结束后可通过返回对象的success属性获取结果。
+        提前停止迭代（break后调用close()，或在with语句中使用）会终止FFmpeg进程并删除未完成的输出
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出的MP4文件路径，如果为None则自动生成
+            quality: 转换质量 ('low', 'medium', 'high')
+            overwrite: 是否覆盖已存在的输出文件
+            threads: FFmpeg编码线程数（-threads）
+            codec_policy: 编码策略，'auto'或'reencode'
+            
+        Returns:
+            ProgressIterator: 进度事件迭代器
+        """
+        def run(event_callback, cancel):
+            stats = _ConversionStats(input_file)
+            result = self._convert_rmvb_to_mp4(
+                input_file, output_file, quality, overwrite, None,
+                threads, None, codec_policy, event_callback, None, 0, stats, cancel
+            )
+            return stats.apply(result)
+        
+        return ProgressIterator(run)
+    
+    def convert_renditions(
+        self,
+        input_file: str,
+        renditions: List[Rendition],
+        output_dir: Optional[str] = None,
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        event_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        priority: int = 0
+    ) -> List[ConversionResult]:
+        """
+        一次解码生成多个分辨率/码率的MP4（ABR阶梯）
+        
+        用一个filter_complex把解码后的视频split为N路，分别scale后编码为N个输出，
+        输入文件只读取和解码一次。输出文件名为"<输入文件名>_<档位名称>.mp4"
+        
+        Args:
+            input_file: 输入文件路径
+            renditions: 各档位
+            output_dir: 输出目录，None时为输入文件所在目录
+            overwrite: 是否覆盖已存在的输出文件
+            progress_callback: 进度回调函数
+            event_callback: 进度事件回调函数
+            priority: 抢占优先级，见convert_rmvb_to_mp4
+            
+        Returns:
+            List[ConversionResult]: 与renditions一一对应的转换结果（同一次运行，统计信息相同）
+            
+        Raises:
+            ValueError: renditions为空或档位名称重复
+            ConversionCancelled: 回调主动取消了转换
+        """
+        if not renditions:
+            raise ValueError("renditions不能为空")
+        names = [rendition.name for rendition in renditions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"档位名称重复: {names}")
+        
+        input_path = Path(input_file)
+        directory = Path(output_dir) if output_dir else input_path.parent
+        output_paths = []
+        for rendition in renditions:
+            output_file = str(directory / f"{input_path.stem}_{rendition.name}.mp4")
+            paths = self._prepare_paths(input_file, output_file, overwrite)
+            if paths is None:
+                return [
+                    ConversionResult(False, str(directory / f"{input_path.stem}_{name}.mp4"),
+                                     FAILURE_INVALID_PATH, "输入或输出路径无效")
+                    for name in names
+                ]
+            output_paths.append(paths[1])
+        
+        stats = _ConversionStats(input_file)
+        stage_start = time.monotonic()
+        info = self.probe_video(str(input_path))
+        stats.add_timing('probe', time.monotonic() - stage_start)
+        total_duration = _info_duration(info)
+        stats.duration = total_duration
+        
+        temp_paths = [_temp_output_path(path) for path in output_paths]
+        cmd = self._build_renditions_cmd(input_path, temp_paths, renditions)
+        try:
+            self.logger.info(
+                f"开始多码率转换: {input_file} -> {', '.join(str(p) for p in output_paths)}"
+            )
+            self.logger.info("档位: " + "，".join(repr(rendition) for rendition in renditions))
+            if progress_callback:
+                progress_callback(0.0, "开始转换...")
+            
+            result = self._run_ffmpeg_with_progress(
+                cmd, total_duration or 0, progress_callback, event_callback,
+                input_file=str(input_path), priority=priority
+            )
+            stats.add_run(result)
+            
+            if result.returncode != 0:
+                failure = self._ffmpeg_failure(output_paths[0], result, progress_callback)
+                results = [failure] + [
+                    ConversionResult(False, str(path), failure.reason, failure.message,
+                                     failure.returncode, failure.stderr_tail)
+                    for path in output_paths[1:]
+                ]
+            else:
+                results = []
+                for temp_path, output_path in zip(temp_paths, output_paths):
+                    invalid = self._verify_output(temp_path, stats)
+                    if invalid is not None:
+                        results.append(self._failure(
+                            output_path, FAILURE_INVALID_OUTPUT, invalid, progress_callback, result
+                        ))
+                        continue
+                    _commit_output(temp_path, output_path)
+                    results.append(ConversionResult(True, str(output_path)))
+                self.logger.info(
+                    f"多码率转换完成: 成功 {sum(1 for r in results if r)}/{len(results)} 个输出"
+                )
+                if progress_callback and all(results):
+                    progress_callback(100.0, "转换完成!")
+        except ConversionCancelled:
+            self.logger.warning(f"转换已取消: {input_file}")
+            raise
+        except Exception as e:
+            failure = self._failure(
+                output_paths[0], FAILURE_ERROR, str(e), progress_callback, label="转换过程中发生错误"
+            )
+            results = [failure] + [
+                ConversionResult(False, str(path), FAILURE_ERROR, str(e)) for path in output_paths[1:]
+            ]
+        finally:
+            for temp_path in temp_paths:
+                _discard_temp(temp_path)
+        
+        return [stats.apply(conversion) for conversion in results]
+    
+    def _build_renditions_cmd(
+        self,
+        input_path: Path,
+        output_paths: List[Path],
+        renditions: List[Rendition]
+    ) -> List[str]:
+        """
+        构建一次解码、多路输出的FFmpeg命令
+        
+        视频经filter_complex的split分为N路，每路scale到对应档位；
+        音频（如果有）在每个输出中编码为AAC
+        
+        Args:
+            input_path: 输入文件路径
+            output_paths: 各档位的输出文件路径
+            renditions: 各档位
+            
+        Returns:
+            List[str]: FFmpeg命令列表
+        """
+        cmd = [self.ffmpeg_path, '-i', str(input_path), '-filter_complex', _renditions_graph(renditions)]
+        for i, (rendition, output_path) in enumerate(zip(renditions, output_paths)):
+            cmd.extend([
+                '-map', f"[v{i}]",
+                '-map', '0:a:0?',   # 没有音频流时忽略
+                *rendition.video_args(),
+                '-c:a', 'aac', '-b:a', rendition.audio_bitrate,
+                '-movflags', '+faststart',
+                str(output_path)
+            ])
+        return cmd
+    
+    def package_stream(
+        self,
+        input_file: str,
+        output_dir: Optional[str] = None,
+        package_format: str = 'hls',
+        renditions: Optional[List[Rendition]] = None,
+        quality: str = "medium",
+        segment_type: str = 'fmp4',
+        segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        event_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        priority: int = 0
+    ) -> ConversionResult:
+        """
+        从输入文件一次编码直接输出HLS或DASH（分片加播放列表），不需要先转MP4再切片
+        
+        指定renditions时与convert_renditions一样一次解码、split后按档位编码，
+        输出多码率的主播放列表；否则按quality以原分辨率编码一档。所有档位都在
+        分片边界强制插入关键帧，保证各档分片对齐、可以无缝切换码率。
+        输出先写入同目录下的临时目录，完整检查后再整体重命名为output_dir
+        
+        Args:
+            input_file: 输入文件路径
+            output_dir: 输出目录，None时为输入文件旁的"<输入文件名>_<格式>"目录
+            package_format: 'hls'或'dash'
+            renditions: 多码率档位，None时只输出一档
+            quality: 未指定renditions时的转换质量
+            segment_type: 分片类型，'fmp4'或'ts'（仅HLS支持ts）
+            segment_seconds: 分片时长（秒）
+            overwrite: 是否覆盖已存在的输出目录
+            progress_callback: 进度回调函数
+            event_callback: 进度事件回调函数
+            priority: 抢占优先级，见convert_rmvb_to_mp4
+            
+        Returns:
+            ConversionResult: 转换结果，output为输出目录
+            
+        Raises:
+            ValueError: 封装格式、分片类型或分片时长无效，或档位名称重复
+            ConversionCancelled: 回调主动取消了转换
+        """
+        if package_format not in PACKAGE_FORMATS:
+            raise ValueError(f"不支持的封装格式: {package_format}")
+        if segment_type not in PACKAGE_SEGMENT_TYPES:
+            raise ValueError(f"不支持的分片类型: {segment_type}")
+        if package_format == 'dash' and segment_type != 'fmp4':
+            raise ValueError("DASH只支持fmp4分片")
+        if segment_seconds <= 0:
+            raise ValueError(f"无效的分片时长: {segment_seconds}")
+        if renditions:
+            names = [rendition.name for rendition in renditions]
+            if len(set(names)) != len(names):
+                raise ValueError(f"档位名称重复: {names}")
+        quality = self._normalize_quality(quality)
+        
+        input_path = Path(input_file)
+        if output_dir is None:
+            output_dir = str(input_path.parent / f"{input_path.stem}_{package_format}")
+        paths = self._prepare_paths(input_file, output_dir, overwrite)
+        if paths is None:
+            return ConversionResult(False, output_dir, FAILURE_INVALID_PATH, "输入或输出路径无效")
+        input_path, output_path = paths
+        
+        if self.toolchain.muxers and not self.toolchain.has_muxer(package_format):
+            return self._failure(
+                output_path, FAILURE_ERROR, f"FFmpeg不支持{package_format}封装", progress_callback
+            )
+        
+        stats = _ConversionStats(input_file)
+        stage_start = time.monotonic()
+        info = self.probe_video(str(input_path))
+        stats.add_timing('probe', time.monotonic() - stage_start)
+        total_duration = _info_duration(info)
+        stats.duration = total_duration
+        # 探测失败时按有音频处理（RMVB基本都有音频）
+        has_audio = info is None or any(
+            stream.get('codec_type') == 'audio' for stream in info.get('streams', [])
+        )
+        
+        temp_dir = Path(tempfile.mkdtemp(
+            prefix=f"{PACKAGE_DIR_PREFIX}{os.getpid()}-", dir=str(output_path.parent)
+        ))
+        cmd = self._build_package_cmd(
+            input_path, temp_dir, package_format, renditions, quality,
+            segment_type, segment_seconds, has_audio
+        )
+        try:
+            self.logger.info(f"开始{package_format.upper()}打包: {input_file} -> {output_path}")
+            if renditions:
+                self.logger.info("档位: " + "，".join(repr(rendition) for rendition in renditions))
+            else:
+                self.logger.info(f"使用质量设置: {quality}")
+            if progress_callback:
+                progress_callback(0.0, "开始转换...")
+            
+            result = self._run_ffmpeg_with_progress(
+                cmd, total_duration or 0, progress_callback, event_callback,
+                input_file=str(input_path), priority=priority
+            )
+            stats.add_run(result)
+            
+            if result.returncode != 0:
+                conversion = self._ffmpeg_failure(output_path, result, progress_callback)
+            else:
+                stage_start = time.monotonic()
+                invalid = _verify_package(temp_dir, package_format)
+                stats.add_timing('verify', time.monotonic() - stage_start)
+                if invalid is not None:
+                    conversion = self._failure(
+                        output_path, FAILURE_INVALID_OUTPUT, invalid, progress_callback, result
+                    )
+                else:
+                    _commit_directory(temp_dir, output_path)
+                    self.logger.info(f"{package_format.upper()}打包完成: {output_path}")
+                    if progress_callback:
+                        progress_callback(100.0, "转换完成!")
+                    conversion = ConversionResult(True, str(output_path))
+        except ConversionCancelled:
+            self.logger.warning(f"转换已取消: {input_file}")
+            raise
+        except Exception as e:
+            conversion = self._failure(
+                output_path, FAILURE_ERROR, str(e), progress_callback, label="转换过程中发生错误"
+            )
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        return stats.apply(conversion)
+    
+    def _build_package_cmd(
+        self,
+        input_path: Path,
+        temp_dir: Path,
+        package_format: str,
+        renditions: Optional[List[Rendition]],
+        quality: str,
+        segment_type: str,
+        segment_seconds: float,
+        has_audio: bool
+    ) -> List[str]:
+        """
+        构建一次编码直接输出HLS/DASH的FFmpeg命令
+        
+        所有视频流写入同一个hls/dash输出，编码参数用流说明符区分各档（-crf:v:1等）。
+        HLS每档带一路音频，用-var_stream_map组成各个子播放列表；DASH所有档共用一路音频
+        
+        Args:
+            input_path: 输入文件路径
+            temp_dir: 输出临时目录
+            package_format: 'hls'或'dash'
+            renditions: 多码率档位，None时以原分辨率按quality编码一档
+            quality: 未指定renditions时的转换质量
+            segment_type: 分片类型，'fmp4'或'ts'
+            segment_seconds: 分片时长（秒）
+            has_audio: 输入是否有音频流
+            
+        Returns:
+            List[str]: FFmpeg命令列表
+        """
+        cmd = [self.ffmpeg_path, '-i', str(input_path)]
+        if renditions:
+            cmd.extend(['-filter_complex', _renditions_graph(renditions)])
+            variants = [
+                (f"[v{i}]", rendition.video_args(i), rendition.audio_bitrate, rendition.name)
+                for i, rendition in enumerate(renditions)
+            ]
+        else:
+            video_args = _stream_options(['-c:v', 'libx264', *QUALITY_SETTINGS[quality]], 'v', 0)
+            variants = [('0:v:0', video_args, DEFAULT_RENDITION_AUDIO_BITRATE, 'source')]
+        
+        for video_map, video_args, _, _ in variants:
+            cmd.extend(['-map', video_map, *video_args])
+        # 在每个分片边界强制关键帧并关闭场景切换关键帧，使各档分片边界一致
+        cmd.extend([
+            '-force_key_frames', f"expr:gte(t,n_forced*{segment_seconds:g})",
+            '-sc_threshold', '0'
+        ])
+        
+        if package_format == 'dash':
+            if has_audio:
+                # 各档共用一路音频，码率取第一档的设置
+                cmd.extend(['-map', '0:a:0', '-c:a', 'aac', '-b:a', variants[0][2]])
+            cmd.extend([
+                '-f', 'dash',
+                '-seg_duration', f"{segment_seconds:g}",
+                '-use_template', '1', '-use_timeline', '1',
+                '-init_seg_name', 'init-$RepresentationID$.m4s',
+                '-media_seg_name', 'chunk-$RepresentationID$-$Number%05d$.m4s',
+                '-adaptation_sets', 'id=0,streams=v id=1,streams=a' if has_audio else 'id=0,streams=v',
+                str(temp_dir / DASH_MANIFEST)
+            ])
+            return cmd
+        
+        stream_map = []
+        for i, (_, _, audio_bitrate, name) in enumerate(variants):
+            if has_audio:
+                cmd.extend([
+                    '-map', '0:a:0', *_stream_options(['-c:a', 'aac', '-b:a', audio_bitrate], 'a', i)
+                ])
+                stream_map.append(f"v:{i},a:{i},name:{name}")
+            else:
+                stream_map.append(f"v:{i},name:{name}")
+        cmd.extend([
+            '-f', 'hls',
+            '-hls_time', f"{segment_seconds:g}",
+            '-hls_playlist_type', 'vod',
+            '-master_pl_name', HLS_MASTER_PLAYLIST,
+            '-var_stream_map', ' '.join(stream_map)
+        ])
+        if segment_type == 'fmp4':
+            cmd.extend(['-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', 'init.mp4'])
+            segment_name = 'seg_%05d.m4s'
+        else:
+            cmd.extend(['-hls_segment_type', 'mpegts'])
+            segment_name = 'seg_%05d.ts'
+        # %v由FFmpeg替换为各档名称，每档一个子目录
+        cmd.extend([
+            '-hls_segment_filename', str(temp_dir / 'stream_%v' / segment_name),
+            str(temp_dir / 'stream_%v' / 'index.m3u8')
+        ])
+        return cmd
+    
+    def _prepare_paths(
+        self,
+        input_file: str,
+        output_file: Optional[str],
+        overwrite: bool
+    ) -> Optional[tuple]:
+        """
+        检查输入输出路径并创建输出目录
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径，None时使用输入文件同名的.mp4
+            overwrite: 是否覆盖已存在的输出文件
+            
+        Returns:
+            tuple: (输入路径, 输出路径)，检查失败时返回None
+        """
+        # 检查输入文件
+        input_path = Path(input_file)
+        if not input_path.exists():
+            self.logger.error(f"输入文件不存在: {input_file}")
+            return None
+        
+        if input_path.suffix.lower() not in INPUT_EXTENSIONS:
+            self.logger.warning(f"输入文件不是常见的视频格式: {input_file}")
+        
+        # 生成输出文件路径
+        if output_file is None:
+            output_file = str(input_path.with_suffix('.mp4'))
+        
+        output_path = Path(output_file)
+        
+        # 检查输出文件是否已存在
+        if output_path.exists() and not overwrite:
+            self.logger.error(f"输出文件已存在: {output_file}，使用overwrite=True来覆盖")
+            return None
+        
+        # 创建输出目录
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        return input_path, output_path
+    
+    def _normalize_quality(self, quality: str) -> str:
+        """检查质量设置，未知的质量设置回退为medium"""
+        if quality not in QUALITY_SETTINGS:
+            self.logger.warning(f"未知的质量设置: {quality}，使用默认设置")
+            return 'medium'
+        return quality
+    
+    def _plan_streams(self, info: Optional[dict], codec_policy: str = "auto") -> dict:
+        """
+        根据输入的流信息决定每路流是直接复制还是重新编码
+        
+        Args:
+            info: probe_video返回的信息字典，None表示探测失败（此时总是重新编码）
+            codec_policy: 编码策略，'auto'或'reencode'
+            
+        Returns:
+            dict: {'video': 'copy'或'encode', 'audio': 'copy'或'encode',
+                   'video_codec': 输入视频编解码器名称}
+        """
+        if codec_policy not in CODEC_POLICIES:
+            self.logger.warning(f"未知的编码策略: {codec_policy}，使用auto")
+            codec_policy = 'auto'
+        
+        plan = {'video': 'encode', 'audio': 'encode', 'video_codec': None}
+        if info is None or codec_policy == 'reencode':
+            return plan
+        
+        streams = info.get('streams', [])
+        video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+        audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+        if video is not None:
+            plan['video_codec'] = video.get('codec_name')
+            if plan['video_codec'] in MP4_COPY_VIDEO_CODECS:
+                plan['video'] = 'copy'
+        if audio is not None and audio.get('codec_name') in MP4_COPY_AUDIO_CODECS:
+            plan['audio'] = 'copy'
+        return plan
+    
+    def _describe_plan(self, stream_plan: dict) -> str:
+        """生成编码计划的日志描述"""
+        names = {'copy': '直接复制', 'encode': '重新编码'}
+        return f"视频{names[stream_plan['video']]}，音频{names[stream_plan['audio']]}"
+    
+    def _retry_quality(
+        self,
+        result: FFmpegResult,
+        quality: str,
+        attempt: int
+    ) -> Optional[str]:
+        """
+        判断失败的任务是否重试，以及重试使用的质量档位
+        
+        只有失败原因在RETRYABLE_FAILURES中（超时、停滞、过慢、被终止）时才重试，
+        重试次数由看门狗策略的retries决定
+        
+        Args:
+            result: 本次FFmpeg运行结果
+            quality: 本次使用的质量档位
+            attempt: 已经重试的次数
+            
+        Returns:
+            str: 重试使用的质量档位（QUALITY_FALLBACK中更快的一档），不重试时返回None
+        """
+        if result.returncode == 0 or self.watchdog is None:
+            return None
+        if attempt >= self.watchdog.retries or result.classify()[0] not in RETRYABLE_FAILURES:
+            return None
+        return QUALITY_FALLBACK.get(quality, quality)
+    
+    def _verify_output(self, path: Path, stats: _ConversionStats) -> Optional[str]:
+        """
+        提交前检查输出文件的MP4结构，耗时记为verify阶段
+        
+        Args:
+            path: 待检查的文件（临时输出）
+            stats: 转换统计
+            
+        Returns:
+            str: 发现的问题，结构完整时返回None
+        """
+        stage_start = time.monotonic()
+        problem = _verify_mp4(path)
+        stats.add_timing('verify', time.monotonic() - stage_start)
+        return problem
+    
+    def _failure(
+        self,
+        output_path: Path,
+        reason: str,
+        message: str,
+        progress_callback: Optional[Callable[[float, str], None]],
+        result: Optional[FFmpegResult] = None,
+        attempts: int = 1,
+        label: str = "转换失败"
+    ) -> ConversionResult:
+        """
+        记录失败并生成ConversionResult
+        
+        日志中只写失败原因、说明和stderr的最后FAILURE_LOG_LINES行，进度回调只收到一行说明
+        
+        Args:
+            output_path: 输出文件路径
+            reason: 失败原因（FAILURE_*）
+            message: 说明
+            progress_callback: 进度回调函数
+            result: FFmpeg运行结果，没有运行FFmpeg时为None
+            attempts: 运行FFmpeg的次数
+            label: 日志和回调中的前缀
+            
+        Returns:
+            ConversionResult: 失败结果
+        """
+        tail = result.stderr.splitlines() if result is not None else []
+        conversion = ConversionResult(
+            False, str(output_path), reason, message,
+            result.returncode if result is not None else None, tail, attempts
+        )
+        summary = f"{label}（{conversion.description}）: {message}"
+        if tail:
+            self.logger.error(summary + "\n" + "\n".join(tail[-FAILURE_LOG_LINES:]))
+        else:
+            self.logger.error(summary)
+        if progress_callback:
+            progress_callback(-1, summary)
+        return conversion
+    
+    def _ffmpeg_failure(
+        self,
+        output_path: Path,
+        result: FFmpegResult,
+        progress_callback: Optional[Callable[[float, str], None]],
+        attempts: int = 1,
+        label: str = "转换失败"
+    ) -> ConversionResult:
+        """按FFmpeg运行结果分类失败原因，见_failure"""
+        reason, message = result.classify()
+        return self._failure(output_path, reason, message, progress_callback, result, attempts, label)
+    
+    def _record_perf(
+        self,
+        input_path: Path,
+        info: Optional[dict],
+        quality: str,
+        stream_plan: dict,
+        wall_seconds: float,
+        rusage: Optional[dict]
+    ):
+        """把一个成功任务的耗时写入性能历史（未启用性能历史或时长未知时什么都不做）"""
+        duration = _info_duration(info)
+        if self.perf_history is None or not duration:
+            return
+        width, height = _info_dimensions(info)
+        try:
+            self.perf_history.record(
+                str(input_path), quality, stream_plan['video'], duration, width, height,
+                wall_seconds, rusage['cpu_seconds'] if rusage else None,
+                rusage['max_rss_kb'] if rusage else None
+            )
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入性能历史失败: {str(e)}")
+    
+    def estimate_memory_mb(
+        self,
+        width: Optional[int],
+        height: Optional[int],
+        quality: str = "medium",
+        mode: str = 'encode'
+    ) -> float:
+        """
+        估算单个转换任务中FFmpeg进程的峰值常驻内存
+        
+        先按preset缓存的帧数和分辨率估算，启用性能历史后用实测的峰值内存拟合修正
+        
+        Args:
+            width: 视频宽度，未知时按1080p估算
+            height: 视频高度
+            quality: 转换质量
+            mode: 视频流的处理方式，'encode'或'copy'
+            
+        Returns:
+            float: 预计峰值内存（MB），已包含MEMORY_ESTIMATE_MARGIN的余量
+        """
+        if quality not in QUALITY_SETTINGS:
+            quality = 'medium'
+        if self.perf_history is None:
+            model = PerfHistory.default_memory_model(quality, mode)
+        else:
+            model = self.perf_history.memory_model(quality, mode)
+        megapixels = width * height / 1e6 if width and height else MEMORY_DEFAULT_MEGAPIXELS
+        return model.value(megapixels) * MEMORY_ESTIMATE_MARGIN
+    
+    def _cost_model(self, quality: str, mode: str) -> CostModel:
+        """获取耗时模型，未启用性能历史时使用经验模型"""
+        if self.perf_history is None:
+            return PerfHistory.default_model(quality, mode)
+        return self.perf_history.model(quality, mode)
+    
+    def predict_encode_seconds(
+        self,
+        video_file: str,
+        quality: str = "medium",
+        codec_policy: str = "auto"
+    ) -> Optional[float]:
+        """
+        在转换开始前预测单个文件的转换耗时
+        
+        Args:
+            video_file: 视频文件路径
+            quality: 转换质量
+            codec_policy: 编码策略，流可以直接复制时按复制的速度预测
+            
+        Returns:
+            float: 预计耗时（秒），探测失败或时长未知时返回None
+        """
+        info = self.probe_video(video_file)
+        duration = _info_duration(info)
+        if duration is None:
+            return None
+        quality = self._normalize_quality(quality)
+        mode = self._plan_streams(info, codec_policy)['video']
+        width, height = _info_dimensions(info)
+        megapixels = width * height / 1e6 if width and height else None
+        return self._cost_model(quality, mode).predict(duration, megapixels)
+    
+    def _build_convert_cmd(
+        self,
+        input_path: Path,
+        output_path: Path,
+        quality: str,
+        overwrite: bool,
+        threads: Optional[int],
+        stream_plan: Optional[dict] = None
+    ) -> List[str]:
+        """
+        构建单文件转换的FFmpeg命令
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            quality: 转换质量（已经过_normalize_quality检查）
+            overwrite: 是否覆盖已存在的输出文件
+            threads: FFmpeg编码线程数，None时由FFmpeg自动决定
+            stream_plan: _plan_streams返回的编码计划，None时视频和音频都重新编码；
+                         其中conceal为True时开启解码错误隐藏
+            
+        Returns:
+            List[str]: FFmpeg命令列表，最后一项为输出文件路径
+        """
+        stream_plan = stream_plan or {'video': 'encode', 'audio': 'encode'}
+        cmd = [self.ffmpeg_path]
+        if stream_plan.get('conceal'):
+            # 预检发现损坏时开启错误隐藏，而不是在损坏处中止
+            cmd.extend(CONCEAL_INPUT_ARGS)
+        cmd.extend(['-i', str(input_path)])   # 输入文件
+        
+        if stream_plan['video'] == 'copy':
+            cmd.extend(['-c:v', 'copy'])
+            if stream_plan.get('video_codec') == 'hevc':
+                # Apple系播放器只识别hvc1标签的HEVC
+                cmd.extend(['-tag:v', 'hvc1'])
+            elif stream_plan.get('video_codec') == 'mpeg4':
+                # AVI中的Xvid/DivX常用packed B帧，放入MP4前需要解包
+                cmd.extend(['-bsf:v', 'mpeg4_unpack_bframes'])
+        else:
+            # 使用H.264编码器，这是最兼容的选择
+            cmd.extend([
+                '-c:v', 'libx264',            # 视频编码器：H.264
+                *QUALITY_SETTINGS[quality],   # 质量设置（CRF值和preset）
+            ])
+        
+        # 音频编码器：兼容时直接复制，否则使用AAC
+        cmd.extend(['-c:a', 'copy' if stream_plan['audio'] == 'copy' else 'aac'])
+        
+        # 优化网络播放：将metadata移到文件开头
+        cmd.extend(['-movflags', '+faststart'])
+        
+        # 并行批量转换时限制单个进程的线程数，避免多个进程争抢CPU
+        if threads and stream_plan['video'] != 'copy':
+            cmd.extend(['-threads', str(threads)])
+        
+        if stream_plan.get('conceal'):
+            # 默认错误率超过2/3时FFmpeg会以失败退出，错误隐藏模式下不设上限
+            cmd.extend(['-max_error_rate', '1.0'])
+        
+        # 如果允许覆盖，添加-y参数
+        if overwrite:
+            cmd.append('-y')
+        
+        # 添加输出文件路径
+        cmd.append(str(output_path))
+        return cmd
+    
+    def precheck_decode(
+        self,
+        input_file: str,
+        duration: Optional[float] = None,
+        window: float = PRECHECK_WINDOW_SECONDS,
+        points: int = PRECHECK_MIDDLE_POINTS
+    ) -> dict:
+        """
+        解码预检：在正式编码前快速解码若干采样窗口，检查输入是否损坏
+        
+        采样开头、中间均匀分布的points个位置和结尾，每个窗口用-f null只解码不编码，
+        并开启FFmpeg的错误检测；-v error下stderr的任何输出都视为解码错误
+        
+        Args:
+            input_file: 输入文件路径
+            duration: 视频时长（秒），None时只检查开头和结尾
+            window: 每个窗口解码的时长（秒）
+            points: 中间采样点数
+            
+        Returns:
+            dict: ok（是否未发现错误）、error_count、windows（每个窗口的start和errors）、
+                  seconds（预检耗时）
+        """
+        # 每个窗口的定位参数：开头、中间用-ss，结尾用-sseof（不依赖时长）
+        seeks = [('0', ['-ss', '0'])]
+        if duration and duration > window * 2:
+            for k in range(1, points + 1):
+                start = duration * k / (points + 1)
+                seeks.append((f"{start:.1f}", ['-ss', f"{start:.3f}"]))
+        if not duration or duration > window:
+            seeks.append(('end', ['-sseof', f"-{window:g}"]))
+        
+        start_time = time.monotonic()
+        windows = []
+        for label, seek_args in seeks:
+            cmd = [
+                self.ffmpeg_path, '-nostdin', '-v', 'error',
+                '-err_detect', 'crccheck+bitstream+buffer',
+                *seek_args, '-t', f"{window:g}", '-i', str(input_file),
+                '-map', '0:v?', '-map', '0:a?', '-f', 'null', '-'
+            ]
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=PRECHECK_TIMEOUT)
+                errors = [line.strip() for line in result.stderr.splitlines() if line.strip()]
+                if result.returncode != 0 and not errors:
+                    errors = [f"FFmpeg返回码 {result.returncode}"]
+            except subprocess.TimeoutExpired:
+                errors = [f"解码超过 {PRECHECK_TIMEOUT} 秒未完成"]
+            # 损坏严重时错误信息可能有成千上万行，只保留开头的一部分
+            windows.append({'start': label, 'errors': errors[:20], 'error_count': len(errors)})
+        
+        error_count = sum(w['error_count'] for w in windows)
+        return {
+            'ok': error_count == 0,
+            'error_count': error_count,
+            'windows': windows,
+            'seconds': time.monotonic() - start_time,
+        }
+    
+    def _apply_precheck(
+        self,
+        input_path: Path,
+        output_path: Path,
+        total_duration: float,
+        policy: str,
+        stream_plan: dict,
+        progress_callback: Optional[Callable[[float, str], None]]
+    ) -> Optional[ConversionResult]:
+        """
+        运行解码预检并按策略处理损坏的输入
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            total_duration: 视频总时长（秒），0表示未知
+            policy: 'skip'、'quarantine'或'conceal'
+            stream_plan: 编码计划，conceal时会被修改为开启错误隐藏并重新编码视频
+            progress_callback: 进度回调函数
+            
+        Returns:
+            ConversionResult: 不再转换时返回失败结果（reason为corrupt_input），继续转换时返回None
+        """
+        if policy not in PRECHECK_POLICIES:
+            self.logger.warning(f"未知的预检策略: {policy}，使用skip")
+            policy = 'skip'
+        
+        if progress_callback:
+            progress_callback(0.0, "解码预检...")
+        report = self.precheck_decode(str(input_path), total_duration or None)
+        if report['ok']:
+            self.logger.info(f"解码预检通过: {input_path}（{report['seconds']:.1f} 秒）")
+            return None
+        
+        bad = [w['start'] for w in report['windows'] if w['error_count']]
+        first_error = next(w['errors'][0] for w in report['windows'] if w['errors'])
+        self.logger.warning(
+            f"解码预检发现 {report['error_count']} 个错误: {input_path}，"
+            f"出错位置 {', '.join(bad)}，首个错误: {first_error}"
+        )
+        
+        if policy == 'conceal':
+            # 错误隐藏需要解码，直接复制的视频流也改为重新编码
+            stream_plan['conceal'] = True
+            stream_plan['video'] = 'encode'
+            self.logger.info("开启错误隐藏后继续转换")
+            return None
+        
+        if policy == 'quarantine':
+            target = self._quarantine(input_path, report)
+            self.logger.warning(f"输入文件已隔离: {target}")
+            status = f"输入文件损坏，已隔离到 {target}"
+        else:
+            status = "输入文件损坏，已跳过"
+        if progress_callback:
+            progress_callback(-1, status)
+        return ConversionResult(False, str(output_path), FAILURE_CORRUPT_INPUT, first_error, attempts=0)
+    
+    def _quarantine(self, input_path: Path, report: dict) -> Path:
+        """
+        把预检失败的输入文件移到同目录下的隔离目录，并在旁边写入预检报告
+        
+        隔离目录中已有同名文件（例如之前隔离过另一个同名文件）时，
+        在文件名后追加序号，不覆盖已隔离的文件
+        
+        Args:
+            input_path: 输入文件路径
+            report: precheck_decode返回的预检报告
+            
+        Returns:
+            Path: 隔离后的文件路径
+        """
+        quarantine_dir = input_path.parent / QUARANTINE_DIR
+        quarantine_dir.mkdir(exist_ok=True)
+        target = quarantine_dir / input_path.name
+        counter = 1
+        while target.exists():
+            target = quarantine_dir / f"{input_path.stem}_{counter}{input_path.suffix}"
+            counter += 1
+        os.replace(input_path, target)
+        with open(quarantine_dir / f"{target.name}.precheck.json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return target
+    
+    def _get_keyframe_times(self, video_file: str) -> List[float]:
+        """
+        获取视频流所有关键帧的时间点（秒）
+        
+        只读取数据包标志（flags中含K即为关键帧），不需要解码，
+        耗时基本等于顺序读一遍文件
+        
+        Args:
+            video_file: 视频文件路径
+            
+        Returns:
+            List[float]: 升序排列的关键帧时间点，失败或超过KEYFRAME_PROBE_TIMEOUT时返回空列表
+        """
+        try:
+            cmd = [
+                self.ffprobe_path,
+                '-v', 'quiet',
+                '-select_streams', 'v:0',
+                '-show_entries', 'packet=pts_time,flags',
+                '-print_format', 'json',
+                video_file
+            ]
+            
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=KEYFRAME_PROBE_TIMEOUT
+            )
+            
+            if result.returncode != 0:
+                return []
+            
+            packets = json.loads(result.stdout).get('packets', [])
+            times = set()
+            for packet in packets:
+                pts_time = packet.get('pts_time')
+                if 'K' in packet.get('flags', '') and pts_time not in (None, 'N/A'):
+                    times.add(float(pts_time))
+            return sorted(times)
+            
+        except subprocess.TimeoutExpired:
+            self.logger.warning(f"读取关键帧超时（{KEYFRAME_PROBE_TIMEOUT} 秒）: {video_file}")
+            return []
+        except Exception:
+            return []
+    
+    def _plan_chunks(
+        self,
+        keyframes: List[float],
+        total_duration: float,
+        chunk_count: int
+    ) -> List[tuple]:
+        """
+        根据关键帧把视频切分为若干时间段
+        
+        每个切分点取离等分点最近的关键帧，保证每段都从关键帧开始，
+        这样各段可以独立解码，拼接后画面不会丢失或重复
+        
+        Args:
+            keyframes: 关键帧时间点列表
+            total_duration: 视频总时长（秒）
+            chunk_count: 期望的段数
+            
+        Returns:
+            List[tuple]: (开始时间, 结束时间)列表，最后一段的结束时间为None表示到文件末尾
+        """
+        chunk_count = max(1, min(chunk_count, int(total_duration // MIN_CHUNK_SECONDS)))
+        
+        boundaries = [0.0]
+        for i in range(1, chunk_count):
+            target = total_duration * i / chunk_count
+            candidates = [t for t in keyframes if t > boundaries[-1] + MIN_CHUNK_SECONDS / 2]
+            if not candidates:
+                break
+            boundaries.append(min(candidates, key=lambda t: abs(t - target)))
+        
+        ranges = []
+        for i, start in enumerate(boundaries):
+            end = boundaries[i + 1] if i + 1 < len(boundaries) else None
+            ranges.append((start, end))
+        return ranges
+    
+    def _convert_chunked(
+        self,
+        input_path: Path,
+        output_path: Path,
+        quality: str,
+        overwrite: bool,
+        progress_callback: Optional[Callable[[float, str], None]],
+        chunks: Union[int, str],
+        total_duration: float,
+        threads: Optional[int],
+        codec_policy: str,
+        priority: int,
+        stats: _ConversionStats
+    ) -> ConversionResult:
+        """
+        分段并行编码单个长视频
+        
+        处理流程：
+        1. 读取关键帧位置，把视频切分为N个从关键帧开始的时间段
+        2. 每段视频由独立的FFmpeg进程并行编码（不含音频）
+        3. 音频作为一个独立任务完整编码一次，避免分段拼接导致的音频断点
+        4. 使用concat demuxer按各段的精确时长拼接视频，并与音频复用为最终MP4
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            quality: 转换质量
+            overwrite: 是否覆盖已存在的输出文件
+            progress_callback: 进度回调函数，接收(progress, status)参数
+            chunks: 段数，整数或"auto"
+            total_duration: 视频总时长（秒），为0时无法分段
+            threads: 不能分段、改用普通模式时FFmpeg的线程数
+            codec_policy: 不能分段、改用普通模式时的编码策略
+            priority: 各FFmpeg进程的抢占优先级
+            stats: 转换统计，并行编码阶段按墙钟计入encode，合并计入mux
+            
+        Returns:
+            ConversionResult: 转换结果
+        """
+        if total_duration <= 0:
+            self.logger.warning("无法获取视频时长，不能分段编码，改用普通模式")
+            return self._convert_rmvb_to_mp4(
+                str(input_path), str(output_path), quality, overwrite, progress_callback,
+                threads, None, codec_policy, None, None, priority, stats
+            )
+        
+        if chunks == "auto":
+            chunk_count = max(2, _available_cpus() // AUTO_JOB_CPUS)
+        else:
+            try:
+                chunk_count = _resolve_jobs(chunks)
+            except (TypeError, ValueError):
+                self.logger.warning(f"无效的分段数: {chunks}，改用普通模式")
+                return self._convert_rmvb_to_mp4(
+                    str(input_path), str(output_path), quality, overwrite, progress_callback,
+                    threads, None, codec_policy, None, None, priority, stats
+                )
+        
+        ranges = self._plan_chunks(
+            self._get_keyframe_times(str(input_path)), total_duration, chunk_count
+        )
+        if len(ranges) < 2:
+            self.logger.info("视频过短或关键帧不足，不进行分段，改用普通模式")
+            return self._convert_rmvb_to_mp4(
+                str(input_path), str(output_path), quality, overwrite, progress_callback,
+                threads, None, codec_policy, None, None, priority, stats
+            )
+        
+        info = self.probe_video(str(input_path)) or {}
+        has_audio = any(
+            stream.get('codec_type') == 'audio' for stream in info.get('streams', [])
+        )
+        
+        threads = _threads_per_job(len(ranges))
+        self.logger.info(f"开始分段转换: {input_path} -> {output_path}")
+        self.logger.info(f"使用质量设置: {quality}，{len(ranges)} 段并行，每段 {threads} 个线程")
+        
+        # 临时文件放在输出目录下，保证最终复用时不跨文件系统
+        work_dir = Path(tempfile.mkdtemp(
+            prefix=f"{CHUNK_DIR_PREFIX}{os.getpid()}-", dir=str(output_path.parent)
+        ))
+        temp_path = _temp_output_path(output_path)
+        
+        # 各任务的进度按时长加权汇总为整体进度
+        video_weight = 1.0 - CHUNK_AUDIO_WEIGHT if has_audio else 1.0
+        weights = []
+        for start, end in ranges:
+            length = (end if end is not None else total_duration) - start
+            weights.append(video_weight * length / total_duration)
+        if has_audio:
+            weights.append(CHUNK_AUDIO_WEIGHT)
+        task_progress = [0.0] * len(weights)
+        progress_lock = threading.Lock()
+        last_reported = [0.0]
+        
+        def make_task_callback(index: int):
+            def task_callback(progress: float, status: str):
+                if progress < 0 or not progress_callback:
+                    return
+                with progress_lock:
+                    task_progress[index] = progress
+                    overall = sum(w * p for w, p in zip(weights, task_progress))
+                    if overall - last_reported[0] >= 1.0:
+                        last_reported[0] = overall
+                        progress_callback(overall, f"分段转换中... {overall:.1f}%")
+            return task_callback
+        
+        try:
+            if progress_callback:
+                progress_callback(0.0, "开始转换...")
+            
+            tasks = []
+            chunk_files = []
+            for index, (start, end) in enumerate(ranges):
+                chunk_file = work_dir / f"chunk_{index:04d}.mp4"
+                chunk_files.append(chunk_file)
+                cmd = [self.ffmpeg_path, '-ss', f"{start:.3f}", '-i', str(input_path)]
+                if end is not None:
+                    # 少截0.5毫秒，确保下一段起点的关键帧不会同时出现在本段末尾
+                    cmd.extend(['-t', f"{end - start - 0.0005:.4f}"])
+                cmd.extend([
+                    '-map', '0:v:0',
+                    '-c:v', 'libx264',
+                    *QUALITY_SETTINGS[quality],
+                    '-threads', str(threads),
+                    '-y', str(chunk_file)
+                ])
+                length = (end if end is not None else total_duration) - start
+                tasks.append((cmd, length, make_task_callback(index)))
+            
+            audio_file = work_dir / "audio.m4a"
+            if has_audio:
+                cmd = [
+                    self.ffmpeg_path,
+                    '-i', str(input_path),
+                    '-map', '0:a:0',
+                    '-c:a', 'aac',
+                    '-y', str(audio_file)
+                ]
+                tasks.append((cmd, total_duration, make_task_callback(len(ranges))))
+            
+            failure = None
+            paused = []
+            # 任一任务失败后终止其余仍在运行的FFmpeg进程，它们的输出已经用不上
+            abort = threading.Event()
+            stage_start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                futures = [
+                    executor.submit(
+                        self._run_ffmpeg_with_progress, cmd, length, callback,
+                        priority=priority, cancel=abort
+                    )
+                    for cmd, length, callback in tasks
+                ]
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except ConversionCancelled:
+                        continue
+                    paused.append(result.paused_seconds)
+                    stats.add_run(result, stage=None)
+                    if result.returncode != 0 and failure is None:
+                        failure = self._ffmpeg_failure(
+                            output_path, result, progress_callback, label="分段编码失败"
+                        )
+                        abort.set()
+                        for other in futures:
+                            other.cancel()
+            # 各段同时被暂停和恢复，取最长的暂停时间从并行阶段的墙钟中扣除
+            paused_seconds = max(paused, default=0.0)
+            if paused_seconds:
+                stats.add_timing('paused', paused_seconds)
+            stats.add_timing('encode', time.monotonic() - stage_start - paused_seconds)
+            if failure is not None:
+                return failure
+            
+            # concat列表中写明每段的时长，拼接时按源时间轴累加偏移，避免音画逐段漂移
+            concat_list = work_dir / "concat.txt"
+            with open(concat_list, 'w', encoding='utf-8') as f:
+                for chunk_file, (start, end) in zip(chunk_files, ranges):
+                    f.write(f"file '{chunk_file.name}'\n")
+                    if end is not None:
+                        f.write(f"duration {end - start:.6f}\n")
+            
+            cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', str(concat_list)]
+            if has_audio:
+                cmd.extend(['-i', str(audio_file), '-map', '0:v:0', '-map', '1:a:0'])
+            cmd.extend(['-c', 'copy', '-movflags', '+faststart'])
+            cmd.append(str(temp_path))
+            
+            result = self._run_ffmpeg_with_progress(cmd, 0, None, priority=priority)
+            stats.add_run(result, stage='mux')
+            if result.returncode != 0:
+                return self._ffmpeg_failure(
+                    output_path, result, progress_callback, label="分段合并失败"
+                )
+            
+            invalid = self._verify_output(temp_path, stats)
+            if invalid is not None:
+                return self._failure(
+                    output_path, FAILURE_INVALID_OUTPUT, invalid, progress_callback,
+                    result, len(tasks) + 1
+                )
+            _commit_output(temp_path, output_path)
+            self.logger.info(f"转换成功: {output_path}")
+            if progress_callback:
+                progress_callback(100.0, "转换完成!")
+            return ConversionResult(True, str(output_path), attempts=len(tasks) + 1)
+            
+        except Exception as e:
+            return self._failure(
+                output_path, FAILURE_ERROR, str(e), progress_callback, label="分段转换过程中发生错误"
+            )
+        finally:
+            _discard_temp(temp_path)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def batch_convert_rmvb_to_mp4(
+        self,
+        input_dir: str,
+        output_dir: Optional[str] = None,
+        quality: str = "medium",
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        jobs: Union[int, str] = 1,
+        order: str = "input",
+        priorities: Optional[Dict[str, int]] = None,
+        extensions: Iterable[str] = DEFAULT_BATCH_EXTENSIONS,
+        codec_policy: str = "auto",
+        resume: bool = False,
+        incremental: bool = False,
+        dry_run: bool = False,
+        precheck: Optional[str] = None,
+        concurrency: Optional[ConcurrencyController] = None,
+        memory_budget: Optional[Union[float, str]] = None
+    ) -> 'BatchResult':
+        """
+        批量转换目录中的RMVB文件为MP4文件
+        
+        Args:
+            input_dir: 输入目录路径
+            output_dir: 输出目录路径，如果为None则与输入目录相同
+            quality: 转换质量
+            overwrite: 是否覆盖已存在的文件
+            progress_callback: 批量进度回调函数，接收(progress, status)参数。progress为按各文件
+                               时长加权的整体百分比，status包含完成数、整体编码速度（实时倍数）、
+                               预计剩余时间和各运行中任务的百分比
+            jobs: 同时运行的转换任务数，整数或"auto"（按可用CPU核数自动决定）。
+                  多任务并行时会把CPU核数平均分配给各FFmpeg进程的-threads参数
+            order: 任务派发顺序：
+                   'input' - 按目录扫描顺序；
+                   'lpt' - 时长最长的优先，使并行批量的总耗时最短；
+                   'spt' - 时长最短的优先，使各文件的平均完成时间最短；
+                   'priority' - 按priorities指定的优先级从高到低，同优先级按时长最长优先
+            priorities: 文件名（或完整路径）到优先级的映射，数值越大越先处理，未列出的为0。
+                        同时作为各任务的抢占优先级：并行运行时，低优先级任务的FFmpeg进程
+                        在更高优先级的任务运行期间被暂停，见PreemptionScheduler
+            extensions: 要转换的文件扩展名，默认只处理.rmvb，
+                        可加入'.mkv'、'.avi'、'.flv'等一并处理
+            codec_policy: 编码策略，见convert_rmvb_to_mp4
+            resume: 是否从上次中断的批量继续。批量过程中每个任务的状态都会写入
+                    输出目录下的任务日志；resume=True时，日志中已完成、设置指纹未变
+                    且输出校验和一致的任务直接跳过，未完成任务留下的半成品输出
+                    会被删除后重新转换
+            incremental: 是否增量转换。每个成功的输出旁边都会写一个转换标记文件，
+                         记录源文件的大小、修改时间和快速校验和以及转换设置；
+                         incremental=True时只转换源文件或设置有变化的文件，
+                         判断过程不需要启动ffprobe
+            dry_run: 只生成执行计划而不转换：按耗时模型预测每个任务的耗时和
+                     开始/结束时间，结果保存在last_batch_plan中，不转换也不删除任何文件
+            precheck: 每个任务编码前的解码预检策略（'skip'、'quarantine'、'conceal'），
+                      见convert_rmvb_to_mp4
+            concurrency: 自适应并发控制器。设置后jobs被忽略，同时运行的任务数由控制器
+                         按系统负载在其上下限内调整；新任务的-threads按当前任务数和
+                         尚未分配的核数决定，运行中任务的线程总数不超过可用核数
+            memory_budget: 内存预算（MB），或"auto"（当前可用内存的MEMORY_BUDGET_FRACTION）。
+                           设置后按estimate_memory_mb估算每个任务的峰值内存，只在运行中任务的
+                           估算值之和加上新任务不超过预算时才启动新任务（总会至少运行一个任务）
+            
+        Returns:
+            BatchResult: 成功转换的文件列表（包括resume时跳过的已完成文件），其results属性是本次
+                         实际转换的各任务的ConversionResult（含各阶段耗时和资源使用）。本次批量的
+                         预计与实际总耗时和按原因统计的失败数会记录在last_batch_report中；
+                         dry_run时返回空列表
+        """
+        self.last_batch_plan = None
+        priorities = priorities or {}
+        input_path = Path(input_dir)
+        if not input_path.exists() or not input_path.is_dir():
+            self.logger.error(f"输入目录不存在或不是目录: {input_dir}")
+            return BatchResult()
+        
+        if output_dir is None:
+            output_dir = input_dir
+        
+        output_path = Path(output_dir)
+        if not dry_run:
+            output_path.mkdir(parents=True, exist_ok=True)
+        
+        # 查找所有待转换文件
+        rmvb_files = self._unique_stems(self._find_video_files(input_path, extensions))
+        
+        if not rmvb_files:
+            self.logger.info(f"在目录 {input_dir} 中未找到RMVB文件")
+            return BatchResult()
+        
+        self.logger.info(f"找到 {len(rmvb_files)} 个待转换文件")
+        
+        if order not in BATCH_ORDERS:
+            self.logger.warning(f"未知的排序策略: {order}，按输入顺序处理")
+            order = 'input'
+        
+        if concurrency is not None:
+            jobs = concurrency.jobs
+            self.logger.info(
+                f"自适应并行转换: {concurrency.min_jobs}-{concurrency.max_jobs} 个任务，初始 {jobs} 个"
+            )
+        jobs = _resolve_jobs(jobs, len(rmvb_files))
+        # 单任务时不限制线程数，保持FFmpeg默认行为
+        threads = _threads_per_job(jobs) if jobs > 1 else None
+        if jobs > 1 and concurrency is None:
+            self.logger.info(f"并行转换: {jobs} 个任务，每个任务 {threads} 个线程")
+        
+        swept = 0 if dry_run else sweep_stale_temp_files(str(output_path))
+        if swept:
+            self.logger.info(f"清理了 {swept} 个中断转换留下的临时文件")
+        
+        journal = BatchJournal(str(output_path))
+        previous = journal.load() if resume else {}
+        fingerprints = {
+            str(f): self._settings_fingerprint(f, quality, codec_policy) for f in rmvb_files
+        }
+        
+        settings_hash = self._settings_hash(quality, codec_policy)
+        
+        # 增量模式：跳过输出已是最新的任务；恢复模式：跳过已完成的任务。
+        # 输出总是先写临时文件再重命名，未完成任务留下的只有临时文件，已由上面的清理删除
+        completed = []
+        pending_files = []
+        # 上次批量的日志明确记录为本工具写的输出（preexisting为False），可以覆盖；
+        # 没有记录该字段的旧日志一律按用户已有的文件处理
+        owned = {}
+        up_to_date = 0
+        for index, rmvb_file in enumerate(rmvb_files):
+            output_file = output_path / f"{rmvb_file.stem}.mp4"
+            if incremental and self._is_up_to_date(rmvb_file, output_file, settings_hash):
+                completed.append((index, str(output_file)))
+                up_to_date += 1
+                continue
+            record = previous.get(str(rmvb_file.resolve()))
+            if record is not None and self._journal_job_done(
+                record, output_file, fingerprints[str(rmvb_file)]
+            ):
+                completed.append((index, str(output_file)))
+                continue
+            owned[str(rmvb_file)] = record is not None and record.get('preexisting') is False
+            pending_files.append(rmvb_file)
+        
+        if incremental:
+            self.logger.info(
+                f"增量转换: {up_to_date} 个输出已是最新，需要转换 {len(pending_files)} 个"
+            )
+        if resume:
+            self.logger.info(
+                f"恢复批量转换: 跳过 {len(completed)} 个已完成任务，剩余 {len(pending_files)} 个"
+            )
+        
+        def run_job(rmvb_file: Path, output_file: Path, threads: Optional[int]) -> ConversionResult:
+            """运行单个任务，并在日志中记录开始和结束状态"""
+            job = str(rmvb_file.resolve())
+            fingerprint = fingerprints[str(rmvb_file)]
+            # 上次批量自己写的输出可以覆盖；用户已有的文件遵循overwrite参数
+            allow_overwrite = overwrite or owned[str(rmvb_file)]
+            # 带有转换标记的输出是本工具之前生成的，源文件或设置变化后可以直接覆盖
+            if incremental and _stamp_path(output_file).exists():
+                allow_overwrite = True
+            preexisting = output_file.exists() and not allow_overwrite
+            journal.mark(job, BatchJournal.RUNNING, fingerprint=fingerprint,
+                         output=str(output_file), preexisting=preexisting)
+            result = self.convert_rmvb_to_mp4(
+                str(rmvb_file),
+                str(output_file),
+                quality=quality,
+                overwrite=allow_overwrite,
+                progress_callback=tracker.job_callback(str(rmvb_file)),
+                threads=threads,
+                codec_policy=codec_policy,
+                precheck=precheck,
+                priority=_file_priority(rmvb_file, priorities)
+            )
+            tracker.finish(str(rmvb_file), bool(result))
+            if result:
+                journal.mark(job, BatchJournal.DONE, fingerprint=fingerprint,
+                             output=str(output_file),
+                             checksum=_quick_checksum(str(output_file)))
+                self._write_stamp(rmvb_file, output_file, settings_hash)
+            else:
+                journal.mark(job, BatchJournal.FAILED, fingerprint=fingerprint,
+                             output=str(output_file), preexisting=preexisting,
+                             reason=result.reason)
+            return result
+        
+        # 只探测需要转换的文件，用于排序和预估耗时（RMVB直接解析文件头，开销很小）
+        records = {
+            record['path']: record for record in self.probe_many(str(f) for f in pending_files)
+        }
+        durations = {path: record.get('duration') or 0.0 for path, record in records.items()}
+        # 按耗时模型（由性能历史拟合）预测每个任务的耗时，排序和总耗时预估都基于预测值
+        costs = {
+            path: self._estimate_encode_seconds(record, quality, codec_policy)
+            for path, record in records.items()
+        }
+        memory = {
+            path: self.estimate_memory_mb(
+                record.get('width'), record.get('height'), quality,
+                self._video_mode(record, codec_policy)
+            )
+            for path, record in records.items()
+        }
+        budget = self._resolve_memory_budget(memory_budget)
+        
+        scan_index = {str(f): i for i, f in enumerate(rmvb_files)}
+        schedule = [
+            (scan_index[str(f)], f)
+            for _, f in self._order_batch(pending_files, costs, order, priorities)
+        ]
+        
+        timeline = _simulate_schedule([costs[str(f)] for _, f in schedule], jobs)
+        predicted_makespan = max((end for _, end in timeline), default=0.0)
+        self.logger.info(
+            f"排序策略: {order}，预计总耗时 {predicted_makespan:.0f} 秒"
+        )
+        
+        if dry_run:
+            self.last_batch_plan = {
+                'jobs': jobs,
+                'order': order,
+                'skipped': len(completed),
+                'memory_budget_mb': budget,
+                'predicted_makespan': predicted_makespan,
+                'tasks': [
+                    {
+                        'input': str(f),
+                        'output': str(output_path / f"{f.stem}.mp4"),
+                        'duration': durations[str(f)],
+                        'width': records[str(f)].get('width'),
+                        'height': records[str(f)].get('height'),
+                        'predicted_seconds': costs[str(f)],
+                        'memory_mb': memory[str(f)],
+                        'start': start,
+                        'finish': finish,
+                    }
+                    for (_, f), (start, finish) in zip(schedule, timeline)
+                ],
+            }
+            return BatchResult()
+        
+        if resume:
+            # 只保留已完成任务的记录，压缩日志
+            journal.reset({
+                job: record for job, record in previous.items()
+                if record['state'] == BatchJournal.DONE
+            })
+        else:
+            journal.reset()
+        
+        # 入队时就记录输出是否为用户已有的文件，任务还没开始就中断时恢复也不会覆盖它
+        queued_preexisting = {
+            str(f): (output_path / f"{f.stem}.mp4").exists() and not overwrite and not owned[str(f)]
+            for f in pending_files
+        }
+        journal.append([
+            {'job': str(f.resolve()), 'state': BatchJournal.QUEUED,
+             'fingerprint': fingerprints[str(f)], 'preexisting': queued_preexisting[str(f)]}
+            for f in pending_files
+        ])
+        
+        # 各任务的进度按时长加权汇总为批量进度，批量刚开始时的剩余时间使用预测值
+        tracker = BatchProgress(
+            {str(f): durations.get(str(f), 0.0) for f in pending_files}, progress_callback,
+            predicted_seconds=predicted_makespan
+        )
+        batch_start = time.monotonic()
+        
+        # 转换工作在FFmpeg子进程中完成，线程池只负责执行和等待，不受GIL限制
+        # 派发循环按调度顺序启动任务，同时运行的任务数不超过目标值（固定为jobs，
+        # 或由并发控制器按系统负载调整），并保证各任务的-threads之和不超过可用核数、
+        # 各任务的预计峰值内存之和不超过内存预算
+        cpus = _available_cpus()
+        pending = deque(schedule)
+        running = {}
+        failures = {}
+        results = []
+        with ThreadPoolExecutor(
+            max_workers=concurrency.max_jobs if concurrency is not None else jobs
+        ) as executor:
+            while pending or running:
+                target = concurrency.target(len(running)) if concurrency is not None else jobs
+                while pending and len(running) < target:
+                    if concurrency is None:
+                        job_threads = threads
+                    else:
+                        free = cpus - sum(t or cpus for _, t, _ in running.values())
+                        if running and free < 1:
+                            break
+                        job_threads = min(_threads_per_job(target), max(free, 1))
+                    job_memory = memory.get(str(pending[0][1]), 0.0)
+                    if budget is not None:
+                        used = sum(m for _, _, m in running.values())
+                        if running and used + job_memory > budget:
+                            break
+                        if not running and job_memory > budget:
+                            self.logger.warning(
+                                f"{pending[0][1].name} 预计需要 {job_memory:.0f} MB内存，"
+                                f"超过内存预算 {budget:.0f} MB，单独运行"
+                            )
+                    index, rmvb_file = pending.popleft()
+                    output_file = output_path / f"{rmvb_file.stem}.mp4"
+                    future = executor.submit(run_job, rmvb_file, output_file, job_threads)
+                    running[future] = ((index, str(output_file)), job_threads, job_memory)
+                
+                done, _ = wait(
+                    running,
+                    timeout=ADAPTIVE_POLL_SECONDS if concurrency is not None else None,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    job, _, _ = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # run_job中转换以外的步骤（日志、转换标记等）出错：只记为该任务失败，
+                        # 其余任务继续派发
+                        rmvb_file = rmvb_files[job[0]]
+                        self.logger.error(f"任务异常: {rmvb_file}: {str(e)}")
+                        result = ConversionResult(False, job[1], FAILURE_ERROR, str(e))
+                        tracker.finish(str(rmvb_file), False)
+                        try:
+                            journal.mark(str(rmvb_file.resolve()), BatchJournal.FAILED,
+                                         fingerprint=fingerprints[str(rmvb_file)], output=job[1],
+                                         preexisting=queued_preexisting[str(rmvb_file)],
+                                         reason=FAILURE_ERROR)
+                        except OSError as journal_error:
+                            self.logger.warning(f"写入任务日志失败: {str(journal_error)}")
+                    results.append((job[0], result))
+                    if result:
+                        completed.append(job)
+                    else:
+                        failures[result.reason] = failures.get(result.reason, 0) + 1
+        
+        # 保持与输入文件顺序一致的结果顺序
+        successful_conversions = BatchResult(
+            (output for _, output in sorted(completed)),
+            [result for _, result in sorted(results, key=lambda item: item[0])]
+        )
+        
+        actual_makespan = time.monotonic() - batch_start
+        self.last_batch_report = {
+            'files': len(rmvb_files),
+            'successful': len(successful_conversions),
+            'jobs': jobs,
+            'order': order,
+            'predicted_makespan': predicted_makespan,
+            'actual_makespan': actual_makespan,
+            'failures': failures,
+            'concurrency': concurrency.history if concurrency is not None else [],
+            'memory_budget_mb': budget,
+        }
+        
+        self.logger.info(f"批量转换完成，成功转换 {len(successful_conversions)} 个文件")
+        self.logger.info(
+            f"总耗时: 预计 {predicted_makespan:.0f} 秒，实际 {actual_makespan:.0f} 秒"
+        )
+        if failures:
+            self.logger.warning("失败原因: " + "，".join(
+                f"{FAILURE_DESCRIPTIONS.get(reason, reason)} {count} 个"
+                for reason, count in sorted(failures.items())
+            ))
+        return successful_conversions
+    
+    def _settings_fingerprint(self, input_file: Path, quality: str, codec_policy: str) -> str:
+        """
+        计算任务的设置指纹：输入文件的大小和修改时间、编码参数、转换器版本
+        
+        指纹不同说明源文件或转换设置已变化，之前的输出不能再视为有效
+        
+        Args:
+            input_file: 输入文件路径
+            quality: 转换质量
+            codec_policy: 编码策略
+            
+        Returns:
+            str: 十六进制指纹
+        """
+        stat = input_file.stat()
+        settings = {
+            'input': str(input_file.resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'quality': QUALITY_SETTINGS.get(quality, QUALITY_SETTINGS['medium']),
+            'codec_policy': codec_policy,
+            'version': __version__,
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _settings_hash(self, quality: str, codec_policy: str) -> str:
+        """计算转换设置（编码参数、编码策略、转换器版本）的摘要"""
+        settings = {
+            'quality': QUALITY_SETTINGS.get(quality, QUALITY_SETTINGS['medium']),
+            'codec_policy': codec_policy,
+            'version': __version__,
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _write_stamp(self, input_file: Path, output_file: Path, settings_hash: str):
+        """
+        在输出文件旁写入转换标记，供增量转换判断输出是否最新
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径（已成功生成）
+            settings_hash: 转换设置摘要
+        """
+        stat = input_file.stat()
+        stamp = {
+            'input_size': stat.st_size,
+            'input_mtime_ns': stat.st_mtime_ns,
+            'input_checksum': _quick_checksum(str(input_file)),
+            'settings': settings_hash,
+            'output_size': output_file.stat().st_size,
+        }
+        stamp_path = _stamp_path(output_file)
+        tmp_path = stamp_path.with_name(stamp_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stamp, f)
+            os.replace(tmp_path, stamp_path)
+        except OSError as e:
+            self.logger.warning(f"写入转换标记失败: {stamp_path}: {str(e)}")
+    
+    def _is_up_to_date(self, input_file: Path, output_file: Path, settings_hash: str) -> bool:
+        """
+        判断输出文件是否已是最新（类似make的依赖检查）
+        
+        先比较转换设置和输出文件大小，再比较源文件的大小和修改时间；
+        只有修改时间变了而大小没变时（如复制文件）才读取源文件头尾计算快速校验和
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            settings_hash: 当前转换设置摘要
+            
+        Returns:
+            bool: 输出文件已是最新返回True
+        """
+        try:
+            with open(_stamp_path(output_file), 'r', encoding='utf-8') as f:
+                stamp = json.load(f)
+            if stamp.get('settings') != settings_hash:
+                return False
+            if output_file.stat().st_size != stamp.get('output_size'):
+                return False
+            stat = input_file.stat()
+            if stat.st_size != stamp.get('input_size'):
+                return False
+            if stat.st_mtime_ns == stamp.get('input_mtime_ns'):
+                return True
+            if _quick_checksum(str(input_file)) != stamp.get('input_checksum'):
+                return False
+            # 内容未变，只是修改时间变了：刷新标记，下次无需再计算校验和
+            self._write_stamp(input_file, output_file, settings_hash)
+            return True
+        except (OSError, ValueError):
+            return False
+    
+    def _journal_job_done(self, record: dict, output_file: Path, fingerprint: str) -> bool:
+        """
+        判断日志中的任务是否已经有效完成
+        
+        Args:
+            record: 日志中该任务的最后一条记录
+            output_file: 任务的输出文件
+            fingerprint: 当前的设置指纹
+            
+        Returns:
+            bool: 状态为done、指纹一致且输出文件校验和与记录一致时返回True
+        """
+        if record.get('state') != BatchJournal.DONE or record.get('fingerprint') != fingerprint:
+            return False
+        try:
+            return _quick_checksum(str(output_file)) == record.get('checksum')
+        except OSError:
+            return False
+    
+    def _estimate_encode_seconds(self, record: dict, quality: str, codec_policy: str) -> float:
+        """
+        用耗时模型预估单个文件的转换耗时（秒）
+        
+        Args:
+            record: probe_many返回的探测摘要
+            quality: 转换质量
+            codec_policy: 编码策略，视频编解码器可以直接复制时按复制的速度预估
+            
+        Returns:
+            float: 预计耗时（秒），时长未知时为0
+        """
+        if quality not in QUALITY_SETTINGS:
+            quality = 'medium'
+        mode = self._video_mode(record, codec_policy)
+        width, height = record.get('width'), record.get('height')
+        megapixels = width * height / 1e6 if width and height else None
+        return self._cost_model(quality, mode).predict(record.get('duration') or 0.0, megapixels)
+    
+    @staticmethod
+    def _video_mode(record: dict, codec_policy: str) -> str:
+        """按探测摘要判断视频流的处理方式：'copy'（可直接复制）或'encode'"""
+        if codec_policy == 'auto' and record.get('video_codec') in MP4_COPY_VIDEO_CODECS:
+            return 'copy'
+        return 'encode'
+    
+    def _resolve_memory_budget(self, memory_budget: Optional[Union[float, str]]) -> Optional[float]:
+        """
+        将memory_budget参数解析为MB数
+        
+        Returns:
+            float: 内存预算（MB），未设置或"auto"时无法读取可用内存则返回None
+        """
+        if memory_budget is None:
+            return None
+        if memory_budget == "auto":
+            available = _read_mem_available_mb()
+            if available is None:
+                self.logger.warning("无法读取可用内存，不限制内存预算")
+                return None
+            budget = available * MEMORY_BUDGET_FRACTION
+        else:
+            budget = float(memory_budget)
+        self.logger.info(f"内存预算: {budget:.0f} MB")
+        return budget
+    
+    def _order_batch(
+        self,
+        files: List[Path],
+        costs: Dict[str, float],
+        order: str,
+        priorities: Dict[str, int]
+    ) -> List[tuple]:
+        """
+        按排序策略确定批量任务的派发顺序
+        
+        Args:
+            files: 按扫描顺序排列的输入文件
+            costs: 文件路径到任务大小的映射（预计耗时或视频时长，单位秒），未知为0
+            order: 排序策略，见batch_convert_rmvb_to_mp4
+            priorities: 文件名或完整路径到优先级的映射
+            
+        Returns:
+            List[tuple]: (扫描顺序下标, 文件路径)列表，按派发顺序排列
+        """
+        schedule = list(enumerate(files))
+        
+        def duration_of(item):
+            return costs.get(str(item[1]), 0.0)
+        
+        def priority_of(item):
+            return _file_priority(item[1], priorities)
+        
+        # sorted是稳定排序，时长或优先级相同的文件保持扫描顺序
+        if order == 'lpt':
+            schedule.sort(key=duration_of, reverse=True)
+        elif order == 'spt':
+            schedule.sort(key=duration_of)
+        elif order == 'priority':
+            schedule.sort(key=lambda item: (priority_of(item), duration_of(item)), reverse=True)
+        return schedule
+    
+    def _unique_stems(self, files: List[Path]) -> List[Path]:
+        """
+        去掉输出文件名冲突的输入文件
+        
+        同一目录下的a.rmvb和a.mkv都会输出为a.mp4，只保留先出现的一个
+        """
+        seen = {}
+        unique = []
+        for f in files:
+            if f.stem in seen:
+                self.logger.warning(f"跳过 {f.name}：与 {seen[f.stem].name} 的输出文件名冲突")
+                continue
+            seen[f.stem] = f
+            unique.append(f)
+        return unique
+    
+    def _find_video_files(
+        self,
+        input_path: Path,
+        extensions: Iterable[str] = DEFAULT_BATCH_EXTENSIONS
+    ) -> List[Path]:
+        """
+        查找目录中指定扩展名的视频文件（扩展名不区分大小写）
+        
+        Args:
+            input_path: 输入目录
+            extensions: 扩展名列表，如('.rmvb', '.mkv')
+            
+        Returns:
+            List[Path]: 按文件名排序的文件列表
+        """
+        extensions = {
+            ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in extensions
+        }
+        return sorted(
+            f for f in input_path.iterdir()
+            if f.is_file() and f.suffix.lower() in extensions
+        )
+    
+    def warm_probe_cache(
+        self,
+        input_dir: str,
+        concurrency: Optional[int] = None,
+        extensions: Iterable[str] = DEFAULT_BATCH_EXTENSIONS
+    ) -> int:
+        """
+        预先探测目录中的所有视频文件并写入探测缓存
+        
+        之后的批量转换和get_video_info都会直接命中缓存，不再启动ffprobe
+        
+        Args:
+            input_dir: 输入目录路径
+            concurrency: 同时运行的ffprobe进程数，None时按CPU核数自动决定
+            extensions: 要探测的文件扩展名
+            
+        Returns:
+            int: 成功探测的文件数
+        """
+        if self.probe_cache is None:
+            self.logger.warning("未启用探测缓存，预热没有效果")
+        
+        input_path = Path(input_dir)
+        if not input_path.exists() or not input_path.is_dir():
+            self.logger.error(f"输入目录不存在或不是目录: {input_dir}")
+            return 0
+        
+        concurrency = concurrency or _available_cpus() * PROBE_CONCURRENCY_PER_CPU
+        video_files = [str(f) for f in self._find_video_files(input_path, extensions)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            warmed = sum(
+                1 for info in executor.map(self.get_video_info, video_files) if info is not None
+            )
+        
+        self.logger.info(f"探测缓存预热完成，共 {warmed} 个文件")
+        return warmed
+    
+    def _summarize_probe(self, video_file: str) -> dict:
+        """
+        探测单个文件并提取批量规划需要的关键字段
+        
+        Args:
+            video_file: 视频文件路径
+            
+        Returns:
+            dict: 包含path、ok、duration、width、height、video_codec、audio_codec等字段；
+                  探测失败时ok为False，error为失败原因
+        """
+        record = {'path': video_file, 'ok': False}
+        info = self.probe_video(video_file)
+        if info is None:
+            record['error'] = "探测失败"
+            return record
+        
+        fmt = info.get('format', {})
+        record['ok'] = True
+        record['source'] = 'native' if 'realmedia' in info else 'ffprobe'
+        record['duration'] = float(fmt['duration']) if 'duration' in fmt else None
+        record['size'] = int(fmt['size']) if 'size' in fmt else None
+        record['bit_rate'] = int(fmt['bit_rate']) if fmt.get('bit_rate', 'N/A') != 'N/A' else None
+        for stream in info.get('streams', []):
+            codec_type = stream.get('codec_type')
+            if codec_type == 'video' and 'video_codec' not in record:
+                record['video_codec'] = stream.get('codec_name')
+                record['width'] = stream.get('width')
+                record['height'] = stream.get('height')
+            elif codec_type == 'audio' and 'audio_codec' not in record:
+                record['audio_codec'] = stream.get('codec_name')
+        if 'realmedia' in info:
+            record['has_index'] = info['realmedia']['has_index']
+        return record
     
-    def __init__(self, ffmpeg_path: Optional[str] = None):
+    def probe_many(
+        self,
+        paths: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> Iterator[dict]:
         """
-        初始化视频转换器
+        并发探测多个文件，按完成顺序逐个返回结果
+        
+        同时在途的探测任务数不超过concurrency，输入可以是任意长的迭代器，
+        不会一次性为所有文件创建任务。RMVB文件优先使用文件头解析，
+        其他格式使用ffprobe（可命中探测缓存）。
         
         Args:
-            ffmpeg_path: FFmpeg可执行文件的路径，如果为None则使用系统PATH中的ffmpeg
+            paths: 视频文件路径的可迭代对象
+            concurrency: 同时进行的探测数，None时按CPU核数自动决定
+            
+        Yields:
+            dict: 每个文件的探测摘要，格式见_summarize_probe
         """
-        self.ffmpeg_path = ffmpeg_path or "ffmpeg"
-        self.logger = logging.getLogger(__name__)
+        concurrency = concurrency or _available_cpus() * PROBE_CONCURRENCY_PER_CPU
+        paths = iter(paths)
         
-        # 检查FFmpeg是否可用
-        if not self._check_ffmpeg():
-            raise RuntimeError("FFmpeg未找到，请确保FFmpeg已安装并添加到系统PATH中")
-    
-    def _check_ffmpeg(self) -> bool:
-        """检查FFmpeg是否可用"""
-        try:
-            result = subprocess.run(
-                [self.ffmpeg_path, "-version"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            return result.returncode == 0
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            exhausted = False
+            while True:
+                # 补充任务直到在途任务数达到并发上限
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        video_file = next(paths)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(self._summarize_probe, str(video_file)))
+                
+                if not pending:
+                    break
+                
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
     
-    def _get_video_duration(self, video_file: str) -> Optional[float]:
-        """获取视频文件的总时长（秒）"""
-        try:
-            cmd = [
-                self.ffmpeg_path.replace('ffmpeg', 'ffprobe'),
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format',
-                video_file
-            ]
+    def get_video_info(self, video_file: str) -> Optional[dict]:
+        """
+        获取视频文件信息
+        
+        Args:
+            video_file: 视频文件路径
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        Returns:
+            dict: 视频信息字典，如果失败则返回None
+        """
+        try:
+            return self._run_ffprobe(video_file, self.PROBE_OPTIONS)
             
-            if result.returncode == 0:
-                import json
-                data = json.loads(result.stdout)
-                if 'format' in data and 'duration' in data['format']:
-                    return float(data['format']['duration'])
+        except RuntimeError as e:
+            self.logger.error(f"获取视频信息失败: {str(e)}")
             return None
-            
-        except Exception:
+        except Exception as e:
+            self.logger.error(f"获取视频信息时发生错误: {str(e)}")
             return None
+class AsyncVideoConverter(VideoConverter):
+    """
+    基于asyncio的视频转换器
+    
+    使用asyncio.create_subprocess_exec启动FFmpeg，进度（stdout）和错误信息（stderr）
+    都由事件循环中的协程读取，不为每个任务创建线程，
+    因此一个事件循环可以同时监督成百上千个FFmpeg进程。
+    取消aconvert所在的Task会终止对应的FFmpeg进程并删除未写完的输出文件。
+    
+    注意：Python 3.12之前的版本在Linux上默认使用ThreadedChildWatcher回收子进程，
+    每个子进程仍会有一个阻塞在waitpid上的轻量线程；3.12起使用pidfd，不再需要线程。
+    """
     
-    def _parse_ffmpeg_progress(self, line: str) -> Optional[float]:
+    async def _arun_ffprobe(self, video_file: str, options: List[str]) -> dict:
         """
-        解析FFmpeg输出中的时间信息
-        
-        FFmpeg在使用-progress参数时会输出形如 time=00:01:23.45 的进度信息
-        这个方法将时间字符串转换为总秒数，用于计算转换进度
+        异步运行ffprobe并返回解析后的JSON结果，优先使用探测缓存
         
         Args:
-            line: FFmpeg输出的一行文本
+            video_file: 视频文件路径
+            options: 探测参数
             
         Returns:
-            float: 当前转换到的时间点（秒），如果无法解析则返回None
+            dict: ffprobe输出的JSON结果
+            
+        Raises:
+            RuntimeError: ffprobe执行失败
         """
-        # 使用正则表达式匹配时间格式 time=00:01:23.45
-        # 分组1: 小时, 分组2: 分钟, 分组3: 秒（可能包含小数）
-        time_match = re.search(r'time=(\d+):(\d+):(\d+\.?\d*)', line)
-        if time_match:
-            hours = int(time_match.group(1))
-            minutes = int(time_match.group(2))
-            seconds = float(time_match.group(3))
-            # 将时:分:秒转换为总秒数
-            return hours * 3600 + minutes * 60 + seconds
-        return None
+        if self.probe_cache is not None:
+            data = self.probe_cache.get(video_file, options)
+            if data is not None:
+                return data
+        
+        process = await asyncio.create_subprocess_exec(
+            self.ffprobe_path,
+            '-v', 'quiet',
+            '-print_format', 'json',
+            *options,
+            video_file,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError("ffprobe超时")
+        
+        if process.returncode != 0:
+            raise RuntimeError(
+                stderr.decode('utf-8', 'replace').strip() or f"ffprobe返回码 {process.returncode}"
+            )
+        
+        data = json.loads(stdout)
+        if self.probe_cache is not None:
+            self.probe_cache.put(video_file, options, data)
+        return data
     
-    def _run_ffmpeg_with_progress(
-        self, 
-        cmd: List[str], 
-        total_duration: float, 
-        progress_callback: Optional[Callable[[float, str], None]]
-    ) -> subprocess.CompletedProcess:
+    async def _aprobe_video(self, video_file: str) -> Optional[dict]:
+        """异步版本的probe_video：RealMedia文件直接解析文件头，其他格式异步运行ffprobe"""
+        info = parse_realmedia_header(video_file)
+        if info is not None:
+            return info
+        try:
+            return await self._arun_ffprobe(video_file, self.PROBE_OPTIONS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return None
+    
+    async def _aget_video_duration(self, video_file: str) -> Optional[float]:
+        """异步获取视频文件的总时长（秒）"""
+        return _info_duration(await self._aprobe_video(video_file))
+    
+    async def _arun_ffmpeg_with_progress(
+        self,
+        cmd: List[str],
+        total_duration: float,
+        progress_callback: Optional[Callable[[float, str], None]],
+        event_callback: Optional[Callable[[ProgressEvent], None]] = None,
+        input_file: Optional[str] = None,
+        priority: int = 0
+    ) -> FFmpegResult:
         """
-        运行FFmpeg并监控进度
+        异步运行FFmpeg并监控进度，与_run_ffmpeg_with_progress的行为一致
         
-        这是异步进度监控的核心方法：
-        1. 使用-progress pipe:1参数让FFmpeg输出进度信息到stdout
-        2. 创建子进程，分别处理stdout（进度）和stderr（错误信息）
-        3. 使用多线程实时读取输出，避免阻塞
-        4. 解析时间信息计算百分比进度
+        被取消（或回调抛出异常）时会先终止FFmpeg进程再重新抛出异常
         
         Args:
             cmd: FFmpeg命令列表
             total_duration: 视频总时长（秒）
             progress_callback: 进度回调函数
+            event_callback: 进度事件回调函数，每个进度数据块调用一次
+            input_file: 输入文件路径，时长未知时用于按读取位置计算进度
+            priority: 抢占优先级
             
         Returns:
-            subprocess.CompletedProcess: 模拟的进程结果对象
+            FFmpegResult: 进程结果对象
         """
+        cmd_with_progress = cmd[:1] + ['-progress', 'pipe:1'] + cmd[1:]
         
-        # 在输出文件前插入进度参数：-progress pipe:1
-        # 这样FFmpeg会将进度信息输出到stdout，而不是stderr
-        cmd_with_progress = cmd[:-1] + ['-progress', 'pipe:1'] + [cmd[-1]]
-        
-        # 创建子进程，分别捕获stdout和stderr
-        process = subprocess.Popen(
-            cmd_with_progress,
-            stdout=subprocess.PIPE,  # 用于读取进度信息
-            stderr=subprocess.PIPE,  # 用于读取错误信息
-            text=True,
-            universal_newlines=True
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *cmd_with_progress,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=self._memory_limiter()
+        )
+        job = self.preemption.register(
+            process, priority, Path(input_file).name if input_file else ''
         )
         
-        # 用于收集stderr输出（错误信息）
-        stderr_output = []
+        stderr_output = deque(maxlen=STDERR_TAIL_LINES)
+        faststart_at = []
         
-        def read_stderr():
+        def add_stderr_line(line: str):
+            stderr_output.append(line)
+            if not faststart_at and FASTSTART_MARKER in line:
+                faststart_at.append(time.monotonic())
+        
+        async def read_stderr():
             """
-            在单独线程中读取stderr输出
-            避免stderr缓冲区满导致进程阻塞
+            持续读取stderr，避免缓冲区满导致进程阻塞
+            
+            FFmpeg的统计行以\r结尾，按\n读取行会在长时间编码时超出StreamReader的
+            缓冲区上限，因此按块读取，再像同步版本的universal_newlines一样按\r和\n分行
             """
-            for line in iter(process.stderr.readline, ''):
-                stderr_output.append(line)
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            buffer = ''
+            while True:
+                chunk = await process.stderr.read(STDERR_READ_SIZE)
+                buffer += decoder.decode(chunk, final=not chunk)
+                # 末尾的\r可能是被拆到两个块中的\r\n，留到下一块再分行
+                split_crlf = bool(chunk) and buffer.endswith('\r')
+                if split_crlf:
+                    buffer = buffer[:-1]
+                *lines, buffer = buffer.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+                if split_crlf:
+                    buffer += '\r'
+                for line in lines:
+                    add_stderr_line(line + '\n')
+                if not chunk:
+                    if buffer:
+                        add_stderr_line(buffer)
+                    return
         
-        # 启动stderr读取线程，设置为守护线程
-        stderr_thread = threading.Thread(target=read_stderr)
-        stderr_thread.daemon = True
-        stderr_thread.start()
+        stderr_task = asyncio.ensure_future(read_stderr())
+        monitor = InputReadMonitor(process.pid, input_file)
         
-        # 从stdout读取进度信息
-        last_progress = 0.0
-        while True:
-            line = process.stdout.readline()
-            if not line:  # 没有更多输出时跳出循环
-                break
-                
-            # 解析当前转换到的时间点
-            current_time = self._parse_ffmpeg_progress(line)
-            if current_time is not None and total_duration > 0:
-                # 计算转换百分比，确保不超过100%
-                progress = min((current_time / total_duration) * 100, 100.0)
-                
-                # 只有进度变化超过1%时才更新，避免过于频繁的回调
-                # 这样可以减少UI更新频率，提高性能
-                if progress - last_progress >= 1.0:
-                    if progress_callback:
-                        progress_callback(progress, f"转换中... {progress:.1f}%")
-                    last_progress = progress
+        watchdog = None
+        watchdog_task = None
+        if self.watchdog is not None:
+            watchdog = Watchdog(self.watchdog, monitor, total_duration, job)
             
-            # 检查是否包含结束标志
-            if 'progress=' in line:
-                if 'end' in line:
-                    break
-        
-        # 等待进程结束
-        process.wait()
-        # 等待stderr线程结束（最多1秒）
-        stderr_thread.join(timeout=1)
+            async def watch():
+                """看门狗：FFmpeg停滞、过慢或超时时终止进程"""
+                while process.returncode is None:
+                    await asyncio.sleep(WATCHDOG_POLL_SECONDS)
+                    if process.returncode is None and watchdog.check():
+                        self.logger.error(f"看门狗终止FFmpeg: {watchdog.describe()}")
+                        process.kill()
+                        return
+            
+            watchdog_task = asyncio.ensure_future(watch())
         
-        # 构造返回对象，模拟subprocess.CompletedProcess
-        class Result:
-            def __init__(self, returncode, stderr):
-                self.returncode = returncode
-                self.stderr = stderr
+        try:
+            throttle = ProgressThrottle(self.progress_interval)
+            fields = {}
+            async for raw_line in process.stdout:
+                key, sep, value = raw_line.decode('utf-8', 'replace').strip().partition('=')
+                if not sep:
+                    continue
+                fields[key] = value
+                if key != 'progress':
+                    continue
+                event = ProgressEvent(fields, total_duration)
+                fields = {}
+                self._observe_progress(event, monitor)
+                self._dispatch_progress(event, throttle, progress_callback, event_callback)
+                if event.ended:
+                    break
+            
+            # 回收之前注销抢占登记，被暂停的进程先恢复
+            self.preemption.unregister(job)
+            await process.wait()
+            await stderr_task
+        except BaseException:
+            # 任务被取消或回调出错：结束FFmpeg进程，回收子进程后再把异常传播出去
+            self.preemption.unregister(job)
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            stderr_task.cancel()
+            raise
+        finally:
+            if watchdog_task is not None:
+                watchdog_task.cancel()
         
-        return Result(process.returncode, ''.join(stderr_output))
+        return FFmpegResult(
+            process.returncode, ''.join(stderr_output), None,
+            watchdog.reason if watchdog is not None else None,
+            started, faststart_at[0] if faststart_at else None, job.paused_seconds()
+        )
     
-    def convert_rmvb_to_mp4(
+    async def aconvert(
         self,
         input_file: str,
         output_file: Optional[str] = None,
         quality: str = "medium",
         overwrite: bool = False,
-        progress_callback: Optional[Callable[[float, str], None]] = None
-    ) -> bool:
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        threads: Optional[int] = None,
+        codec_policy: str = "auto",
+        priority: int = 0
+    ) -> ConversionResult:
         """
-        将RMVB文件转换为MP4文件
+        异步将RMVB文件转换为MP4文件
+        
+        参数含义与convert_rmvb_to_mp4相同，但不支持分段并行编码（chunks）、
+        预检查（precheck）和逐事件回调（event_callback）；
+        子进程由事件循环回收，结果中的rusage始终为None。
         
         Args:
             input_file: 输入的RMVB文件路径
@@ -203,194 +5466,198 @@ class VideoConverter:
             quality: 转换质量 ('low', 'medium', 'high')
             overwrite: 是否覆盖已存在的输出文件
             progress_callback: 进度回调函数，接收(progress, status)参数
+            threads: FFmpeg编码线程数（-threads），None时由FFmpeg自动决定
+            codec_policy: 编码策略，'auto'或'reencode'
+            priority: 抢占优先级，见convert_rmvb_to_mp4
             
         Returns:
-            bool: 转换成功返回True，否则返回False
+            ConversionResult: 转换结果，可直接当作bool使用
+            
+        Raises:
+            asyncio.CancelledError: 任务被取消，此时FFmpeg进程已终止且未完成的输出已删除
         """
-        # 检查输入文件
-        input_path = Path(input_file)
-        if not input_path.exists():
-            self.logger.error(f"输入文件不存在: {input_file}")
-            return False
-        
-        if not input_path.suffix.lower() == '.rmvb':
-            self.logger.warning(f"输入文件不是RMVB格式: {input_file}")
-        
-        # 生成输出文件路径
-        if output_file is None:
-            output_file = str(input_path.with_suffix('.mp4'))
-        
-        output_path = Path(output_file)
-        
-        # 检查输出文件是否已存在
-        if output_path.exists() and not overwrite:
-            self.logger.error(f"输出文件已存在: {output_file}，使用overwrite=True来覆盖")
-            return False
-        
-        # 创建输出目录
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        stats = _ConversionStats(input_file)
+        result = await self._aconvert(
+            input_file, output_file, quality, overwrite, progress_callback,
+            threads, codec_policy, priority, stats
+        )
+        return stats.apply(result)
+    
+    async def _aconvert(
+        self,
+        input_file: str,
+        output_file: Optional[str],
+        quality: str,
+        overwrite: bool,
+        progress_callback: Optional[Callable[[float, str], None]],
+        threads: Optional[int],
+        codec_policy: str,
+        priority: int,
+        stats: _ConversionStats
+    ) -> ConversionResult:
+        """aconvert的实现，各阶段耗时记入stats（异步子进程无法获取资源使用）"""
+        paths = self._prepare_paths(input_file, output_file, overwrite)
+        if paths is None:
+            return ConversionResult(False, output_file, FAILURE_INVALID_PATH, "输入或输出路径无效")
+        input_path, output_path = paths
         
-        # 获取视频总时长用于进度计算
-        # 这是实现进度监控的关键步骤：必须知道视频总时长才能计算百分比
-        total_duration = self._get_video_duration(str(input_path))
+        stage_start = time.monotonic()
+        info = await self._aprobe_video(str(input_path))
+        stats.add_timing('probe', time.monotonic() - stage_start)
+        total_duration = _info_duration(info)
+        stats.duration = total_duration
         if total_duration is None:
-            self.logger.warning("无法获取视频时长，进度显示可能不准确")
+            self.logger.warning("无法获取视频时长，按输入文件的读取位置估算进度")
             total_duration = 0
         
-        # 根据质量设置编码参数
-        quality_settings = {
-            'low': ['-crf', '28', '-preset', 'fast'],
-            'medium': ['-crf', '23', '-preset', 'medium'],
-            'high': ['-crf', '18', '-preset', 'slow']
-        }
-        
-        if quality not in quality_settings:
-            self.logger.warning(f"未知的质量设置: {quality}，使用默认设置")
-            quality = 'medium'
-        
-        # 构建FFmpeg命令
-        # 使用H.264编码器和AAC音频编码器，这是最兼容的组合
-        cmd = [
-            self.ffmpeg_path,
-            '-i', str(input_path),        # 输入文件
-            '-c:v', 'libx264',            # 视频编码器：H.264
-            '-c:a', 'aac',                # 音频编码器：AAC
-            *quality_settings[quality],   # 质量设置（CRF值和preset）
-            '-movflags', '+faststart',    # 优化网络播放：将metadata移到文件开头
-        ]
-        
-        # 如果允许覆盖，添加-y参数
-        if overwrite:
-            cmd.append('-y')
-        
-        # 添加输出文件路径
-        cmd.append(str(output_path))
+        quality = self._normalize_quality(quality)
+        stream_plan = self._plan_streams(info, codec_policy)
+        temp_path = _temp_output_path(output_path)
+        cmd = self._build_convert_cmd(
+            input_path, temp_path, quality, overwrite, threads, stream_plan
+        )
         
         try:
-            self.logger.info(f"开始转换: {input_file} -> {output_file}")
-            self.logger.info(f"使用质量设置: {quality}")
+            self.logger.info(f"开始转换: {input_path} -> {output_path}")
+            self.logger.info(f"使用质量设置: {quality}，{self._describe_plan(stream_plan)}")
             
             if progress_callback:
                 progress_callback(0.0, "开始转换...")
             
-            # 执行转换，带进度监控
-            result = self._run_ffmpeg_with_progress(
-                cmd, 
-                total_duration, 
-                progress_callback
-            )
+            attempt = 0
+            while True:
+                start_time = time.monotonic()
+                result = await self._arun_ffmpeg_with_progress(
+                    cmd, total_duration, progress_callback,
+                    input_file=str(input_path), priority=priority
+                )
+                stats.add_run(result)
+                retry_quality = self._retry_quality(result, quality, attempt)
+                if retry_quality is None:
+                    break
+                attempt += 1
+                quality = retry_quality
+                self.logger.warning(
+                    f"第 {attempt} 次重试（{result.classify()[0]}），使用质量设置: {quality}"
+                )
+                _discard_temp(temp_path)
+                cmd = self._build_convert_cmd(
+                    input_path, temp_path, quality, overwrite, threads, stream_plan
+                )
             
             if result.returncode == 0:
-                self.logger.info(f"转换成功: {output_file}")
+                encode_seconds = time.monotonic() - start_time - result.paused_seconds
+                invalid = self._verify_output(temp_path, stats)
+                if invalid is not None:
+                    return self._failure(
+                        output_path, FAILURE_INVALID_OUTPUT, invalid, progress_callback,
+                        result, attempt + 1
+                    )
+                _commit_output(temp_path, output_path)
+                self._record_perf(
+                    input_path, info, quality, stream_plan, encode_seconds, None
+                )
+                self.logger.info(f"转换成功: {output_path}")
                 if progress_callback:
                     progress_callback(100.0, "转换完成!")
-                return True
+                return ConversionResult(True, str(output_path), attempts=attempt + 1)
             else:
-                self.logger.error(f"转换失败: {result.stderr}")
-                if progress_callback:
-                    progress_callback(-1, f"转换失败: {result.stderr}")
-                return False
+                return self._ffmpeg_failure(output_path, result, progress_callback, attempt + 1)
                 
-        except subprocess.TimeoutExpired:
-            self.logger.error("转换超时")
-            if progress_callback:
-                progress_callback(-1, "转换超时")
-            return False
+        except asyncio.CancelledError:
+            # 未完成的输出只存在于临时文件中，finally中删除即可，已有的输出文件不受影响
+            self.logger.warning(f"转换已取消: {input_path}")
+            raise
         except Exception as e:
-            self.logger.error(f"转换过程中发生错误: {str(e)}")
-            if progress_callback:
-                progress_callback(-1, f"转换错误: {str(e)}")
-            return False
+            return self._failure(
+                output_path, FAILURE_ERROR, str(e), progress_callback, label="转换过程中发生错误"
+            )
+        finally:
+            _discard_temp(temp_path)
     
-    def batch_convert_rmvb_to_mp4(
+    async def abatch_convert(
         self,
         input_dir: str,
         output_dir: Optional[str] = None,
         quality: str = "medium",
         overwrite: bool = False,
+        jobs: Union[int, str] = 1,
+        order: str = "input",
+        extensions: Iterable[str] = DEFAULT_BATCH_EXTENSIONS,
+        codec_policy: str = "auto",
         progress_callback: Optional[Callable[[float, str], None]] = None
-    ) -> List[str]:
+    ) -> 'BatchResult':
         """
-        批量转换目录中的RMVB文件为MP4文件
+        异步批量转换目录中的RMVB文件，同时运行的FFmpeg进程数不超过jobs
+        
+        与batch_convert_rmvb_to_mp4不同，不写任务日志，也不支持priorities、resume、
+        incremental、dry_run、precheck、concurrency和memory_budget。
         
         Args:
             input_dir: 输入目录路径
             output_dir: 输出目录路径，如果为None则与输入目录相同
             quality: 转换质量
             overwrite: 是否覆盖已存在的文件
-            progress_callback: 进度回调函数，接收(progress, status)参数
+            jobs: 同时运行的转换任务数，整数或"auto"
+            order: 任务派发顺序，见batch_convert_rmvb_to_mp4
+            extensions: 要转换的文件扩展名
+            codec_policy: 编码策略，'auto'或'reencode'
+            progress_callback: 批量进度回调函数，含义见batch_convert_rmvb_to_mp4
             
         Returns:
-            List[str]: 成功转换的文件列表
+            BatchResult: 成功转换的文件列表（按扫描顺序），results为各任务的ConversionResult
         """
         input_path = Path(input_dir)
         if not input_path.exists() or not input_path.is_dir():
             self.logger.error(f"输入目录不存在或不是目录: {input_dir}")
-            return []
-        
-        if output_dir is None:
-            output_dir = input_dir
+            return BatchResult()
         
-        output_path = Path(output_dir)
+        output_path = Path(output_dir or input_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # 查找所有RMVB文件
-        rmvb_files = list(input_path.glob("*.rmvb")) + list(input_path.glob("*.RMVB"))
-        
+        rmvb_files = self._unique_stems(self._find_video_files(input_path, extensions))
         if not rmvb_files:
             self.logger.info(f"在目录 {input_dir} 中未找到RMVB文件")
-            return []
+            return BatchResult()
         
-        self.logger.info(f"找到 {len(rmvb_files)} 个RMVB文件")
+        sweep_stale_temp_files(str(output_path))
         
-        successful_conversions = []
+        jobs = _resolve_jobs(jobs, len(rmvb_files))
+        threads = _threads_per_job(jobs) if jobs > 1 else None
         
-        for rmvb_file in rmvb_files:
-            output_file = output_path / f"{rmvb_file.stem}.mp4"
-            
-            if self.convert_rmvb_to_mp4(
-                str(rmvb_file),
-                str(output_file),
-                quality=quality,
-                overwrite=overwrite
-            ):
-                successful_conversions.append(str(output_file))
+        probed = await asyncio.gather(*(self._aget_video_duration(str(f)) for f in rmvb_files))
+        durations = {str(f): d or 0.0 for f, d in zip(rmvb_files, probed)}
+        schedule = self._order_batch(rmvb_files, durations, order, {})
+        tracker = BatchProgress(durations, progress_callback)
+        
+        # 信号量按获取顺序唤醒等待者，因此协程的创建顺序就是派发顺序
+        semaphore = asyncio.Semaphore(jobs)
+        
+        async def run_one(rmvb_file: Path) -> ConversionResult:
+            async with semaphore:
+                result = await self.aconvert(
+                    str(rmvb_file),
+                    str(output_path / f"{rmvb_file.stem}.mp4"),
+                    quality=quality,
+                    overwrite=overwrite,
+                    progress_callback=tracker.job_callback(str(rmvb_file)),
+                    threads=threads,
+                    codec_policy=codec_policy
+                )
+                tracker.finish(str(rmvb_file), bool(result))
+                return result
+        
+        results = await asyncio.gather(*(run_one(f) for _, f in schedule))
+        ordered = sorted(zip((index for index, _ in schedule), results), key=lambda item: item[0])
+        successful_conversions = BatchResult(
+            (result.output for _, result in ordered if result),
+            [result for _, result in ordered]
+        )
         
         self.logger.info(f"批量转换完成，成功转换 {len(successful_conversions)} 个文件")
         return successful_conversions
-    
-    def get_video_info(self, video_file: str) -> Optional[dict]:
-        """
-        获取视频文件信息
-        
-        Args:
-            video_file: 视频文件路径
-            
-        Returns:
-            dict: 视频信息字典，如果失败则返回None
-        """
-        try:
-            cmd = [
-                self.ffmpeg_path.replace('ffmpeg', 'ffprobe'),
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format',
-                '-show_streams',
-                video_file
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                import json
-                return json.loads(result.stdout)
-            else:
-                self.logger.error(f"获取视频信息失败: {result.stderr}")
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"获取视频信息时发生错误: {str(e)}")
-            return None
+
+
 def convert_video(
     input_path: str, 
     output_path: Optional[str] = None, 
@@ -398,7 +5665,11 @@ def convert_video(
     quality: str = "high",
     overwrite: bool = False,
     ffmpeg_path: Optional[str] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    jobs: Union[int, str] = 1,
+    chunks: Optional[Union[int, str]] = None,
+    probe_cache: Optional[ProbeCache] = None,
+    perf_history: Optional[PerfHistory] = None
 ) -> bool:
     """
     便捷函数：无需命令行参数直接转换视频
@@ -411,12 +5682,18 @@ def convert_video(
         overwrite: 是否覆盖已存在的文件
         ffmpeg_path: FFmpeg可执行文件路径
         show_progress: 是否在控制台显示进度
+        jobs: 批量模式下同时运行的转换任务数，整数或"auto"
+        chunks: 单文件模式下分段并行编码的段数，整数或"auto"，None表示不分段
+        probe_cache: ffprobe结果缓存，None时不使用缓存
+        perf_history: 性能历史，None时不记录任务耗时
         
     Returns:
         bool: 转换成功返回True，否则返回False
     """
     try:
-        converter = VideoConverter(ffmpeg_path=ffmpeg_path)
+        converter = VideoConverter(
+            ffmpeg_path=ffmpeg_path, probe_cache=probe_cache, perf_history=perf_history
+        )
         
         # 进度回调函数
         def progress_handler(progress: float, status: str):
@@ -435,23 +5712,90 @@ def convert_video(
                 output_path,
                 quality=quality,
                 overwrite=overwrite,
-                progress_callback=progress_handler if show_progress else None
+                progress_callback=progress_handler if show_progress else None,
+                jobs=jobs
             )
             return len(successful) > 0
         else:
             # 单文件转换模式
-            return converter.convert_rmvb_to_mp4(
+            return bool(converter.convert_rmvb_to_mp4(
                 input_path,
                 output_path,
                 quality=quality,
                 overwrite=overwrite,
-                progress_callback=progress_handler if show_progress else None
-            )
+                progress_callback=progress_handler if show_progress else None,
+                chunks=chunks
+            ))
                 
     except Exception as e:
         print(f"错误: {str(e)}")
         return False
 
+def _jobs_arg(value: str) -> Union[int, str]:
+    """argparse类型函数：解析--jobs参数（正整数或auto）"""
+    if value == "auto":
+        return value
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        import argparse
+        raise argparse.ArgumentTypeError(f"无效的任务数: {value}（应为正整数或auto）")
+    return jobs
+
+
+def _extensions_arg(value: str) -> tuple:
+    """argparse类型函数：解析--ext参数（逗号分隔的扩展名列表）"""
+    return tuple(f".{ext.strip().lstrip('.')}" for ext in value.split(',') if ext.strip())
+
+
+def _renditions_arg(value: str) -> List[Rendition]:
+    """argparse类型函数：解析--renditions参数（逗号分隔的档位，如1080:crf=20,720,480:b=1000k）"""
+    try:
+        return [Rendition.parse(spec) for spec in value.split(',') if spec.strip()]
+    except ValueError as e:
+        import argparse
+        raise argparse.ArgumentTypeError(f"无效的档位: {value}（{str(e)}）")
+
+
+def _memory_budget_arg(value: str) -> Union[float, str]:
+    """argparse类型函数：解析--memory-budget参数（MB数或auto）"""
+    if value == "auto":
+        return value
+    try:
+        budget = float(value)
+    except ValueError:
+        budget = 0.0
+    if budget <= 0:
+        import argparse
+        raise argparse.ArgumentTypeError(f"无效的内存预算: {value}（应为正数（MB）或auto）")
+    return budget
+
+
+def _adaptive_jobs_arg(value: str) -> tuple:
+    """argparse类型函数：解析--adaptive-jobs参数（最少-最多，如1-8）"""
+    low, sep, high = value.partition('-')
+    try:
+        bounds = (int(low), int(high) if sep else int(low))
+    except ValueError:
+        bounds = (0, 0)
+    if bounds[0] < 1 or bounds[1] < bounds[0]:
+        import argparse
+        raise argparse.ArgumentTypeError(f"无效的任务数范围: {value}（格式应为 最少-最多，如1-8）")
+    return bounds
+
+
+def _priority_arg(value: str) -> tuple:
+    """argparse类型函数：解析--priority参数（文件名=优先级）"""
+    name, sep, priority = value.rpartition('=')
+    try:
+        return name, int(priority)
+    except ValueError:
+        import argparse
+        raise argparse.ArgumentTypeError(f"无效的优先级: {value}（格式应为 文件名=整数）")
+
+
 def main():
     """主函数，提供命令行接口"""
     import argparse
@@ -464,6 +5808,71 @@ def main():
     parser.add_argument("-f", "--force", action="store_true", help="覆盖已存在的文件")
     parser.add_argument("--batch", action="store_true", help="批量转换模式")
     parser.add_argument("--ffmpeg", help="FFmpeg可执行文件路径")
+    parser.add_argument("-j", "--jobs", type=_jobs_arg, default=1,
+                       help="批量模式下同时运行的转换任务数，整数或auto")
+    parser.add_argument("--adaptive-jobs", type=_adaptive_jobs_arg, metavar="MIN-MAX",
+                       help="批量模式下按CPU/内存压力和负载在该范围内自动调整同时运行的任务数（以-j为初始值）")
+    parser.add_argument("--ext", type=_extensions_arg, default=DEFAULT_BATCH_EXTENSIONS,
+                       help="批量、--probe和--warm-cache模式下要处理的扩展名，逗号分隔，如 rmvb,mkv,avi,flv（默认rmvb）")
+    parser.add_argument("--codec-policy", choices=CODEC_POLICIES, default='auto',
+                       help="auto：编解码器兼容MP4时直接复制流；reencode：总是重新编码")
+    parser.add_argument("--resume", action="store_true",
+                       help="批量模式下从上次中断处继续：跳过已完成的任务，只重做未完成的任务")
+    parser.add_argument("--incremental", action="store_true",
+                       help="批量模式下只转换源文件或转换设置有变化的文件")
+    parser.add_argument("--order", choices=BATCH_ORDERS, default='input',
+                       help="批量任务派发顺序：input按扫描顺序，lpt最长优先，spt最短优先，priority按优先级")
+    parser.add_argument("--priority", action="append", default=[], metavar="NAME=N",
+                       type=_priority_arg,
+                       help="指定文件的优先级（可多次使用）：配合--order priority决定派发顺序，"
+                            "并行时高优先级任务运行期间暂停低优先级任务")
+    parser.add_argument("--job-priority", type=int, default=0, metavar="N",
+                       help="单文件转换（含--chunks、--renditions、--package）的抢占优先级，"
+                            "同一进程内更低优先级的FFmpeg进程会被暂停（默认0）")
+    parser.add_argument("--chunks", type=_jobs_arg,
+                       help="单文件分段并行编码的段数，整数或auto（适合单个长视频）")
+    parser.add_argument("--renditions", type=_renditions_arg, metavar="SPEC",
+                       help="单文件一次解码输出多个档位，逗号分隔，如 1080:crf=20,720:crf=23,480:b=1000k；"
+                            "-o为输出目录")
+    parser.add_argument("--package", choices=PACKAGE_FORMATS,
+                       help="单文件一次编码直接输出HLS或DASH（分片和播放列表），-o为输出目录；"
+                            "可与--renditions一起使用输出多码率")
+    parser.add_argument("--segment-type", choices=PACKAGE_SEGMENT_TYPES, default='fmp4',
+                       help="--package的分片类型（默认fmp4，ts仅用于HLS）")
+    parser.add_argument("--segment-seconds", type=float, default=DEFAULT_SEGMENT_SECONDS, metavar="SECONDS",
+                       help=f"--package的分片时长（默认{DEFAULT_SEGMENT_SECONDS}秒）")
+    parser.add_argument("--probe", action="store_true",
+                       help="只并发探测输入文件或目录中的RMVB文件，以JSONL格式输出到-o或标准输出")
+    parser.add_argument("--concurrency", type=int,
+                       help="--probe和--warm-cache模式下的并发探测数")
+    parser.add_argument("--warm-cache", action="store_true",
+                       help="只探测目录中的所有RMVB文件并写入探测缓存，不进行转换")
+    parser.add_argument("--probe-cache", metavar="PATH",
+                       help="探测缓存数据库路径（默认位于用户缓存目录）")
+    parser.add_argument("--no-probe-cache", action="store_true", help="不使用探测缓存")
+    parser.add_argument("--stall-timeout", type=float, default=300.0, metavar="SECONDS",
+                       help="FFmpeg的媒体时间和输入读取位置都没有前进超过该秒数时终止任务（默认300，0表示不检查）")
+    parser.add_argument("--min-speed", type=float, metavar="X",
+                       help="开始60秒后平均编码速度低于该实时倍数时终止任务（如0.1）")
+    parser.add_argument("--max-wall-factor", type=float, metavar="F",
+                       help="单个任务耗时超过视频时长的F倍时终止任务")
+    parser.add_argument("--retries", type=int, default=0,
+                       help="任务被终止后换用更快的preset重试的次数（默认0）")
+    parser.add_argument("--memory-budget", type=_memory_budget_arg, metavar="MB",
+                       help="批量模式下各任务预计峰值内存之和的上限（MB），auto为可用内存的80%%")
+    parser.add_argument("--memory-limit", type=float, metavar="MB",
+                       help="每个FFmpeg进程的地址空间上限（RLIMIT_AS，MB，仅Linux）")
+    parser.add_argument("--precheck", choices=PRECHECK_POLICIES,
+                       help="编码前快速解码采样窗口检查输入是否损坏；发现错误时skip跳过、"
+                            "quarantine移到_quarantine目录、conceal开启错误隐藏后继续转换")
+    parser.add_argument("--dry-run", action="store_true",
+                       help="只按性能历史预测耗时并输出执行计划，不进行转换")
+    parser.add_argument("--perf-stats", action="store_true",
+                       help="输出性能历史的汇总和各质量档位的耗时模型（JSONL）")
+    parser.add_argument("--perf-history", metavar="PATH",
+                       help="性能历史数据库路径（默认位于用户缓存目录）")
+    parser.add_argument("--no-perf-history", action="store_true",
+                       help="不记录任务耗时，预测使用经验速度")
     
     args = parser.parse_args()
     
@@ -487,16 +5896,136 @@ def main():
             if progress >= 100:
                 print()
         
-        converter = VideoConverter(ffmpeg_path=args.ffmpeg)
+        probe_cache = None if args.no_probe_cache else ProbeCache(args.probe_cache)
+        perf_history = None if args.no_perf_history else PerfHistory(args.perf_history)
+        watchdog = WatchdogPolicy(
+            stall_timeout=args.stall_timeout or None,
+            min_speed=args.min_speed,
+            max_wall_factor=args.max_wall_factor,
+            retries=args.retries
+        )
+        converter = VideoConverter(
+            ffmpeg_path=args.ffmpeg, probe_cache=probe_cache, perf_history=perf_history,
+            watchdog=watchdog, memory_limit_mb=args.memory_limit
+        )
         
-        if args.batch:
+        if args.probe:
+            # 并发探测模式：每完成一个文件输出一行JSON
+            input_path = Path(args.input)
+            if input_path.is_dir():
+                paths = converter._find_video_files(input_path, args.ext)
+            else:
+                paths = [input_path]
+            out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+            try:
+                for record in converter.probe_many(paths, concurrency=args.concurrency):
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    out.flush()
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+        elif args.warm_cache:
+            # 探测缓存预热模式
+            warmed = converter.warm_probe_cache(
+                args.input, concurrency=args.concurrency, extensions=args.ext
+            )
+            print(f"探测缓存预热完成，共 {warmed} 个文件")
+        elif args.perf_stats:
+            # 性能历史查询模式
+            if perf_history is None:
+                print("未启用性能历史")
+            else:
+                for stats in perf_history.summary():
+                    print(json.dumps(stats, ensure_ascii=False))
+        elif args.batch and args.dry_run:
+            # 批量执行计划：按派发顺序输出每个任务的预计耗时和开始/结束时间
+            converter.batch_convert_rmvb_to_mp4(
+                args.input,
+                args.output,
+                quality=args.quality,
+                overwrite=args.force,
+                jobs=args.jobs,
+                order=args.order,
+                priorities=dict(args.priority),
+                extensions=args.ext,
+                codec_policy=args.codec_policy,
+                resume=args.resume,
+                incremental=args.incremental,
+                dry_run=True
+            )
+            plan = converter.last_batch_plan
+            if plan is None:
+                print("没有需要转换的文件")
+            else:
+                for task in plan['tasks']:
+                    print(f"{_format_seconds(task['start'])} - {_format_seconds(task['finish'])}  "
+                          f"{Path(task['input']).name}  预计 {task['predicted_seconds']:.0f} 秒")
+                print(f"共 {len(plan['tasks'])} 个任务（跳过 {plan['skipped']} 个），"
+                      f"{plan['jobs']} 个并行，预计总耗时 {_format_seconds(plan['predicted_makespan'])}")
+        elif args.dry_run:
+            # 单文件预测
+            seconds = converter.predict_encode_seconds(
+                args.input, quality=args.quality, codec_policy=args.codec_policy
+            )
+            if seconds is None:
+                print("无法获取视频时长，不能预测耗时")
+                sys.exit(1)
+            print(f"预计耗时 {_format_seconds(seconds)}（{seconds:.0f} 秒）")
+        elif args.package:
+            # 流媒体打包模式
+            result = converter.package_stream(
+                args.input,
+                args.output,
+                package_format=args.package,
+                renditions=args.renditions,
+                quality=args.quality,
+                segment_type=args.segment_type,
+                segment_seconds=args.segment_seconds,
+                overwrite=args.force,
+                progress_callback=cli_progress_callback,
+                priority=args.job_priority
+            )
+            print(f"{'成功' if result else '失败'}: {result.output}")
+            if not result:
+                sys.exit(1)
+        elif args.renditions:
+            # 多码率输出模式
+            results = converter.convert_renditions(
+                args.input,
+                args.renditions,
+                output_dir=args.output,
+                overwrite=args.force,
+                progress_callback=cli_progress_callback,
+                priority=args.job_priority
+            )
+            for result in results:
+                print(f"{'成功' if result else '失败'}: {result.output}")
+            if not all(results):
+                sys.exit(1)
+        elif args.batch:
             # 批量转换模式
+            concurrency = None
+            if args.adaptive_jobs:
+                concurrency = ConcurrencyController(
+                    *args.adaptive_jobs,
+                    initial_jobs=_resolve_jobs(args.jobs)
+                )
             successful = converter.batch_convert_rmvb_to_mp4(
                 args.input,
                 args.output,
                 quality=args.quality,
                 overwrite=args.force,
-                progress_callback=cli_progress_callback
+                progress_callback=cli_progress_callback,
+                jobs=args.jobs,
+                order=args.order,
+                priorities=dict(args.priority),
+                extensions=args.ext,
+                codec_policy=args.codec_policy,
+                resume=args.resume,
+                incremental=args.incremental,
+                precheck=args.precheck,
+                concurrency=concurrency,
+                memory_budget=args.memory_budget
             )
             print(f"批量转换完成，成功转换 {len(successful)} 个文件")
         else:
@@ -506,10 +6035,20 @@ def main():
                 args.output,
                 quality=args.quality,
                 overwrite=args.force,
-                progress_callback=cli_progress_callback
+                progress_callback=cli_progress_callback,
+                chunks=args.chunks,
+                codec_policy=args.codec_policy,
+                precheck=args.precheck,
+                priority=args.job_priority
             )
             if success:
                 print("转换成功!")
+                stages = "，".join(
+                    f"{stage} {seconds:.1f}s" for stage, seconds in success.timings.items()
+                )
+                print(f"各阶段耗时: {stages}")
+                if success.speed:
+                    print(f"编码速度: {success.speed:.2f}x")
             else:
                 print("转换失败!")
                 sys.exit(1)
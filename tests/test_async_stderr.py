@@ -0,0 +1,62 @@
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+# 假ffmpeg：stdout输出-progress数据块，stderr只输出以\r结尾的统计行（总量远超64KiB），
+# 最后输出faststart提示和一行以\r\n结尾的信息
+FAKE_FFMPEG = r'''#!/usr/bin/env python3
+import sys
+for i in range(30000):
+    sys.stderr.write(f"frame={i:6d} fps= 25 q=28.0 size=  {i}kB time=00:00:01.00 speed=2.0x\r")
+sys.stderr.write("[mp4 @ 0x1] Starting second pass: moving the moov atom to the beginning of the file\n")
+sys.stderr.write("last line\r\n")
+sys.stdout.write("out_time_us=10000000\nprogress=end\n")
+'''
+
+
+@unittest.skipIf(os.name != 'posix', "假ffmpeg脚本需要POSIX的shebang")
+class AsyncStderrTest(unittest.TestCase):
+    """asyncio版本读取只以\\r分隔的长stderr时不能超出StreamReader的缓冲区上限"""
+    
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.ffmpeg = os.path.join(self.work_dir.name, 'ffmpeg')
+        with open(self.ffmpeg, 'w') as f:
+            f.write(FAKE_FFMPEG.replace('python3', sys.executable, 1).replace('/usr/bin/env ', '', 1))
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IXUSR)
+        toolchain = converter_module.FFmpegToolchain(self.ffmpeg, None, 'test')
+        self.converter = converter_module.AsyncVideoConverter(toolchain=toolchain)
+    
+    def tearDown(self):
+        self.work_dir.cleanup()
+    
+    def test_carriage_return_stats(self):
+        # 读取stderr出错时管道不再被读取，FFmpeg和事件循环都会挂起，在线程中运行以便超时失败
+        results = []
+        thread = threading.Thread(target=lambda: results.append(asyncio.run(
+            self.converter._arun_ffmpeg_with_progress([self.ffmpeg], 10.0, None)
+        )), daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), "读取stderr时挂起")
+        result = results[0]
+        self.assertEqual(result.returncode, 0)
+        lines = result.stderr.splitlines()
+        self.assertEqual(len(lines), converter_module.STDERR_TAIL_LINES)
+        self.assertTrue(lines[-3].startswith('frame= 29999'))
+        self.assertIn('moving the moov atom', lines[-2])
+        self.assertEqual(lines[-1], 'last line')
+        self.assertIsNotNone(result.faststart_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+from test_realmedia_header import build_realmedia
+
+
+# 假ffmpeg：记录被调用过，然后以失败退出，不写任何输出
+FAKE_FFMPEG = r'''#!/usr/bin/env python3
+import os, sys
+with open(os.environ['FAKE_FFMPEG_CALLS'], 'a') as f:
+    f.write(' '.join(sys.argv[1:]) + '\n')
+sys.stderr.write("Invalid data found when processing input\n")
+sys.exit(1)
+'''
+
+
+class BatchJournalTest(unittest.TestCase):
+    """任务日志的重放、压缩和对写了一半的最后一行的容错"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.journal = converter_module.BatchJournal(self.work_dir.name)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_last_record_wins(self):
+        self.journal.append([
+            {'job': 'a', 'state': converter_module.BatchJournal.QUEUED},
+            {'job': 'b', 'state': converter_module.BatchJournal.QUEUED},
+        ])
+        self.journal.mark('a', converter_module.BatchJournal.RUNNING)
+        self.journal.mark('a', converter_module.BatchJournal.DONE, checksum='1:ab')
+
+        records = self.journal.load()
+        self.assertEqual(records['a']['state'], converter_module.BatchJournal.DONE)
+        self.assertEqual(records['a']['checksum'], '1:ab')
+        self.assertIn('time', records['a'])
+        self.assertEqual(records['b']['state'], converter_module.BatchJournal.QUEUED)
+
+    def test_torn_last_line_ignored(self):
+        self.journal.mark('a', converter_module.BatchJournal.RUNNING)
+        with open(self.journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"job": "a", "sta')
+        self.assertEqual(self.journal.load()['a']['state'], converter_module.BatchJournal.RUNNING)
+
+    def test_reset(self):
+        self.journal.mark('a', converter_module.BatchJournal.DONE)
+        self.journal.mark('b', converter_module.BatchJournal.FAILED)
+        records = self.journal.load()
+        self.journal.reset({'a': records['a']})
+        self.assertEqual(list(self.journal.load()), ['a'])
+        self.journal.reset()
+        self.assertEqual(self.journal.load(), {})
+
+    def test_missing_journal(self):
+        self.assertEqual(self.journal.load(), {})
+
+
+@unittest.skipIf(os.name != 'posix', "假ffmpeg脚本需要POSIX的shebang")
+class ResumePreexistingTest(unittest.TestCase):
+    """恢复批量时只覆盖日志明确记录为本工具写的输出（preexisting为False）"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        root = Path(self.work_dir.name)
+        self.input_dir = root / 'in'
+        self.output_dir = root / 'out'
+        self.input_dir.mkdir()
+        self.output_dir.mkdir()
+        self.input_file = self.input_dir / 'a.rmvb'
+        self.input_file.write_bytes(build_realmedia())
+        self.output_file = self.output_dir / 'a.mp4'
+        self.output_file.write_bytes(b'user data')
+
+        self.calls = root / 'calls.log'
+        ffmpeg = root / 'ffmpeg'
+        ffmpeg.write_text(FAKE_FFMPEG.replace('/usr/bin/env python3', sys.executable, 1))
+        ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IXUSR)
+        os.environ['FAKE_FFMPEG_CALLS'] = str(self.calls)
+        self.addCleanup(os.environ.pop, 'FAKE_FFMPEG_CALLS', None)
+        toolchain = converter_module.FFmpegToolchain(str(ffmpeg), None, 'test')
+        self.converter = converter_module.VideoConverter(toolchain=toolchain)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _resume(self, record: dict) -> dict:
+        journal = converter_module.BatchJournal(str(self.output_dir))
+        journal.append([dict({'job': str(self.input_file.resolve())}, **record)])
+        self.converter.batch_convert_rmvb_to_mp4(
+            str(self.input_dir), str(self.output_dir), resume=True
+        )
+        return journal.load()[str(self.input_file.resolve())]
+
+    def test_user_file_not_overwritten(self):
+        record = self._resume({'state': converter_module.BatchJournal.QUEUED, 'preexisting': True})
+        self.assertFalse(self.calls.exists(), "不应启动FFmpeg")
+        self.assertEqual(self.output_file.read_bytes(), b'user data')
+        self.assertEqual(record['state'], converter_module.BatchJournal.FAILED)
+        self.assertTrue(record['preexisting'])
+
+    def test_record_without_field_treated_as_user_file(self):
+        # 没有preexisting字段的旧日志按用户已有的文件处理
+        record = self._resume({'state': converter_module.BatchJournal.RUNNING})
+        self.assertFalse(self.calls.exists(), "不应启动FFmpeg")
+        self.assertEqual(self.output_file.read_bytes(), b'user data')
+        self.assertTrue(record['preexisting'])
+
+    def test_own_output_overwritten(self):
+        record = self._resume({'state': converter_module.BatchJournal.RUNNING, 'preexisting': False})
+        self.assertTrue(self.calls.exists(), "应重新运行FFmpeg")
+        self.assertEqual(record['state'], converter_module.BatchJournal.FAILED)
+        self.assertFalse(record['preexisting'])
+
+
+if __name__ == '__main__':
+    unittest.main()
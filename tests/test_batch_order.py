@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+class SimulateScheduleTest(unittest.TestCase):
+    """_simulate_schedule按线程池的派发方式重现各任务的开始和结束时间"""
+
+    def test_single_worker_runs_in_sequence(self):
+        self.assertEqual(
+            converter_module._simulate_schedule([3.0, 1.0, 2.0], 1),
+            [(0.0, 3.0), (3.0, 4.0), (4.0, 6.0)]
+        )
+
+    def test_next_job_goes_to_earliest_idle_worker(self):
+        timeline = converter_module._simulate_schedule([10.0, 2.0, 3.0, 4.0], 2)
+        self.assertEqual(timeline, [(0.0, 10.0), (0.0, 2.0), (2.0, 5.0), (5.0, 9.0)])
+
+    def test_lpt_shortens_makespan(self):
+        costs = [1.0, 1.0, 1.0, 1.0, 4.0]
+        scan_order = max(end for _, end in converter_module._simulate_schedule(costs, 2))
+        lpt_order = max(end for _, end in converter_module._simulate_schedule(sorted(costs, reverse=True), 2))
+        self.assertEqual(scan_order, 6.0)
+        self.assertEqual(lpt_order, 4.0)
+
+    def test_invalid_jobs_treated_as_one(self):
+        self.assertEqual(converter_module._simulate_schedule([1.0, 1.0], 0), [(0.0, 1.0), (1.0, 2.0)])
+
+    def test_empty(self):
+        self.assertEqual(converter_module._simulate_schedule([], 4), [])
+
+
+class OrderBatchTest(unittest.TestCase):
+    """_order_batch按排序策略确定派发顺序，相同键保持扫描顺序"""
+
+    def setUp(self):
+        toolchain = converter_module.FFmpegToolchain('ffmpeg', None, 'test')
+        self.converter = converter_module.VideoConverter(toolchain=toolchain)
+        self.files = [Path('/videos') / name for name in ('a.rmvb', 'b.rmvb', 'c.rmvb', 'd.rmvb')]
+        self.costs = {str(path): cost for path, cost in zip(self.files, (10.0, 30.0, 10.0))}
+
+    def _names(self, order: str, priorities=None) -> list:
+        schedule = self.converter._order_batch(self.files, self.costs, order, priorities or {})
+        return [(index, path.name) for index, path in schedule]
+
+    def test_input(self):
+        self.assertEqual(
+            self._names('input'), [(0, 'a.rmvb'), (1, 'b.rmvb'), (2, 'c.rmvb'), (3, 'd.rmvb')]
+        )
+
+    def test_lpt(self):
+        # d的耗时未知按0处理；a和c耗时相同，保持扫描顺序
+        self.assertEqual(
+            self._names('lpt'), [(1, 'b.rmvb'), (0, 'a.rmvb'), (2, 'c.rmvb'), (3, 'd.rmvb')]
+        )
+
+    def test_spt(self):
+        self.assertEqual(
+            self._names('spt'), [(3, 'd.rmvb'), (0, 'a.rmvb'), (2, 'c.rmvb'), (1, 'b.rmvb')]
+        )
+
+    def test_priority(self):
+        # 优先级可以按文件名或完整路径指定，优先级相同时长任务在前
+        priorities = {'c.rmvb': 5, str(self.files[3]): 5}
+        self.assertEqual(
+            self._names('priority', priorities),
+            [(2, 'c.rmvb'), (3, 'd.rmvb'), (1, 'b.rmvb'), (0, 'a.rmvb')]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+def load(cpu_pressure=None, memory_pressure=None, loadavg=None, cpus=4, mem_available_mb=None):
+    return {
+        'cpu_pressure': cpu_pressure,
+        'memory_pressure': memory_pressure,
+        'loadavg': loadavg,
+        'cpus': cpus,
+        'mem_available_mb': mem_available_mb,
+    }
+
+
+class AssessTest(unittest.TestCase):
+    """按PSI、可用内存和每核loadavg判断系统过载或空闲"""
+
+    def setUp(self):
+        self.controller = converter_module.ConcurrencyController(1, 4, reader=load)
+
+    def test_memory_pressure(self):
+        reason, idle = self.controller._assess(load(cpu_pressure=1.0, memory_pressure=25.0))
+        self.assertIn('内存压力', reason)
+        self.assertFalse(idle)
+
+    def test_low_available_memory(self):
+        reason, idle = self.controller._assess(load(cpu_pressure=1.0, mem_available_mb=200))
+        self.assertIn('可用内存', reason)
+        self.assertFalse(idle)
+
+    def test_cpu_pressure(self):
+        self.assertIn('CPU压力', self.controller._assess(load(cpu_pressure=60.0))[0])
+        self.assertEqual(self.controller._assess(load(cpu_pressure=20.0)), (None, False))
+        self.assertEqual(self.controller._assess(load(cpu_pressure=2.0)), (None, True))
+
+    def test_psi_takes_precedence_over_loadavg(self):
+        self.assertEqual(self.controller._assess(load(cpu_pressure=2.0, loadavg=40.0)), (None, True))
+
+    def test_loadavg_fallback(self):
+        self.assertIn('每核负载', self.controller._assess(load(loadavg=8.0, cpus=4))[0])
+        self.assertEqual(self.controller._assess(load(loadavg=4.0, cpus=4)), (None, False))
+        self.assertEqual(self.controller._assess(load(loadavg=2.0, cpus=4)), (None, True))
+
+    def test_nothing_available(self):
+        self.assertEqual(self.controller._assess(load(cpus=None)), (None, False))
+
+
+class TargetTest(unittest.TestCase):
+    """每次检查最多增减一个任务，不超出[min_jobs, max_jobs]"""
+
+    def _controller(self, readings, **kwargs):
+        readings = iter(readings)
+        return converter_module.ConcurrencyController(1, 3, interval=0, reader=lambda: next(readings), **kwargs)
+
+    def test_grow_only_when_saturated(self):
+        controller = self._controller([load(cpu_pressure=1.0)] * 4)
+        # 正在运行的任务数还没达到目标时不增加
+        self.assertEqual(controller.target(0), 1)
+        self.assertEqual(controller.target(1), 2)
+        self.assertEqual(controller.target(2), 3)
+        self.assertEqual(controller.target(3), 3)
+        self.assertEqual([entry['jobs'] for entry in controller.history], [2, 3])
+
+    def test_shrink_to_min(self):
+        controller = self._controller([load(cpu_pressure=90.0)] * 3, initial_jobs=2)
+        self.assertEqual(controller.target(2), 1)
+        self.assertEqual(controller.target(1), 1)
+
+    def test_invalid_min_jobs(self):
+        with self.assertRaises(ValueError):
+            converter_module.ConcurrencyController(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
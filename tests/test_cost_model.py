@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+CostModel = converter_module.CostModel
+
+
+class CostModelFitTest(unittest.TestCase):
+    """按(百万像素, 每秒视频耗时)样本做一元最小二乘拟合"""
+
+    def setUp(self):
+        self.fallback = CostModel(0.5)
+
+    def test_no_samples_uses_fallback(self):
+        self.assertIs(CostModel.fit([], self.fallback), self.fallback)
+
+    def test_linear_fit(self):
+        model = CostModel.fit([(0.3, 0.25), (0.9, 0.55), (2.1, 1.15)], self.fallback)
+        self.assertAlmostEqual(model.intercept, 0.1)
+        self.assertAlmostEqual(model.slope, 0.5)
+        self.assertEqual(model.samples, 3)
+        self.assertAlmostEqual(model.predict(600.0, 2.0), 600.0 * 1.1)
+
+    def test_same_resolution_falls_back_to_mean(self):
+        model = CostModel.fit([(0.3, 0.2), (0.3, 0.4)], self.fallback)
+        self.assertAlmostEqual(model.intercept, 0.3)
+        self.assertEqual(model.slope, 0.0)
+        self.assertEqual(model.samples, 2)
+
+    def test_negative_slope_falls_back_to_mean(self):
+        model = CostModel.fit([(0.3, 0.6), (2.0, 0.2)], self.fallback)
+        self.assertAlmostEqual(model.intercept, 0.4)
+        self.assertEqual(model.slope, 0.0)
+
+    def test_negative_intercept_falls_back_to_mean(self):
+        model = CostModel.fit([(1.0, 0.1), (2.0, 1.1)], self.fallback)
+        self.assertAlmostEqual(model.intercept, 0.6)
+        self.assertEqual(model.slope, 0.0)
+
+    def test_unknown_resolution_and_duration(self):
+        model = CostModel(0.2, 0.5)
+        self.assertAlmostEqual(model.predict(100.0, None), 20.0)
+        self.assertEqual(model.predict(-1.0, 1.0), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+classify = converter_module._classify_failure
+
+
+class ClassifyFailureTest(unittest.TestCase):
+    """按返回码、stderr和看门狗记录判断失败原因"""
+
+    def test_keywords(self):
+        cases = [
+            ("[aost#0:0] Error writing trailer: No space left on device", converter_module.FAILURE_DISK_FULL),
+            ("Decoder (codec rv60) not found for input stream #0:0", converter_module.FAILURE_MISSING_DECODER),
+            ("Unknown encoder 'libx264'", converter_module.FAILURE_MISSING_ENCODER),
+            ("out.mp4: Permission denied", converter_module.FAILURE_PERMISSION),
+            ("in.rmvb: No such file or directory", converter_module.FAILURE_NOT_FOUND),
+            ("in.rmvb: Invalid data found when processing input", converter_module.FAILURE_CORRUPT_INPUT),
+            ("[h264 @ 0x1] Cannot allocate memory", converter_module.FAILURE_OUT_OF_MEMORY),
+        ]
+        for line, reason in cases:
+            with self.subTest(reason=reason):
+                self.assertEqual(classify(1, f"ffmpeg version 6.1\n{line}\n"), (reason, line))
+
+    def test_latest_matching_line_wins(self):
+        stderr = "[rv40 @ 0x1] concealing 12 errors\nout.mp4: No space left on device\n"
+        self.assertEqual(classify(1, stderr)[0], converter_module.FAILURE_DISK_FULL)
+
+    def test_progress_lines_ignored(self):
+        stderr = "Conversion failed!\nframe=  100 fps= 25 q=28.0 size=  1024kB time=00:00:04.00\n"
+        self.assertEqual(classify(1, stderr), (converter_module.FAILURE_UNKNOWN, "Conversion failed!"))
+
+    def test_signal_beats_keywords(self):
+        # 被信号终止（如OOM killer）时之前的解码警告不是失败原因
+        stderr = "[rv40 @ 0x1] concealing 12 errors\n"
+        self.assertEqual(classify(-9, stderr)[0], converter_module.FAILURE_KILLED)
+
+    def test_watchdog_reason_first(self):
+        stderr = "[rv40 @ 0x1] concealing 12 errors\n"
+        self.assertEqual(
+            classify(-9, stderr, converter_module.WATCHDOG_STALLED),
+            (converter_module.WATCHDOG_STALLED, "[rv40 @ 0x1] concealing 12 errors")
+        )
+
+    def test_empty_stderr(self):
+        self.assertEqual(classify(1, ""), (converter_module.FAILURE_UNKNOWN, ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
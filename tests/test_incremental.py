@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+class IsUpToDateTest(unittest.TestCase):
+    """增量转换按转换标记判断输出是否最新"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        root = Path(self.work_dir.name)
+        self.input_file = root / 'a.rmvb'
+        self.input_file.write_bytes(b'source' * 1000)
+        self.output_file = root / 'a.mp4'
+        self.output_file.write_bytes(b'output')
+        toolchain = converter_module.FFmpegToolchain('ffmpeg', None, 'test')
+        self.converter = converter_module.VideoConverter(toolchain=toolchain)
+        self.settings = self.converter._settings_hash('medium', 'auto')
+        self.converter._write_stamp(self.input_file, self.output_file, self.settings)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _up_to_date(self, settings=None) -> bool:
+        return self.converter._is_up_to_date(self.input_file, self.output_file, settings or self.settings)
+
+    def _shift_mtime(self, path: Path):
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_fresh(self):
+        self.assertTrue(self._up_to_date())
+
+    def test_no_stamp(self):
+        converter_module._stamp_path(self.output_file).unlink()
+        self.assertFalse(self._up_to_date())
+
+    def test_corrupt_stamp(self):
+        converter_module._stamp_path(self.output_file).write_text('{', encoding='utf-8')
+        self.assertFalse(self._up_to_date())
+
+    def test_settings_changed(self):
+        self.assertFalse(self._up_to_date(self.converter._settings_hash('high', 'auto')))
+
+    def test_output_changed(self):
+        self.output_file.write_bytes(b'truncated')
+        self.assertFalse(self._up_to_date())
+
+    def test_output_missing(self):
+        self.output_file.unlink()
+        self.assertFalse(self._up_to_date())
+
+    def test_input_size_changed(self):
+        with open(self.input_file, 'ab') as f:
+            f.write(b'more')
+        self.assertFalse(self._up_to_date())
+
+    def test_input_content_changed_same_size(self):
+        self.input_file.write_bytes(b'SOURCE' * 1000)
+        self._shift_mtime(self.input_file)
+        self.assertFalse(self._up_to_date())
+
+    def test_only_mtime_changed_refreshes_stamp(self):
+        # 例如复制文件：内容不变只有修改时间变了，按校验和判断为最新，并刷新标记
+        self._shift_mtime(self.input_file)
+        self.assertTrue(self._up_to_date())
+        with open(converter_module._stamp_path(self.output_file), 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+        self.assertEqual(stamp['input_mtime_ns'], self.input_file.stat().st_mtime_ns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+Rendition = converter_module.Rendition
+
+
+def option(cmd, name):
+    """命令中某个参数的值（参数出现多次时返回全部）"""
+    return [cmd[i + 1] for i, arg in enumerate(cmd[:-1]) if arg == name]
+
+
+class BuildPackageCmdTest(unittest.TestCase):
+    """一次编码直接输出HLS/DASH的FFmpeg命令"""
+
+    def setUp(self):
+        toolchain = converter_module.FFmpegToolchain('ffmpeg', None, 'test')
+        self.converter = converter_module.VideoConverter(toolchain=toolchain)
+        self.input = Path('in.rmvb')
+        self.temp_dir = Path('out') / '.kks-package-x'
+        self.renditions = [Rendition(720, crf=22, name='hd'), Rendition(480, bitrate='1000k', audio_bitrate='96k')]
+
+    def _cmd(self, package_format, renditions=None, segment_type='fmp4', has_audio=True):
+        return self.converter._build_package_cmd(
+            self.input, self.temp_dir, package_format, renditions, 'medium',
+            segment_type, 4.0, has_audio
+        )
+
+    def test_hls_renditions(self):
+        cmd = self._cmd('hls', self.renditions)
+        self.assertEqual(cmd[:3], ['ffmpeg', '-i', 'in.rmvb'])
+        self.assertEqual(option(cmd, '-map'), ['[v0]', '[v1]', '0:a:0', '0:a:0'])
+        self.assertEqual(option(cmd, '-crf:v:0'), ['22'])
+        self.assertEqual(option(cmd, '-b:v:1'), ['1000k'])
+        self.assertEqual(option(cmd, '-b:a:1'), ['96k'])
+        # 所有档在同样的时间点强制关键帧，分片边界一致
+        self.assertEqual(option(cmd, '-force_key_frames'), ['expr:gte(t,n_forced*4)'])
+        self.assertEqual(option(cmd, '-sc_threshold'), ['0'])
+        self.assertEqual(option(cmd, '-var_stream_map'), ['v:0,a:0,name:hd v:1,a:1,name:480p'])
+        self.assertEqual(option(cmd, '-hls_time'), ['4'])
+        self.assertEqual(option(cmd, '-hls_segment_type'), ['fmp4'])
+        self.assertEqual(
+            option(cmd, '-hls_segment_filename'), [str(self.temp_dir / 'stream_%v' / 'seg_%05d.m4s')]
+        )
+        self.assertEqual(cmd[-1], str(self.temp_dir / 'stream_%v' / 'index.m3u8'))
+
+    def test_hls_source_quality_ts_without_audio(self):
+        cmd = self._cmd('hls', segment_type='ts', has_audio=False)
+        self.assertNotIn('-filter_complex', cmd)
+        self.assertEqual(option(cmd, '-map'), ['0:v:0'])
+        self.assertEqual(option(cmd, '-crf:v:0'), ['23'])
+        self.assertEqual(option(cmd, '-var_stream_map'), ['v:0,name:source'])
+        self.assertEqual(option(cmd, '-hls_segment_type'), ['mpegts'])
+        self.assertTrue(option(cmd, '-hls_segment_filename')[0].endswith('seg_%05d.ts'))
+
+    def test_dash_shares_one_audio_stream(self):
+        cmd = self._cmd('dash', self.renditions)
+        self.assertEqual(option(cmd, '-map'), ['[v0]', '[v1]', '0:a:0'])
+        self.assertEqual(option(cmd, '-b:a'), ['128k'])
+        self.assertEqual(option(cmd, '-f'), ['dash'])
+        self.assertEqual(option(cmd, '-seg_duration'), ['4'])
+        self.assertEqual(option(cmd, '-adaptation_sets'), ['id=0,streams=v id=1,streams=a'])
+        self.assertNotIn('-var_stream_map', cmd)
+        self.assertEqual(cmd[-1], str(self.temp_dir / converter_module.DASH_MANIFEST))
+
+    def test_dash_without_audio(self):
+        cmd = self._cmd('dash', self.renditions, has_audio=False)
+        self.assertNotIn('0:a:0', cmd)
+        self.assertEqual(option(cmd, '-adaptation_sets'), ['id=0,streams=v'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import signal
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+class FakeProcess:
+    """只记录收到的信号的进程替身"""
+
+    _next_pid = 100000
+
+    def __init__(self):
+        FakeProcess._next_pid += 1
+        self.pid = FakeProcess._next_pid
+        self.signals = []
+
+    def send_signal(self, sig):
+        self.signals.append(sig)
+
+
+@unittest.skipIf(not hasattr(signal, 'SIGSTOP'), "当前平台没有SIGSTOP")
+class StopModeTest(unittest.TestCase):
+    """有更高优先级的进程运行时暂停低优先级进程，它结束后恢复"""
+
+    def setUp(self):
+        self.scheduler = converter_module.PreemptionScheduler('stop')
+
+    def test_preempt_and_resume(self):
+        low, other, high = FakeProcess(), FakeProcess(), FakeProcess()
+        low_job = self.scheduler.register(low, 0, 'low')
+        other_job = self.scheduler.register(other, 0, 'other')
+        self.assertEqual(self.scheduler.paused_jobs(), [])
+
+        high_job = self.scheduler.register(high, 10, 'high')
+        self.assertEqual(self.scheduler.paused_jobs(), [low_job, other_job])
+        self.assertEqual(low.signals, [signal.SIGSTOP])
+        self.assertEqual(high.signals, [])
+
+        self.scheduler.unregister(high_job)
+        self.assertEqual(self.scheduler.paused_jobs(), [])
+        self.assertEqual(low.signals, [signal.SIGSTOP, signal.SIGCONT])
+        self.assertEqual(len(low_job.intervals), 1)
+        self.assertGreaterEqual(low_job.paused_seconds(), 0.0)
+
+    def test_lower_priority_paused_on_register(self):
+        self.scheduler.register(FakeProcess(), 5)
+        late = FakeProcess()
+        late_job = self.scheduler.register(late, 1)
+        self.assertTrue(late_job.paused)
+        self.assertEqual(late.signals, [signal.SIGSTOP])
+
+    def test_unregister_paused_job(self):
+        low = FakeProcess()
+        low_job = self.scheduler.register(low, 0)
+        self.scheduler.register(FakeProcess(), 10)
+        # 被暂停的进程先恢复再注销，否则回收时会一直等待
+        self.scheduler.unregister(low_job)
+        self.assertEqual(low.signals, [signal.SIGSTOP, signal.SIGCONT])
+        self.assertFalse(low_job.paused)
+
+    def test_exited_process_ignored(self):
+        gone = FakeProcess()
+        gone.send_signal = mock.Mock(side_effect=ProcessLookupError)
+        gone_job = self.scheduler.register(gone, 0)
+        self.scheduler.register(FakeProcess(), 10)
+        self.assertFalse(gone_job.paused)
+
+
+class NiceModeTest(unittest.TestCase):
+    """nice方式调整低优先级进程的nice值，恢复时还原"""
+
+    @unittest.skipIf(not hasattr(os, 'setpriority'), "当前平台不支持调整nice值")
+    def test_renice(self):
+        scheduler = converter_module.PreemptionScheduler('nice')
+        low = FakeProcess()
+        with mock.patch.object(converter_module.os, 'getpriority', return_value=0), \
+                mock.patch.object(converter_module.os, 'setpriority') as setpriority:
+            scheduler.register(low, 0)
+            high_job = scheduler.register(FakeProcess(), 10)
+            scheduler.unregister(high_job)
+        self.assertEqual(setpriority.call_args_list, [
+            mock.call(os.PRIO_PROCESS, low.pid, converter_module.PREEMPT_NICE),
+            mock.call(os.PRIO_PROCESS, low.pid, 0),
+        ])
+        self.assertEqual(low.signals, [])
+
+    def test_unsupported_platform_disables_preemption(self):
+        # Windows既没有SIGSTOP也没有os.setpriority
+        with mock.patch.object(converter_module, 'os', mock.Mock(spec=[])):
+            scheduler = converter_module.PreemptionScheduler('nice')
+        self.assertIsNone(scheduler.mode)
+        low = FakeProcess()
+        scheduler.register(low, 0)
+        scheduler.register(FakeProcess(), 10)
+        self.assertEqual(scheduler.paused_jobs(), [])
+        self.assertEqual(low.signals, [])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            converter_module.PreemptionScheduler('freeze')
+
+
+if __name__ == '__main__':
+    unittest.main()
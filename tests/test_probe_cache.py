@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+OPTIONS = ['-show_format', '-show_streams']
+
+
+class ProbeCacheTest(unittest.TestCase):
+    """探测缓存按文件大小和mtime失效，超过容量时按最近使用时间淘汰"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for name in ('a.rmvb', 'b.rmvb', 'c.rmvb'):
+            path = os.path.join(self.work_dir.name, name)
+            with open(path, 'wb') as f:
+                f.write(name.encode('ascii'))
+            self.files.append(path)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _cache(self, max_entries: int = 100) -> converter_module.ProbeCache:
+        cache = converter_module.ProbeCache(
+            os.path.join(self.work_dir.name, 'cache', 'probe.sqlite3'), max_entries=max_entries
+        )
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hit_and_options(self):
+        cache = self._cache()
+        path = self.files[0]
+        cache.put(path, OPTIONS, {'format': {'duration': '10.0'}})
+        self.assertEqual(cache.get(path, OPTIONS), {'format': {'duration': '10.0'}})
+        # 探测参数不同视为不同的条目
+        self.assertIsNone(cache.get(path, ['-show_format']))
+
+    def test_modified_file_invalidates(self):
+        cache = self._cache()
+        path = self.files[0]
+        cache.put(path, OPTIONS, {'format': {}})
+        with open(path, 'ab') as f:
+            f.write(b'more data')
+        self.assertIsNone(cache.get(path, OPTIONS))
+        # 作废的条目被删除
+        self.assertEqual(len(cache), 0)
+
+    def test_touched_file_invalidates(self):
+        cache = self._cache()
+        path = self.files[0]
+        cache.put(path, OPTIONS, {'format': {}})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(cache.get(path, OPTIONS))
+
+    def test_missing_file(self):
+        cache = self._cache()
+        self.assertIsNone(cache.get(os.path.join(self.work_dir.name, 'missing.rmvb'), OPTIONS))
+
+    def test_lru_eviction(self):
+        cache = self._cache(max_entries=2)
+        a, b, c = self.files
+        cache.put(a, OPTIONS, {'name': 'a'})
+        time.sleep(0.01)
+        cache.put(b, OPTIONS, {'name': 'b'})
+        time.sleep(0.01)
+        # 读取a后b成为最久未使用的条目
+        self.assertIsNotNone(cache.get(a, OPTIONS))
+        time.sleep(0.01)
+        cache.put(c, OPTIONS, {'name': 'c'})
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(a, OPTIONS), {'name': 'a'})
+        self.assertIsNone(cache.get(b, OPTIONS))
+        self.assertEqual(cache.get(c, OPTIONS), {'name': 'c'})
+
+    def test_shared_between_instances(self):
+        self._cache().put(self.files[0], OPTIONS, {'name': 'a'})
+        self.assertEqual(self._cache().get(self.files[0], OPTIONS), {'name': 'a'})
+
+
+if __name__ == '__main__':
+    unittest.main()
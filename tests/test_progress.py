@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+PROGRESS_OUTPUT = """frame=10
+fps=25.0
+out_time_us=400000
+speed=1.5x
+progress=continue
+
+frame=20
+out_time_us=800000
+progress=continue
+frame=25
+out_time_us=1000000
+progress=end
+"""
+
+
+class ReadProgressBlocksTest(unittest.TestCase):
+    """-progress输出按progress行切分为数据块"""
+
+    def test_blocks(self):
+        blocks = list(converter_module._read_progress_blocks(PROGRESS_OUTPUT.splitlines(True)))
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(
+            blocks[0], {'frame': '10', 'fps': '25.0', 'out_time_us': '400000', 'speed': '1.5x', 'progress': 'continue'}
+        )
+        # 每个数据块只包含自己的字段
+        self.assertNotIn('fps', blocks[1])
+        self.assertEqual(blocks[2]['progress'], 'end')
+
+    def test_incomplete_block_not_yielded(self):
+        lines = ['frame=1\n', 'progress=continue\n', 'frame=2\n', 'out_time_us=']
+        self.assertEqual(list(converter_module._read_progress_blocks(lines)), [{'frame': '1', 'progress': 'continue'}])
+
+    def test_value_with_equals_sign(self):
+        lines = ['stream_0_0_q=28.0\n', 'comment=a=b\n', 'progress=end\n']
+        self.assertEqual(list(converter_module._read_progress_blocks(lines))[0]['comment'], 'a=b')
+
+
+class ProgressThrottleTest(unittest.TestCase):
+    """进度至少前进step且距上次回调至少interval秒才回调，100%只回调一次"""
+
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch.object(converter_module, 'time')
+        self.addCleanup(patcher.stop)
+        patcher.start().monotonic.side_effect = lambda: self.now
+        self.throttle = converter_module.ProgressThrottle(interval=1.0, step=1.0)
+
+    def test_step_and_interval(self):
+        self.assertTrue(self.throttle.ready(2.0))
+        # 进度够了但时间间隔不足
+        self.now += 0.5
+        self.assertFalse(self.throttle.ready(10.0))
+        self.now += 0.5
+        self.assertTrue(self.throttle.ready(10.0))
+        # 时间够了但进度前进不足一步
+        self.now += 5
+        self.assertFalse(self.throttle.ready(10.5))
+
+    def test_completion_always_reported_once(self):
+        self.assertTrue(self.throttle.ready(99.5))
+        self.assertTrue(self.throttle.ready(100.0))
+        self.assertFalse(self.throttle.ready(100.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+def _chunk(chunk_id: bytes, body: bytes) -> bytes:
+    """RealMedia块：4字节ID、4字节块大小（含10字节块头）、2字节版本"""
+    return chunk_id + struct.pack('>IH', 10 + len(body), 0) + body
+
+
+def _mdpr(stream_number: int, mime: bytes, specific: bytes) -> bytes:
+    name = b'stream'
+    body = struct.pack('>HIIIIIII', stream_number, 500000, 400000, 1000, 800, 0, 0, 120000)
+    body += bytes([len(name)]) + name + bytes([len(mime)]) + mime
+    body += struct.pack('>I', len(specific)) + specific
+    return _chunk(b'MDPR', body)
+
+
+# RV40视频的type-specific数据：帧率在偏移22处，以16.16定点数存储
+VIDEO_SPECIFIC = struct.pack('>I4s4sHHHHH', 34, b'VIDO', b'RV40', 640, 480, 24, 0, 0) \
+    + struct.pack('>I', 25 << 16) + bytes(8)
+
+# RealAudio版本5的type-specific数据：采样率和声道在偏移54处，FourCC在偏移66处
+AUDIO_SPECIFIC = b'.ra\xfd' + struct.pack('>H', 5) + bytes(48) \
+    + struct.pack('>HIH', 44100, 16, 2) + bytes(4) + b'cook'
+
+
+def build_realmedia(with_index: bool = True) -> bytes:
+    """构造只有.RMF/PROP/MDPR头部、一个空DATA块和（可选）INDX块的RealMedia文件"""
+    def header(index_offset: int) -> bytes:
+        prop = struct.pack(
+            '>IIIIIIIIIHH', 900000, 800000, 1000, 800, 4321, 120000, 0, index_offset, 0, 2, 0
+        )
+        return (
+            _chunk(b'.RMF', struct.pack('>II', 0, 4))
+            + _chunk(b'PROP', prop)
+            + _mdpr(0, b'video/x-pn-realvideo', VIDEO_SPECIFIC)
+            + _mdpr(1, b'audio/x-pn-realaudio', AUDIO_SPECIFIC)
+            + _chunk(b'DATA', struct.pack('>II', 0, 0))
+        )
+
+    body = header(0)
+    if not with_index:
+        return body + bytes(16)
+    return header(len(body)) + _chunk(b'INDX', struct.pack('>IHI', 0, 0, 0))
+
+
+class ParseRealmediaHeaderTest(unittest.TestCase):
+    """parse_realmedia_header只读取头部块，结果与ffprobe的结构兼容"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _write(self, data: bytes) -> str:
+        path = os.path.join(self.work_dir.name, 'movie.rmvb')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_streams_and_format(self):
+        path = self._write(build_realmedia())
+        info = converter_module.parse_realmedia_header(path)
+
+        self.assertEqual(info['format']['duration'], '120.000')
+        self.assertEqual(info['format']['bit_rate'], '800000')
+        self.assertEqual(info['format']['nb_streams'], 2)
+        self.assertEqual(info['realmedia']['num_packets'], 4321)
+        self.assertTrue(info['realmedia']['has_index'])
+
+        video, audio = info['streams']
+        self.assertEqual(video['codec_type'], 'video')
+        self.assertEqual(video['codec_name'], 'rv40')
+        self.assertEqual((video['width'], video['height']), (640, 480))
+        self.assertEqual(video['r_frame_rate'], '25/1')
+        self.assertEqual(audio['codec_type'], 'audio')
+        self.assertEqual(audio['codec_name'], 'cook')
+        self.assertEqual(audio['sample_rate'], '44100')
+        self.assertEqual(audio['channels'], 2)
+        self.assertEqual(converter_module._info_duration(info), 120.0)
+
+    def test_missing_index(self):
+        path = self._write(build_realmedia(with_index=False))
+        info = converter_module.parse_realmedia_header(path)
+        self.assertFalse(info['realmedia']['has_index'])
+
+    def test_not_realmedia(self):
+        self.assertIsNone(converter_module.parse_realmedia_header(self._write(b'\x00\x00\x00\x18ftypisom')))
+
+    def test_truncated_header(self):
+        # 只有.RMF块，没有PROP
+        path = self._write(build_realmedia()[:18])
+        self.assertIsNone(converter_module.parse_realmedia_header(path))
+
+    def test_oversized_chunk(self):
+        data = _chunk(b'.RMF', struct.pack('>II', 0, 4)) + b'PROP' + struct.pack('>IH', 1 << 30, 0)
+        self.assertIsNone(converter_module.parse_realmedia_header(self._write(data)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+Rendition = converter_module.Rendition
+
+
+class RenditionParseTest(unittest.TestCase):
+    """解析"高度[:key=value...]"形式的档位"""
+
+    def test_height_only(self):
+        rendition = Rendition.parse('720')
+        self.assertEqual((rendition.height, rendition.crf, rendition.bitrate), (720, 23, None))
+        self.assertEqual(rendition.name, '720p')
+        self.assertEqual(rendition.preset, 'medium')
+        self.assertEqual(rendition.audio_bitrate, converter_module.DEFAULT_RENDITION_AUDIO_BITRATE)
+
+    def test_options(self):
+        rendition = Rendition.parse(' 1080p:b=5000k:preset=fast:name=hd:ab=192k ')
+        self.assertEqual(rendition.height, 1080)
+        self.assertIsNone(rendition.crf)
+        self.assertEqual(rendition.bitrate, '5000k')
+        self.assertEqual(rendition.preset, 'fast')
+        self.assertEqual(rendition.name, 'hd')
+        self.assertEqual(rendition.audio_bitrate, '192k')
+
+    def test_crf(self):
+        self.assertEqual(Rendition.parse('480:crf=28').crf, 28)
+
+    def test_invalid(self):
+        for spec in ('', 'abc', '0', '720:crf', '720:fps=30', '720:crf=high'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    Rendition.parse(spec)
+
+    def test_video_args(self):
+        self.assertEqual(
+            Rendition(720, bitrate='3000k', preset='fast').video_args(),
+            ['-c:v', 'libx264', '-preset', 'fast', '-b:v', '3000k', '-maxrate', '3000k', '-bufsize', '6000k']
+        )
+        # 指定流序号时参数名带上流说明符
+        self.assertEqual(
+            Rendition(480, crf=26).video_args(1),
+            ['-c:v:1', 'libx264', '-preset:v:1', 'medium', '-crf:v:1', '26']
+        )
+
+    def test_cli_list(self):
+        renditions = converter_module._renditions_arg('1080:b=5000k,720, 480:crf=28')
+        self.assertEqual([r.name for r in renditions], ['1080p', '720p', '480p'])
+
+
+class RenditionsGraphTest(unittest.TestCase):
+    """解码一次，split为N路分别缩放"""
+
+    def test_single(self):
+        self.assertEqual(
+            converter_module._renditions_graph([Rendition(720)]),
+            "[0:v:0]scale=-2:'min(720,trunc(ih/2)*2)'[v0]"
+        )
+
+    def test_split(self):
+        graph = converter_module._renditions_graph([Rendition(1080), Rendition(720), Rendition(480)])
+        self.assertEqual(graph.split(';'), [
+            "[0:v:0]split=3[s0][s1][s2]",
+            "[s0]scale=-2:'min(1080,trunc(ih/2)*2)'[v0]",
+            "[s1]scale=-2:'min(720,trunc(ih/2)*2)'[v1]",
+            "[s2]scale=-2:'min(480,trunc(ih/2)*2)'[v2]",
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
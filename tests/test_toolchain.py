@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+parse = converter_module.FFmpegToolchain._parse_capabilities
+
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ S..... = Subtitle
+ .F.... = Frame-level multithreading
+ ......
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10 (codec h264)
+ V....D libx265              libx265 H.265 / HEVC (codec hevc)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+MUXERS_OUTPUT = """File formats:
+ D. = Demuxing supported
+ .E = Muxing supported
+ --
+  E dash            DASH Muxer
+  E hls             Apple HTTP Live Streaming
+  E mp4             MP4 (MPEG-4 Part 14)
+ DE matroska,webm   Matroska / WebM
+"""
+
+FILTERS_OUTPUT = """Filters:
+  T.. = Timeline support
+  .S. = Slice threading
+  ..C = Command support
+  A = Audio input/output
+  V = Video input/output
+  N = Dynamic number and/or type of input/output
+  | = Source or sink filter
+ ..C scale             V->V       Scale the input video size and/or convert the image format.
+ ... split             V->N       Pass on the input to N video outputs.
+ ... anullsrc          |->A       Null audio source, return empty audio frames.
+"""
+
+
+class ParseCapabilitiesTest(unittest.TestCase):
+    """解析ffmpeg -encoders/-muxers/-filters的输出，图例行不算作能力"""
+
+    def test_encoders(self):
+        self.assertEqual(parse('encoders', ENCODERS_OUTPUT), ['libx264', 'libx265', 'aac'])
+
+    def test_muxers(self):
+        # 一行列出多个名称时逗号分隔
+        self.assertEqual(parse('muxers', MUXERS_OUTPUT), ['dash', 'hls', 'mp4', 'matroska', 'webm'])
+
+    def test_filters(self):
+        self.assertEqual(parse('filters', FILTERS_OUTPUT), ['scale', 'split', 'anullsrc'])
+
+    def test_no_separator(self):
+        self.assertEqual(parse('decoders', "Decoders:\n V..... = Video\n"), [])
+
+    def test_has_capability(self):
+        toolchain = converter_module.FFmpegToolchain(
+            'ffmpeg', None, '6.1', encoders=parse('encoders', ENCODERS_OUTPUT),
+            muxers=parse('muxers', MUXERS_OUTPUT)
+        )
+        self.assertTrue(toolchain.has_encoder('libx264'))
+        self.assertFalse(toolchain.has_encoder('h264_nvenc'))
+        self.assertTrue(toolchain.has_muxer('hls'))
+        self.assertFalse(toolchain.has_filter('scale'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convertRmvbToMp4 as converter_module
+
+
+WatchdogPolicy = converter_module.WatchdogPolicy
+
+
+class WatchdogCheckTest(unittest.TestCase):
+    """看门狗按停滞时间、耗时上限和平均速度判断是否终止进程，暂停时间不计入"""
+
+    def _watchdog(self, policy, elapsed, idle, out_time=None, total_duration=100.0, job=None):
+        # 不指定输入文件时监视器只做停滞检测，开始时间和最后前进时间直接改写
+        monitor = converter_module.InputReadMonitor(os.getpid(), None)
+        monitor.out_time = out_time
+        monitor.poll()
+        now = time.monotonic()
+        monitor.start_time = now - elapsed
+        monitor.last_advance = now - idle
+        return converter_module.Watchdog(policy, monitor, total_duration, job)
+
+    def test_healthy(self):
+        policy = WatchdogPolicy(stall_timeout=60, min_speed=0.5, max_wall_factor=3, grace_seconds=10)
+        self.assertIsNone(self._watchdog(policy, elapsed=100, idle=1, out_time=80).check())
+
+    def test_stalled(self):
+        watchdog = self._watchdog(WatchdogPolicy(stall_timeout=60), elapsed=200, idle=90)
+        self.assertEqual(watchdog.check(), converter_module.WATCHDOG_STALLED)
+        self.assertIn('没有进展', watchdog.describe())
+
+    def test_timeout(self):
+        policy = WatchdogPolicy(stall_timeout=None, max_wall_factor=2, grace_seconds=10)
+        self.assertIsNone(self._watchdog(policy, elapsed=150, idle=0).check())
+        self.assertEqual(self._watchdog(policy, elapsed=250, idle=0).check(), converter_module.WATCHDOG_TIMEOUT)
+        # 时长未知时不限制耗时
+        self.assertIsNone(self._watchdog(policy, elapsed=250, idle=0, total_duration=0).check())
+
+    def test_timeout_not_below_grace(self):
+        policy = WatchdogPolicy(stall_timeout=None, max_wall_factor=1, grace_seconds=60)
+        self.assertIsNone(self._watchdog(policy, elapsed=30, idle=0, total_duration=10).check())
+
+    def test_too_slow_after_grace(self):
+        policy = WatchdogPolicy(stall_timeout=None, min_speed=0.5, grace_seconds=60)
+        self.assertIsNone(self._watchdog(policy, elapsed=30, idle=0, out_time=1).check())
+        watchdog = self._watchdog(policy, elapsed=100, idle=0, out_time=20)
+        self.assertEqual(watchdog.check(), converter_module.WATCHDOG_TOO_SLOW)
+        self.assertIn('0.20x', watchdog.describe())
+
+    def test_paused_job_not_checked(self):
+        job = converter_module.PreemptedJob(None, 0)
+        job.paused_at = time.monotonic() - 500
+        watchdog = self._watchdog(WatchdogPolicy(stall_timeout=60), elapsed=600, idle=600, job=job)
+        self.assertIsNone(watchdog.check())
+
+    def test_paused_time_excluded(self):
+        # 停滞了90秒，其中80秒是被高优先级任务暂停
+        now = time.monotonic()
+        job = converter_module.PreemptedJob(None, 0)
+        job.intervals.append((now - 85, now - 5))
+        watchdog = self._watchdog(WatchdogPolicy(stall_timeout=60), elapsed=90, idle=90, job=job)
+        self.assertIsNone(watchdog.check())
+
+
+if __name__ == '__main__':
+    unittest.main()